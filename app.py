@@ -2,7 +2,7 @@ import os
 import secrets
 import requests
 import streamlit as st
-from bot import add_content_item  # process_all_pending_items not needed in this UI step
+from bot import add_content_item, STORAGE_BACKEND  # process_all_pending_items not needed in this UI step
 
 import datetime
 import re
@@ -692,7 +692,8 @@ else:
                     groups=groups_val.strip(),
                 )
 
-                st.session_state.toast = f"✅ Draft saved to Google Sheet successfully. (ID {new_id})"
+                saved_to = "Google Sheet" if STORAGE_BACKEND == "sheets" else "local store"
+                st.session_state.toast = f"✅ Draft saved to {saved_to} successfully. (ID {new_id})"
 
                 st.session_state.draft = None
                 for k in [
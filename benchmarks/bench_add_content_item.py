@@ -0,0 +1,72 @@
+"""
+Save latency of add_content_item() versus ContentPlan size.
+
+Compares the old max(id)+1 over get_all_records() with the ID allocator.
+Run from the repo root:
+
+    python -m benchmarks.bench_add_content_item
+    python -m benchmarks.bench_add_content_item --sizes 100 1000 --latency-ms 50
+"""
+
+import argparse
+import statistics
+import time
+
+from benchmarks.fake_sheets import FakeSpreadsheet, FakeWorksheet, bench_env, make_content_rows
+
+bench_env("bench_add_content_item_")
+
+import bot  # noqa: E402  (env above must be set before import)
+
+
+def legacy_add_content_item(content_sheet, date, time_, platforms, idea):
+    records = content_sheet.get_all_records()
+    ids = [int(r["id"]) for r in records if str(r.get("id", "")).strip().isdigit()]
+    next_id = max(ids, default=0) + 1
+    content_sheet.append_row([next_id, date, time_, platforms, "", idea, "", "", "", "", "pending"])
+    return next_id
+
+
+def run(sizes, saves, latency_s, per_cell_s):
+    print(f"{'rows':>8} {'legacy p50 ms':>14} {'allocator p50 ms':>17} {'calls/save':>11}")
+    for n_rows in sizes:
+        rows = make_content_rows(n_rows)
+        legacy_sheet = FakeWorksheet("ContentPlan", rows, latency_s, per_cell_s)
+        legacy = []
+        for _ in range(saves):
+            started = time.perf_counter()
+            legacy_add_content_item(legacy_sheet, "2030-01-01", "10:00", "FB", "bench")
+            legacy.append(time.perf_counter() - started)
+
+        sh = FakeSpreadsheet(latency_s=latency_s, per_cell_s=per_cell_s)
+        sh.add(FakeWorksheet("ContentPlan", rows, latency_s, per_cell_s))
+        bot.get_spreadsheet = lambda: sh
+        bot.invalidate_sheets_cache()
+        bot.add_content_item("2030-01-01", "10:00", "FB", "warm-up")  # seeds IdCounter
+        sh.reset_stats()
+
+        allocator = []
+        for _ in range(saves):
+            started = time.perf_counter()
+            bot.add_content_item("2030-01-01", "10:00", "FB", "bench")
+            allocator.append(time.perf_counter() - started)
+
+        calls_per_save = sum(sh.total_calls().values()) / saves
+        print(
+            f"{n_rows:>8} {statistics.median(legacy) * 1000:>14.2f} "
+            f"{statistics.median(allocator) * 1000:>17.2f} {calls_per_save:>11.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--saves", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated cost per API call")
+    parser.add_argument("--per-cell-us", type=float, default=0.0, help="simulated cost per cell read")
+    args = parser.parse_args()
+    run(args.sizes, args.saves, args.latency_ms / 1000, args.per_cell_us / 1e6)
+
+
+if __name__ == "__main__":
+    main()
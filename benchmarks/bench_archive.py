@@ -0,0 +1,86 @@
+"""
+Per-run read size before and after `bot.py --archive`, on a synthetic
+ContentPlan that is mostly old 'posted' history. Checks that every id ends
+up either still in ContentPlan or in the archive, and that the same rows are
+due afterwards. Run from the repo root:
+
+    python -m benchmarks.bench_archive
+    python -m benchmarks.bench_archive --sizes 1000 10000 --target local
+"""
+
+import argparse
+import contextlib
+import gzip
+import io
+import json
+import os
+import time
+
+from benchmarks.fake_sheets import FakeSpreadsheet, FakeWorksheet, bench_env, make_content_rows
+
+# Measure the projected scan every run does without the index
+STATE_DIR = bench_env("bench_archive_", PENDING_INDEX="0")
+
+import bot  # noqa: E402  (env above must be set before import)
+
+
+def scan_cost(ws):
+    """(bytes read, due ids) for one find_all_pending_content() call."""
+    ws.reset_stats()
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = bot.find_all_pending_content(ws)
+    return ws.bytes_read, sorted(str(r["id"]) for r in rows)
+
+
+def sheet_bytes(ws):
+    """Size of a whole-sheet read (get_all_values / get_all_records)."""
+    return sum(len(v) for row in ws.rows for v in row)
+
+
+def run_case(n_rows, target):
+    content = FakeWorksheet("ContentPlan", make_content_rows(n_rows))
+    sh = FakeSpreadsheet([content, FakeWorksheet("PostLog", [["timestamp"]])])
+    bot.invalidate_sheets_cache()
+    bot.get_spreadsheet = lambda: sh
+    bot.ARCHIVE_TARGET = target
+    bot.ARCHIVE_PATH = os.path.join(STATE_DIR, f"archive_{n_rows}.jsonl.gz")
+    bot.ARCHIVE_SHEET = f"ContentArchive{n_rows}"
+    ids_before = {r[0] for r in content.rows[1:]}
+
+    full_before = sheet_bytes(content)
+    before_bytes, due_before = scan_cost(content)
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        moved = bot.archive_finished_rows()
+    archive_s = time.perf_counter() - started
+    after_bytes, due_after = scan_cost(content)
+    full_after = sheet_bytes(content)
+
+    if target == "sheet":
+        archived = [r[0] for r in sh.sheets[bot.ARCHIVE_SHEET].rows[1:]]
+    else:
+        with gzip.open(bot.ARCHIVE_PATH, "rt", encoding="utf-8") as f:
+            archived = [json.loads(line)["id"] for line in f]
+    kept = [r[0] for r in content.rows[1:]]
+    assert len(archived) == moved and set(archived) | set(kept) == ids_before
+    assert not set(archived) & set(kept)
+    assert due_before == due_after, "archiving changed which rows are due"
+    return moved, (before_bytes, after_bytes), (full_before, full_after), archive_s
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--target", choices=["sheet", "local"], default="sheet")
+    args = parser.parse_args()
+
+    print(f"archive target: {args.target}")
+    print(f"{'rows':>8} {'archived':>9} | {'scan KB':>17} | {'full read KB':>19} | {'archive s':>9}")
+    for n_rows in args.sizes:
+        moved, scan, full, seconds = run_case(n_rows, args.target)
+        print(f"{n_rows:>8} {moved:>9} | {scan[0] / 1024:>7.1f} -> {scan[1] / 1024:>6.1f} | "
+              f"{full[0] / 1024:>8.0f} -> {full[1] / 1024:>6.0f} | {seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Several bot runs working the same ContentPlan at once (threads standing in
+for overlapping cron runs / workers), against the in-memory sheet stand-in.
+Counts how often each (content_id, platform, target) is posted, with row
+leases on and off. A few rows start with an expired lease from a "dead" run
+and must be reclaimed. Run from the repo root:
+
+    python -m benchmarks.bench_concurrent_runners
+    python -m benchmarks.bench_concurrent_runners --rows 200 --runners 6 --max-rows 25
+"""
+
+import argparse
+import contextlib
+import io
+import threading
+import time
+from collections import Counter
+
+from benchmarks.fake_sheets import CONTENT_HEADERS, bench_env, make_bot_spreadsheet, make_pending_rows
+
+bench_env(
+    "bench_runners_",
+    RUN_MODE="simulate",
+    DOCX_LOG="0",  # keep docx I/O out of the measurement
+    PENDING_INDEX="0",
+    # Each runner must rely on the sheet alone, not on a shared local ledger
+    POST_LEDGER="0",
+)
+
+import bot  # noqa: E402  (env above must be set before import)
+
+STATUS_COL = CONTENT_HEADERS.index("status")
+DEAD_ROWS = 3
+
+
+def make_spreadsheet(n_rows, latency_s):
+    content = make_pending_rows(n_rows, 4)
+    # Rows left behind by a run that died long ago
+    for row in content[1:DEAD_ROWS + 1]:
+        row[STATUS_COL] = "processing:dead-runner:1"
+    return make_bot_spreadsheet(content, 4, latency_s)
+
+
+def run(args, leases):
+    sh = make_spreadsheet(args.rows, args.sheet_latency_ms / 1000)
+    bot.get_spreadsheet = lambda: sh
+    bot.invalidate_sheets_cache()
+    bot.invalidate_clients_cache()
+    bot.CLAIM_LEASES = leases
+
+    posts = Counter()
+    lock = threading.Lock()
+
+    def count(key):
+        with lock:
+            posts[key] += 1
+
+    def runner(delay):
+        time.sleep(delay)
+        for _ in range(args.runs_each):
+            bot.process_all_pending_items()
+
+    original_post = bot.post_to_platform
+    original_batch = bot.post_facebook_batch
+    bot.post_to_platform = lambda platform, caption, image_url, client: (
+        count((caption, platform)), original_post(platform, caption, image_url, client)
+    )[1]
+    bot.post_facebook_batch = lambda ops: (
+        [count((op["task"]["caption"], "FB")) for op in ops], original_batch(ops)
+    )[1]
+    started = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            threads = [
+                threading.Thread(target=runner, args=(i * args.stagger_ms / 1000,))
+                for i in range(args.runners)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+    finally:
+        bot.post_to_platform = original_post
+        bot.post_facebook_batch = original_batch
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(r[STATUS_COL] for r in sh.sheets["ContentPlan"].rows[1:])
+    duplicates = sum(n - 1 for n in posts.values() if n > 1)
+    return posts, duplicates, statuses, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--runners", type=int, default=4)
+    parser.add_argument("--runs-each", type=int, default=3)
+    parser.add_argument("--max-rows", type=int, default=0, help="CLAIM_MAX_ROWS per run")
+    parser.add_argument("--stagger-ms", type=float, default=30.0)
+    parser.add_argument("--sheet-latency-ms", type=float, default=20.0)
+    parser.add_argument("--post-latency-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    bot.SIMULATE_LATENCY_SECONDS = args.post_latency_ms / 1000
+    bot.LEASE_SETTLE_SECONDS = 0.2
+    bot.CLAIM_MAX_ROWS = args.max_rows
+
+    targets = args.rows * 3
+    print(f"{args.runners} runners x {args.runs_each} runs, {args.rows} rows ({targets} posts due), "
+          f"{DEAD_ROWS} rows with an expired lease")
+    print(f"{'leases':>7} {'posts':>6} {'dupes':>6} {'seconds':>8}  statuses")
+    for leases in (False, True):
+        posts, duplicates, statuses, elapsed = run(args, leases)
+        print(f"{'on' if leases else 'off':>7} {sum(posts.values()):>6} {duplicates:>6} {elapsed:>8.2f}  "
+              f"{dict(statuses)}")
+        if leases:
+            assert duplicates == 0, [k for k, n in posts.items() if n > 1]
+            assert len(posts) == targets, len(posts)
+            assert statuses == {"posted": args.rows}, statuses
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Facebook fan-out (page post + group posts per row) against the local stub
+Graph server, one request per page post vs Graph batch calls, then a
+partial-failure run checking that every batch sub-response is mapped back to
+its content ID / target in PostLog, targets_status and the row status.
+Run from the repo root:
+
+    python -m benchmarks.bench_fb_batch
+    python -m benchmarks.bench_fb_batch --rows 100 --groups 4 --latency-ms 80
+"""
+
+import argparse
+import contextlib
+import io
+import time
+
+from benchmarks.fake_sheets import CONTENT_HEADERS, bench_env, make_bot_spreadsheet, make_pending_rows
+from benchmarks.stub_graph import start_stub_graph
+
+bench_env(
+    "bench_fb_batch_",
+    RUN_MODE="live",
+    DOCX_LOG="0",  # keep docx I/O out of the measurement
+    PENDING_INDEX="0",
+    POST_LEDGER="0",  # every run posts the same content IDs again
+    LEASE_SETTLE_SECONDS="0",  # single runner: nothing competes for the row leases
+)
+
+import bot  # noqa: E402  (env above must be set before import)
+
+
+def run_once(server, rows, groups, clients, batch):
+    group_ids = ", ".join(f"90{g}" for g in range(groups))
+    sh = make_bot_spreadsheet(make_pending_rows(rows, clients, platforms="FB", groups=group_ids), clients)
+    bot.get_spreadsheet = lambda: sh
+    bot.invalidate_sheets_cache()
+    bot.invalidate_clients_cache()
+    bot.FB_BATCH_ENABLED = batch
+    server.stats.clear()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        bot.process_all_pending_items()
+    return sh, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--groups", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=6)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    server = start_stub_graph(latency_s=args.latency_ms / 1000)
+    bot.GRAPH_API_BASE = server.base_url
+
+    print(f"{args.rows} FB rows x (1 page + {args.groups} groups), {args.latency_ms:.0f} ms per request")
+    print(f"{'mode':>10} {'requests':>9} {'targets':>8} {'seconds':>8}")
+    for label, batch in (("per-post", False), ("batched", True)):
+        sh, elapsed = run_once(server, args.rows, args.groups, args.clients, batch)
+        targets = server.stats["batch_ops"] if batch else server.stats["requests"]
+        print(f"{label:>10} {server.stats['requests']:>9} {targets:>8} {elapsed:>8.2f}")
+    print("(per-post mode only sends the page posts; group shares are simulated)")
+
+    # Partial failure: one client's page rejects posts, one group times out
+    server.fail_nodes = {"100"}
+    server.timeout_nodes = {"901"}
+    sh, _ = run_once(server, args.rows, args.groups, args.clients, True)
+    content = sh.sheets["ContentPlan"].rows
+    log = sh.sheets["PostLog"].rows[1:]
+
+    failed = [r for r in log if r[4].startswith("FAILED:")]
+    ok = [r for r in log if not r[4].startswith("FAILED:")]
+    assert len(log) == args.rows * (1 + args.groups), len(log)
+    assert all(r[2] in ("FB", "FB-Group: 901") for r in failed), failed
+    for r in failed:
+        row = content[int(r[1])]
+        assert r[2] == "FB-Group: 901" or row[4] == "client0", (r, row)
+    status_col = CONTENT_HEADERS.index("status")
+    statuses = {row[status_col] for row in content[1:]}
+    assert statuses == ({"retry"} if args.groups > 1 else {"posted", "retry"}), statuses
+    for row in content[1:]:
+        targets = bot.parse_targets_status(row[status_col + 1])
+        failed_targets = {name for name, t in targets.items() if t["status"] == "failed"}
+        expected = ({"FB"} if row[4] == "client0" else set()) | (
+            {"FB-Group: 901"} if args.groups > 1 else set()
+        )
+        assert failed_targets == expected, (row[0], targets)
+    print(f"partial failure: {len(ok)} ok, {len(failed)} failed target(s) logged; statuses {sorted(statuses)}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Facebook posting against the local stub Graph server: one fresh connection
+per call (bare requests.post, as post_to_facebook used to do) vs the shared
+keep-alive session. The stub charges --handshake-ms for every new connection.
+Run from the repo root:
+
+    python -m benchmarks.bench_http_pool
+    python -m benchmarks.bench_http_pool --posts 200 --handshake-ms 80 --workers 8
+"""
+
+import argparse
+import contextlib
+import io
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stub_graph import start_stub_graph
+
+os.environ["RUN_MODE"] = "live"
+
+import bot  # noqa: E402  (env above must be set before import)
+import requests  # noqa: E402
+
+CLIENT = {"fb_page_id": "1001", "fb_page_access_token": "token"}
+
+
+def run_case(server, workers, posts, pooled):
+    bot.close_http_session()
+    bot.HTTP_LATENCIES.clear()
+    server.stats.clear()
+    original = bot.get_http_session
+    if not pooled:
+        # The old behaviour: module-level requests.post, a new connection per call
+        bot.get_http_session = lambda: requests
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), ThreadPoolExecutor(workers) as pool:
+            results = list(pool.map(
+                lambda i: bot.post_to_facebook(f"post {i}", "", CLIENT), range(posts)
+            ))
+    finally:
+        bot.get_http_session = original
+    assert results == ["FB_POST_OK"] * posts, results
+
+    samples = [s for host in bot.HTTP_LATENCIES.values() for s in host]
+    return (
+        server.stats["connections"],
+        bot.latency_percentile(samples, 50) * 1000,
+        bot.latency_percentile(samples, 99) * 1000,
+        sum(samples),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--posts", type=int, default=100)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--handshake-ms", type=float, default=50.0)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    server = start_stub_graph(latency_s=args.latency_ms / 1000, handshake_s=args.handshake_ms / 1000)
+    bot.GRAPH_API_BASE = server.base_url
+    print(
+        f"{args.posts} FB posts, {args.workers} worker(s), "
+        f"{args.handshake_ms:.0f} ms handshake, {args.latency_ms:.0f} ms server time"
+    )
+    print(f"{'session':>10} {'conns':>6} {'p50 ms':>7} {'p99 ms':>7} {'total s':>8}")
+    for label, pooled in (("per-call", False), ("pooled", True)):
+        conns, p50, p99, total = run_case(server, args.workers, args.posts, pooled)
+        print(f"{label:>10} {conns:>6} {p50:>7.1f} {p99:>7.1f} {total:>8.2f}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
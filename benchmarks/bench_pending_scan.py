@@ -0,0 +1,70 @@
+"""
+find_all_pending_content(): full get_all_records scan vs the two-phase
+projected scan, on a synthetic ContentPlan that is mostly 'posted' history.
+Run from the repo root:
+
+    python -m benchmarks.bench_pending_scan
+    python -m benchmarks.bench_pending_scan --sizes 5000 --per-cell-us 2
+"""
+
+import argparse
+import time
+
+from benchmarks.fake_sheets import FakeWorksheet, bench_env, make_content_rows
+
+# Measure the scan itself, not the local pending index
+bench_env("bench_pending_scan_", PENDING_INDEX="0")
+
+import bot  # noqa: E402  (env above must be set before import)
+
+
+def legacy_find_all_pending_content(content_sheet):
+    records = content_sheet.get_all_records()
+    now = bot.get_bot_now()
+    pending_rows = []
+    for idx, row in enumerate(records, start=2):
+        date_val = bot.normalize_sheet_date(row.get("date"))
+        time_val = bot.normalize_sheet_time(row.get("time"))
+        if bot.is_row_due(row.get("status"), date_val, time_val, now):
+            row["date"], row["time"] = date_val, time_val
+            row["__row_index__"] = idx
+            pending_rows.append(row)
+    return pending_rows
+
+
+def measure(fn, ws):
+    ws.reset_stats()
+    started = time.perf_counter()
+    rows = fn(ws)
+    elapsed = time.perf_counter() - started
+    return rows, elapsed, ws.cells_read, ws.bytes_read, sum(ws.calls.values())
+
+
+def run(sizes, per_cell_s):
+    print(
+        f"{'rows':>8} {'due':>5} | {'full ms':>9} {'full KB':>9} {'calls':>5} | "
+        f"{'2-phase ms':>10} {'2-phase KB':>10} {'calls':>5} | {'KB ratio':>8}"
+    )
+    for n_rows in sizes:
+        ws = FakeWorksheet("ContentPlan", make_content_rows(n_rows), per_cell_s=per_cell_s)
+        old_rows, old_s, _, old_bytes, old_calls = measure(legacy_find_all_pending_content, ws)
+        new_rows, new_s, _, new_bytes, new_calls = measure(bot.find_all_pending_content, ws)
+
+        assert [r["__row_index__"] for r in old_rows] == [r["__row_index__"] for r in new_rows]
+        print(
+            f"{n_rows:>8} {len(new_rows):>5} | {old_s * 1000:>9.1f} {old_bytes / 1024:>9.0f} {old_calls:>5} | "
+            f"{new_s * 1000:>10.1f} {new_bytes / 1024:>10.0f} {new_calls:>5} | "
+            f"{old_bytes / max(new_bytes, 1):>7.1f}x"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--per-cell-us", type=float, default=0.0, help="simulated cost per cell read")
+    args = parser.parse_args()
+    run(args.sizes, args.per_cell_us / 1e6)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Posting throughput of process_all_pending_items() in simulate mode with
+injected per-call latency, serial (POST_WORKERS=1) vs the thread pool.
+Run from the repo root:
+
+    python -m benchmarks.bench_posting
+    python -m benchmarks.bench_posting --rows 50 --latency-ms 200 --workers 1 4 8 16
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from benchmarks.fake_sheets import CONTENT_HEADERS, bench_env, make_bot_spreadsheet, make_pending_rows
+
+os.environ.setdefault("RUN_MODE", "simulate")
+bench_env(
+    "bench_posting_",
+    DOCX_LOG="0",  # keep docx I/O out of the measurement
+    PENDING_INDEX="0",
+    POST_LEDGER="0",  # every run posts the same content IDs again
+    LEASE_SETTLE_SECONDS="0",  # single runner: nothing competes for the row leases
+)
+
+import bot  # noqa: E402  (env above must be set before import)
+
+
+def run(rows, clients, latency_s, workers_list):
+    bot.SIMULATE_LATENCY_SECONDS = latency_s
+    posts = rows * 3
+    print(f"{rows} rows x 3 platforms = {posts} posts, {latency_s * 1000:.0f} ms per post")
+    print(f"{'workers':>7} {'seconds':>8} {'posts/s':>8}")
+    for workers in workers_list:
+        sh = make_bot_spreadsheet(make_pending_rows(rows, clients), clients)
+        bot.get_spreadsheet = lambda: sh
+        bot.invalidate_sheets_cache()
+        bot.invalidate_clients_cache()
+        bot.POST_WORKERS = workers
+
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            bot.process_all_pending_items()
+        elapsed = time.perf_counter() - started
+
+        status_col = CONTENT_HEADERS.index("status")
+        statuses = {r[status_col] for r in sh.sheets["ContentPlan"].rows[1:]}
+        assert statuses == {"posted"}, statuses
+        print(f"{workers:>7} {elapsed:>8.2f} {posts / elapsed:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=50)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8, 16])
+    args = parser.parse_args()
+    run(args.rows, args.clients, args.latency_ms / 1000, args.workers)
+
+
+if __name__ == "__main__":
+    main()
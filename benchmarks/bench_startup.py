@@ -0,0 +1,106 @@
+"""
+Start-up cost of bot.py: `python -X importtime` for `import bot`, for a
+scheduler run with nothing due (answered from the pending index plus one
+Drive version call, stubbed here), and for the third-party imports the bot
+used to load eagerly. Each case runs in a fresh interpreter. Run from the
+repo root:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+HEAVY_MODULES = ["gspread", "google.oauth2", "requests", "docx", "dotenv"]
+
+IMPORT_BOT = "import bot"
+
+# The Drive call is the only network step of a no-op run; answer it locally
+NOOP_RUN = """
+import json, time
+import bot
+conn = bot.open_pending_index()
+with conn:
+    bot._set_index_meta(conn, "headers", json.dumps(["id", "date", "time", "status"]))
+    bot._set_index_meta(conn, "last_full_sync", time.time())
+    bot._set_index_meta(conn, "spreadsheet_version", "7")
+conn.close()
+bot.current_spreadsheet_version = lambda: "7"
+assert bot.process_all_pending_items() == 0
+"""
+
+EAGER_IMPORTS = """
+import requests
+from dotenv import load_dotenv
+import gspread
+from google.oauth2.service_account import Credentials
+from google.auth.transport.requests import Request
+from docx import Document
+"""
+
+REPORT = """
+import sys
+print("LOADED", ",".join(m for m in {heavy!r} if m in sys.modules))
+"""
+
+
+def run_case(code, env, repeat):
+    """Returns (median wall ms, median cumulative import ms, loaded heavy modules)."""
+    script = code + REPORT.format(heavy=HEAVY_MODULES)
+    walls, imports, loaded = [], [], ""
+    for _ in range(repeat):
+        started = time.perf_counter()
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", script],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        walls.append((time.perf_counter() - started) * 1000)
+        total = 0
+        for line in proc.stderr.splitlines():
+            # "import time: self | cumulative | name"; top-level imports have no indent
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line.split("|")
+                if cumulative.strip().isdigit() and not name.startswith("  "):
+                    total += int(cumulative)
+        imports.append(total / 1000)
+        loaded = proc.stdout.split("LOADED", 1)[1].strip()
+    return statistics.median(walls), statistics.median(imports), loaded or "-"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    state_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    env.update({
+        "PYTHONPATH": os.getcwd(),
+        "RUN_MODE": "simulate",
+        "BOT_STATE_DIR": state_dir,
+        "POSTLOG_SPOOL_PATH": os.path.join(state_dir, "postlog_spool.csv"),
+        "CLIENTS_CACHE_PATH": os.path.join(state_dir, "clients_cache.json"),
+        "GOOGLE_SHEETS_DOC_KEY": "bench-startup",
+    })
+    # Warm the bytecode cache so no case pays for compiling bot.py
+    subprocess.run([sys.executable, "-c", IMPORT_BOT], env=env, check=True)
+
+    print(f"{'case':<28}{'wall ms':>10}{'imports ms':>12}  heavy modules loaded")
+    for label, code in [
+        ("import bot", IMPORT_BOT),
+        ("no-op run (nothing due)", NOOP_RUN),
+        ("old eager imports alone", EAGER_IMPORTS),
+    ]:
+        wall, imported, loaded = run_case(code, env, args.repeat)
+        print(f"{label:<28}{wall:>10.0f}{imported:>12.0f}  {loaded}")
+
+
+if __name__ == "__main__":
+    main()
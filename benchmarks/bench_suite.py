@@ -0,0 +1,227 @@
+"""
+Synthetic-load benchmark suite for the scheduler pipeline. For each
+ContentPlan size it times normalize_sheet_date/normalize_sheet_time,
+find_all_pending_content (projected scan and pending index),
+add_content_item and a full simulate-mode process_all_pending_items, and
+reports throughput, p50/p99 latency, Sheets calls per operation and peak
+memory (tracemalloc, from one extra untimed pass). Results are written as
+JSON; --compare flags cases whose p50 got slower than a saved run.
+Run from the repo root:
+
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --sizes 1000 10000 --out bench.json
+    python -m benchmarks.bench_suite --storage sqlite --compare bench.json
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+
+from benchmarks.fake_sheets import (
+    POSTLOG_HEADERS, bench_env, make_bot_spreadsheet, make_clients_rows, make_content_rows,
+)
+
+STATE_DIR = bench_env(
+    "bench_suite_",
+    RUN_MODE="simulate",
+    POST_LEDGER="0",  # every repeat posts the same content ids again
+    LEASE_SETTLE_SECONDS="0",
+    RUN_DEADLINE_SECONDS="0",
+)
+
+import bot  # noqa: E402  (env above must be set before import)
+
+# Date/time spellings seen in real sheets, including blanks and junk
+DATE_SAMPLES = ["2024-01-01", "01/02/2024", "15-03-2024", "2024/05/06", "2024-07-08 10:00:00", "", "soon"]
+TIME_SAMPLES = ["10:00", "10:00:00", "", "9:5", "late"]
+
+
+def build_spreadsheet(storage, n_rows, pending_every=50):
+    """A ContentPlan of n_rows (mostly 'posted' history) plus PostLog and Clients."""
+    content = make_content_rows(n_rows, pending_every=pending_every)
+    bot.invalidate_sheets_cache()
+    bot.invalidate_clients_cache()
+    if storage == "sqlite":
+        path = os.path.join(STATE_DIR, f"storage_{n_rows}.sqlite")
+        if os.path.exists(path):
+            os.remove(path)
+        sh = bot.SqliteSpreadsheet(path)
+        sh.worksheet("ContentPlan").replace_all(content)
+        sh.worksheet("PostLog").replace_all([list(POSTLOG_HEADERS)])
+        sh.worksheet("Clients").replace_all(make_clients_rows(5))
+    else:
+        sh = make_bot_spreadsheet(content, 5)
+    bot.get_spreadsheet = lambda: sh
+    return sh
+
+
+def measure(case, n_rows, fn, repeat, setup=None, unit="call"):
+    """
+    Run fn(state) `repeat` times (state = setup(), untimed) and one more time
+    under tracemalloc. fn returns how many `unit`s it handled (None = 1).
+    Returns one result dict.
+    """
+    latencies, ops = [], 0
+    calls = Counter()
+    for _ in range(repeat):
+        state = setup() if setup else None
+        bot.reset_run_stats()
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            done = fn(state)
+        latencies.append(time.perf_counter() - started)
+        ops += 1 if done is None else done
+        calls["reads"] += bot.RUN_STATS["sheets_reads"]
+        calls["writes"] += bot.RUN_STATS["sheets_writes"]
+
+    state = setup() if setup else None
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        fn(state)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    latencies.sort()
+    total = sum(latencies)
+    return {
+        "case": case,
+        "rows": n_rows,
+        "repeat": repeat,
+        "ops": ops,
+        "unit": unit,
+        "seconds": round(total, 6),
+        "throughput_per_s": round(ops / total, 2) if total else None,
+        "p50_ms": round(bot.latency_percentile(latencies, 50) * 1000, 4),
+        "p99_ms": round(bot.latency_percentile(latencies, 99) * 1000, 4),
+        "sheets_reads_per_call": round(calls["reads"] / repeat, 2),
+        "sheets_writes_per_call": round(calls["writes"] / repeat, 2),
+        "peak_mem_kb": round(peak / 1024, 1),
+    }
+
+
+def run_size(storage, n_rows, repeat):
+    results = []
+
+    # Pure parsing: batches of 1000 calls, so a "call" is long enough to time
+    def normalize(_):
+        for i in range(1000):
+            bot.normalize_sheet_date(DATE_SAMPLES[i % len(DATE_SAMPLES)])
+            bot.normalize_sheet_time(TIME_SAMPLES[i % len(TIME_SAMPLES)])
+        return 1000
+
+    results.append(measure("normalize_date_time", n_rows, normalize, max(repeat, 20), unit="value"))
+
+    sh = build_spreadsheet(storage, n_rows)
+    content = sh.worksheet("ContentPlan")
+    due_rows = len(bot.find_all_pending_content(content))
+
+    def find(_):
+        bot.find_all_pending_content(content)
+
+    bot.PENDING_INDEX_ENABLED = False
+    results.append(measure("find_all_pending_content[scan]", n_rows, find, repeat))
+    if storage == "fake":
+        bot.PENDING_INDEX_ENABLED = True
+        bot.find_all_pending_content(content)  # first call builds the index
+        results.append(measure("find_all_pending_content[index]", n_rows, find, repeat))
+        bot.PENDING_INDEX_ENABLED = False
+
+    def add(_):
+        bot.add_content_item("2099-01-01", "10:00", "FB", "bench", client_key="client1")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        add(None)  # seeds the ID allocator
+    results.append(measure("add_content_item", n_rows, add, max(repeat * 10, 20)))
+
+    def setup_run():
+        return build_spreadsheet(storage, n_rows)
+
+    def run(_):
+        return bot.process_all_pending_items()
+
+    results.append(measure("process_all_pending_items", n_rows, run, repeat, setup=setup_run, unit="row"))
+    for r in results:
+        r["due_rows"] = due_rows
+    return results
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(results, baseline_path, tolerance):
+    """Print p50 ratios against a saved run; returns the regressed cases."""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {(r["case"], r["rows"]): r for r in json.load(f)["results"]}
+    regressions = []
+    print(f"\nvs {baseline_path} (p50, tolerance {tolerance:.0%})")
+    for r in results:
+        old = baseline.get((r["case"], r["rows"]))
+        if not old or not old["p50_ms"]:
+            continue
+        ratio = r["p50_ms"] / old["p50_ms"]
+        flag = "REGRESSED" if ratio > 1 + tolerance else ""
+        if flag:
+            regressions.append(r)
+        print(f"{r['case']:<34}{r['rows']:>8} {old['p50_ms']:>10.3f} -> {r['p50_ms']:>10.3f} ms "
+              f"{ratio:>6.2f}x {flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--storage", choices=["fake", "sqlite"], default="fake")
+    parser.add_argument("--out", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier --out file to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+
+    bot.STORAGE_BACKEND = "sqlite" if args.storage == "sqlite" else "sheets"
+    results = []
+    print(f"{'case':<34}{'rows':>8}{'per s':>16}{'p50 ms':>10}{'p99 ms':>10}"
+          f"{'reads':>7}{'writes':>7}{'peak KB':>10}")
+    for n_rows in args.sizes:
+        for r in run_size(args.storage, n_rows, args.repeat):
+            results.append(r)
+            rate = f"{r['throughput_per_s'] or 0:.1f} {r['unit']}s"
+            print(f"{r['case']:<34}{r['rows']:>8}{rate:>16}"
+                  f"{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['sheets_reads_per_call']:>7.1f}"
+                  f"{r['sheets_writes_per_call']:>7.1f}{r['peak_mem_kb']:>10.0f}")
+
+    report = {
+        "meta": {
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "storage": args.storage,
+            "sizes": args.sizes,
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {args.out}")
+
+    if args.compare and compare(results, args.compare, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Word log cost: the old per-entry writer (open, append, save the whole .docx
+for every post) vs the buffered writer (one save per run, rotated by month
+and size). The old writer is only run for --old-entries and its total for
+--entries is extrapolated from the per-entry cost growth. Run from the repo
+root:
+
+    python -m benchmarks.bench_word_log
+    python -m benchmarks.bench_word_log --entries 10000 --runs 10 --old-entries 500
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import time
+
+from benchmarks.fake_sheets import bench_env
+
+STATE_DIR = bench_env("bench_word_log_")
+
+import bot  # noqa: E402  (env above must be set before import)
+from docx import Document  # noqa: E402
+
+CAPTION = "Caption text " * 20 + "#globalbiznex #marketing"
+
+
+def old_log_to_word_doc(path, content_id, platform, caption, post_url):
+    """The pre-buffering writer: re-open and re-save the whole file per entry."""
+    doc = Document(path) if os.path.exists(path) else Document()
+    doc.add_paragraph(f"Time: {time.strftime('%Y-%m-%d %H:%M:%S')}")
+    doc.add_paragraph(f"Content ID: {content_id}")
+    doc.add_paragraph(f"Platform: {platform}")
+    doc.add_paragraph("Caption:")
+    doc.add_paragraph(caption)
+    doc.add_paragraph(f"Post URL: {post_url}")
+    doc.add_paragraph("-" * 40)
+    doc.save(path)
+
+
+def run_old(n):
+    path = os.path.join(STATE_DIR, "old_post_log.docx")
+    timings = []
+    for i in range(n):
+        started = time.perf_counter()
+        old_log_to_word_doc(path, i, "FB", CAPTION, f"https://facebook.com/{i}")
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def run_buffered(entries, runs):
+    """`entries` entries spread over `runs` runs; returns (seconds, files)."""
+    per_run = entries // runs
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for r in range(runs):
+            word_log = bot.new_word_log_buffer()
+            for i in range(per_run):
+                content_id = r * per_run + i
+                bot.append_word_log(word_log, content_id, "FB", CAPTION, f"https://facebook.com/{content_id}")
+            bot.close_word_log(word_log)
+    elapsed = time.perf_counter() - started
+    files = sorted(f for f in os.listdir(STATE_DIR) if f.startswith("post_log"))
+    return elapsed, files
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", type=int, default=10000)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--old-entries", type=int, default=500)
+    args = parser.parse_args()
+
+    timings = run_old(args.old_entries)
+    # Per-entry cost grows ~linearly with file size: least-squares fit, then sum
+    n = len(timings)
+    mean_x, mean_y = (n - 1) / 2, sum(timings) / n
+    slope = sum((i - mean_x) * (t - mean_y) for i, t in enumerate(timings)) / max(
+        1e-12, sum((i - mean_x) ** 2 for i in range(n))
+    )
+    first = mean_y - slope * mean_x
+    last = first + slope * (n - 1)
+    estimate = sum(first + slope * i for i in range(args.entries))
+    print(f"old writer: {args.old_entries} entries in {sum(timings):.2f}s "
+          f"({first * 1000:.1f} ms/entry at start, {last * 1000:.1f} ms/entry at the end)")
+    print(f"old writer, {args.entries} entries (extrapolated): ~{estimate:.0f}s")
+
+    bot.reset_run_stats()
+    elapsed, files = run_buffered(args.entries, args.runs)
+    print(f"buffered:   {args.entries} entries over {args.runs} run(s) in {elapsed:.2f}s, "
+          f"{bot.RUN_STATS['docx_saves']} save(s), files: {', '.join(files)}")
+
+
+if __name__ == "__main__":
+    main()
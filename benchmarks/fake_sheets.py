@@ -0,0 +1,365 @@
+"""
+In-memory stand-ins for gspread Spreadsheet/Worksheet objects, used by the
+benchmarks. They implement only the calls bot.py makes, count every call and
+the number of cells/bytes each read returns, and can add a simulated network
+cost per call (latency_s) and per cell transferred (per_cell_s).
+
+Also holds what the benchmarks share: bench_env() for the environment they
+set before importing bot, and builders for ContentPlan/Clients/PostLog.
+"""
+
+import os
+import re
+import tempfile
+import time
+import threading
+from collections import Counter
+
+import gspread
+from gspread.utils import a1_to_rowcol
+
+
+def _col_number(letters):
+    n = 0
+    for ch in letters:
+        n = n * 26 + ord(ch) - 64
+    return n
+
+
+def parse_a1_range(a1):
+    """
+    "A2:C10" -> (2, 1, 10, 3). Open ranges such as "J2:J" end at a huge row.
+    """
+    a1 = a1.split("!")[-1].replace("$", "")
+    if ":" not in a1:
+        row, col = a1_to_rowcol(a1)
+        return row, col, row, col
+    start, end = a1.split(":")
+    m1 = re.match(r"([A-Z]*)(\d*)$", start)
+    m2 = re.match(r"([A-Z]*)(\d*)$", end)
+    r1 = int(m1.group(2) or 1)
+    r2 = int(m2.group(2)) if m2.group(2) else 10 ** 9
+    c1 = _col_number(m1.group(1)) if m1.group(1) else 1
+    c2 = _col_number(m2.group(1)) if m2.group(1) else 10 ** 4
+    return r1, c1, r2, c2
+
+
+class FakeWorksheet:
+    def __init__(self, title, rows, latency_s=0.0, per_cell_s=0.0):
+        self.title = title
+        self.id = abs(hash(title)) % 10 ** 9
+        self.rows = [[str(v) for v in r] for r in rows]
+        self.latency_s = latency_s
+        self.per_cell_s = per_cell_s
+        self.calls = Counter()
+        self.cells_read = 0
+        self.bytes_read = 0
+        self.lock = threading.RLock()
+        self.spreadsheet = None
+
+    # --- accounting ---
+
+    def _call(self, name, payload=None):
+        self.calls[name] += 1
+        cells = 0
+        if payload is not None:
+            for row in payload:
+                cells += len(row)
+                self.bytes_read += sum(len(str(v)) for v in row)
+            self.cells_read += cells
+        delay = self.latency_s + cells * self.per_cell_s
+        if delay:
+            time.sleep(delay)
+
+    def touch(self):
+        """Record an edit (bumps the parent spreadsheet's Drive version)."""
+        if self.spreadsheet is not None:
+            self.spreadsheet.version += 1
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.cells_read = 0
+        self.bytes_read = 0
+
+    def _cell(self, row, col):
+        if row - 1 < len(self.rows) and col - 1 < len(self.rows[row - 1]):
+            return self.rows[row - 1][col - 1]
+        return ""
+
+    def _set(self, row, col, value):
+        while len(self.rows) < row:
+            self.rows.append([])
+        r = self.rows[row - 1]
+        while len(r) < col:
+            r.append("")
+        r[col - 1] = str(value)
+
+    def _block(self, a1):
+        r1, c1, r2, c2 = parse_a1_range(a1)
+        r2 = min(r2, len(self.rows))
+        block = [self.rows[r - 1][c1 - 1:c2] for r in range(r1, r2 + 1)]
+        # Sheets trims trailing empty rows and cells
+        for row in block:
+            while row and row[-1] == "":
+                row.pop()
+        while block and not block[-1]:
+            block.pop()
+        return block
+
+    # --- reads ---
+
+    def get_all_records(self, **kwargs):
+        with self.lock:
+            self._call("get_all_records", self.rows)
+            header = self.rows[0] if self.rows else []
+            return [
+                dict(zip(header, r + [""] * (len(header) - len(r))))
+                for r in self.rows[1:]
+            ]
+
+    def get_all_values(self, **kwargs):
+        with self.lock:
+            self._call("get_all_values", self.rows)
+            return [list(r) for r in self.rows]
+
+    def row_values(self, row, **kwargs):
+        with self.lock:
+            values = self._block(f"A{row}:ZZ{row}")
+            values = values[0] if values else []
+            self._call("row_values", [values])
+            return values
+
+    def col_values(self, col, **kwargs):
+        with self.lock:
+            values = [self._cell(r, col) for r in range(1, len(self.rows) + 1)]
+            while values and values[-1] == "":
+                values.pop()
+            self._call("col_values", [values])
+            return values
+
+    def batch_get(self, ranges, major_dimension=None, **kwargs):
+        with self.lock:
+            out = []
+            for a1 in ranges:
+                block = self._block(a1)
+                if major_dimension == "COLUMNS":
+                    width = max((len(r) for r in block), default=0)
+                    block = [
+                        [r[c] if c < len(r) else "" for r in block]
+                        for c in range(width)
+                    ]
+                    for col in block:
+                        while col and col[-1] == "":
+                            col.pop()
+                out.append(block)
+            self._call("batch_get", [v for block in out for v in block])
+            return out
+
+    # --- writes ---
+
+    def update_cell(self, row, col, value):
+        with self.lock:
+            self._call("update_cell")
+            self.touch()
+            self._set(row, col, value)
+
+    def batch_update(self, data, **kwargs):
+        with self.lock:
+            self._call("batch_update")
+            self.touch()
+            for item in data:
+                r1, c1, _, _ = parse_a1_range(item["range"])
+                for i, values in enumerate(item["values"]):
+                    for j, value in enumerate(values):
+                        self._set(r1 + i, c1 + j, value)
+            return {"totalUpdatedCells": sum(len(v) for d in data for v in d["values"])}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        with self.lock:
+            self._call("append_rows")
+            self.touch()
+            start = len(self.rows) + 1
+            for row in values:
+                self.rows.append([str(v) for v in row])
+            end = len(self.rows)
+            return {
+                "updates": {
+                    "updatedRange": f"{self.title}!A{start}:Z{end}",
+                    "updatedRows": len(values),
+                }
+            }
+
+    def delete_rows(self, start_index, end_index=None):
+        with self.lock:
+            self._call("delete_rows")
+            self.touch()
+            end_index = end_index or start_index
+            del self.rows[start_index - 1:end_index]
+
+
+class _FakeResponse:
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class _FakeHTTPClient:
+    """Answers the Drive files.get call bot.fetch_spreadsheet_version() makes."""
+
+    def __init__(self, spreadsheet):
+        self.spreadsheet = spreadsheet
+        self.calls = Counter()
+
+    def request(self, method, url, params=None, **kwargs):
+        self.calls["drive_files_get"] += 1
+        return _FakeResponse({"version": str(self.spreadsheet.version)})
+
+
+class _FakeClient:
+    def __init__(self, spreadsheet):
+        self.http_client = _FakeHTTPClient(spreadsheet)
+
+
+class FakeSpreadsheet:
+    def __init__(self, worksheets=(), latency_s=0.0, per_cell_s=0.0):
+        self.id = "fake-spreadsheet"
+        self.latency_s = latency_s
+        self.per_cell_s = per_cell_s
+        self.version = 1
+        self.client = _FakeClient(self)
+        self.calls = Counter()
+        self.sheets = {}
+        for ws in worksheets:
+            self.add(ws)
+
+    def add(self, ws):
+        ws.spreadsheet = self
+        self.sheets[ws.title] = ws
+        return ws
+
+    def worksheet(self, title):
+        self.calls["worksheet"] += 1
+        try:
+            return self.sheets[title]
+        except KeyError:
+            raise gspread.exceptions.WorksheetNotFound(title)
+
+    def worksheets(self):
+        self.calls["worksheets"] += 1
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title, rows=1, cols=1, **kwargs):
+        self.calls["add_worksheet"] += 1
+        self.version += 1
+        return self.add(FakeWorksheet(title, [], self.latency_s, self.per_cell_s))
+
+    def batch_update(self, body):
+        """Spreadsheet batchUpdate; only deleteDimension on ROWS is supported."""
+        self.calls["batch_update"] += 1
+        by_id = {ws.id: ws for ws in self.sheets.values()}
+        for request in body["requests"]:
+            rng = request["deleteDimension"]["range"]
+            ws = by_id[rng["sheetId"]]
+            with ws.lock:
+                ws.touch()
+                del ws.rows[rng["startIndex"]:rng["endIndex"]]
+        return {"replies": [{} for _ in body["requests"]]}
+
+    def total_calls(self):
+        total = Counter(self.calls)
+        total.update(self.client.http_client.calls)
+        for ws in self.sheets.values():
+            total.update(ws.calls)
+        return total
+
+    def reset_stats(self):
+        self.calls.clear()
+        self.client.http_client.calls.clear()
+        for ws in self.sheets.values():
+            ws.reset_stats()
+
+
+def bench_env(prefix, **overrides):
+    """
+    Set the environment a benchmark needs before it imports bot: every local
+    state file in a fresh temp BOT_STATE_DIR, no Sheets rate limiting, then
+    `overrides` (e.g. RUN_MODE="simulate", POST_LEDGER="0"). Returns the dir.
+    """
+    state_dir = tempfile.mkdtemp(prefix=prefix)
+    os.environ["BOT_STATE_DIR"] = state_dir
+    for name, filename in [
+        ("CLIENTS_CACHE_PATH", "clients_cache.json"),
+        ("POSTLOG_SPOOL_PATH", "postlog_spool.csv"),
+        ("DOCX_LOG_PATH", "post_log.docx"),
+        ("DOCX_LOG_SPOOL_PATH", "docx_log_spool.jsonl"),
+        ("ID_ALLOCATOR_DB", "id_allocator.sqlite"),
+    ]:
+        os.environ[name] = os.path.join(state_dir, filename)
+    # The fake sheets have no quota; keep the rate limiter out of the numbers
+    os.environ["SHEETS_READS_PER_MINUTE"] = os.environ["SHEETS_WRITES_PER_MINUTE"] = "1000000"
+    os.environ.update({name: str(value) for name, value in overrides.items()})
+    return state_dir
+
+
+CONTENT_HEADERS = [
+    "id", "date", "time", "platforms", "client_key", "idea", "caption",
+    "image_url", "hashtags", "groups", "status",
+]
+CLIENTS_HEADERS = ["client_key", "active", "fb_page_id", "fb_page_access_token", "ig_business_id"]
+POSTLOG_HEADERS = ["timestamp", "content_id", "platform", "caption_used", "post_url"]
+
+
+def make_content_rows(n_rows, pending_every=50, today=None):
+    """
+    Synthetic ContentPlan: mostly 'posted' history with long captions,
+    one 'pending' row every pending_every rows (half of them due).
+    """
+    today = today or time.strftime("%Y-%m-%d")
+    rows = [list(CONTENT_HEADERS)]
+    for i in range(1, n_rows + 1):
+        pending = i % pending_every == 0
+        due = (i // pending_every) % 2 == 0
+        rows.append([
+            i,
+            today if (pending and due) else ("2099-01-01" if pending else "2024-01-01"),
+            "00:00",
+            "FB, IG, LinkedIn",
+            f"client{i % 5}",
+            f"Idea number {i} for a post",
+            "Caption text " * 20,
+            f"https://example.com/images/{i}.png",
+            "#globalbiznex #marketing",
+            "Group A, Group B",
+            "pending" if pending else "posted",
+        ])
+    return rows
+
+
+def make_pending_rows(n_rows, n_clients, platforms="FB, IG, LinkedIn", groups=""):
+    """ContentPlan where every row is pending and due now (blank date/time)."""
+    return [list(CONTENT_HEADERS)] + [
+        [i, "", "", platforms, f"client{i % n_clients}", f"idea {i}",
+         "", "", "", groups, "pending"]
+        for i in range(1, n_rows + 1)
+    ]
+
+
+def make_clients_rows(n_clients):
+    """Active clients client0..client<n-1>, each with its own page and token."""
+    return [list(CLIENTS_HEADERS)] + [
+        [f"client{i}", "yes", f"10{i}", f"token{i}", f"20{i}"] for i in range(n_clients)
+    ]
+
+
+def make_bot_spreadsheet(content_rows, n_clients, latency_s=0.0):
+    """ContentPlan from `content_rows`, an empty PostLog and n_clients Clients."""
+    return FakeSpreadsheet([
+        FakeWorksheet("ContentPlan", content_rows, latency_s),
+        FakeWorksheet("PostLog", [list(POSTLOG_HEADERS)], latency_s),
+        FakeWorksheet("Clients", make_clients_rows(n_clients), latency_s),
+    ])
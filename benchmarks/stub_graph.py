@@ -0,0 +1,123 @@
+"""
+A local stand-in for the Facebook Graph API, for benchmarks and failure
+tests. It speaks HTTP/1.1 with keep-alive, answers POST /<version>/<id>/feed
+and /<id>/photos with a fake post id, runs Graph `batch` calls (POST to the
+version root), and counts requests, batch operations and new TCP
+connections. Posts to nodes in fail_nodes get a 403; in a batch, nodes in
+timeout_nodes get a null response. handshake_s adds a delay to every new
+connection (a stand-in for the TCP+TLS handshake to graph.facebook.com);
+latency_s to every request.
+
+    server = start_stub_graph(handshake_s=0.05)
+    os.environ["GRAPH_API_BASE"] = server.base_url
+    ...
+    server.shutdown()
+"""
+
+import itertools
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote
+
+
+class _GraphHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.count("connections")
+        if self.server.handshake_s:
+            time.sleep(self.server.handshake_s)
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        form = _form(self.rfile.read(length).decode())
+        self.server.count("requests")
+        if self.server.latency_s:
+            time.sleep(self.server.latency_s)
+
+        parts = [p for p in self.path.split("?")[0].split("/") if p]
+        if len(parts) <= 1 and "batch" in form:
+            self._send_json(200, self.server.run_batch(form))
+            return
+        status, payload = self.server.post_object(parts, form)
+        self._send_json(status, payload)
+
+
+def _form(body):
+    return {k: v[0] for k, v in parse_qs(body).items()}
+
+
+class StubGraphServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, latency_s=0.0, handshake_s=0.0):
+        super().__init__(address, _GraphHandler)
+        self.latency_s = latency_s
+        self.handshake_s = handshake_s
+        self.stats = Counter()
+        self.post_ids = itertools.count(1)
+        # Nodes (page/group IDs) whose posts fail with 403 / time out in a batch
+        self.fail_nodes = set()
+        self.timeout_nodes = set()
+        self._lock = threading.Lock()
+
+    @property
+    def base_url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}/v20.0"
+
+    def post_object(self, parts, form):
+        """POST <node>/feed or <node>/photos -> (status, payload)."""
+        if len(parts) < 2 or parts[-1] not in ("feed", "photos"):
+            return 404, {"error": {"message": f"Unknown path {'/'.join(parts)}", "code": 803}}
+        if not form.get("access_token"):
+            return 400, {"error": {"message": "An access token is required", "code": 104}}
+        node = unquote(parts[-2])
+        if node in self.fail_nodes:
+            return 403, {"error": {"message": f"Permissions error posting to {node}", "code": 200}}
+        return 200, {"id": f"{node}_{next(self.post_ids)}"}
+
+    def run_batch(self, form):
+        """
+        Graph batch: one {code, body} per operation, or null for nodes in
+        timeout_nodes (as Graph does for operations that didn't finish).
+        """
+        results = []
+        for op in json.loads(form["batch"]):
+            self.count("batch_ops")
+            parts = [p for p in op["relative_url"].split("?")[0].split("/") if p]
+            op_form = _form(op.get("body") or "")
+            op_form.setdefault("access_token", form.get("access_token"))
+            if len(parts) >= 2 and unquote(parts[-2]) in self.timeout_nodes:
+                results.append(None)
+                continue
+            status, payload = self.post_object(parts, op_form)
+            results.append({"code": status, "body": json.dumps(payload)})
+        return results
+
+    def count(self, key, amount=1):
+        with self._lock:
+            self.stats[key] += amount
+
+
+def start_stub_graph(latency_s=0.0, handshake_s=0.0, port=0):
+    """Start a StubGraphServer on 127.0.0.1 in a background thread."""
+    server = StubGraphServer(("127.0.0.1", port), latency_s=latency_s, handshake_s=handshake_s)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
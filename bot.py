@@ -1,14 +1,28 @@
 import os
+import re
+import sys
+import argparse
+import contextlib
+import csv
+import json
+import math
+import time
+import random
+import signal
+import socket
+import sqlite3
 import datetime
-import requests
+import gzip
+import heapq
+import threading
+import urllib.parse
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 
-from dotenv import load_dotenv
-
-import gspread
-from google.oauth2.service_account import Credentials
-
-from docx import Document
-from docx.opc.exceptions import PackageNotFoundError
+# gspread/google-auth, requests, python-docx and dotenv are imported inside
+# the functions that use them: a run with nothing due (or app.py importing
+# add_content_item) shouldn't pay ~0.5s of imports it never needs.
 
 BOT_TIMEZONE_OFFSET_HOURS = 5
 BOT_TIMEZONE_OFFSET_MINUTES = 30
@@ -18,14 +32,239 @@ BOT_TIMEZONE_OFFSET_MINUTES = 30
 # 1. LOAD CONFIG / CLIENTS
 # =========================
 
-load_dotenv()
+def _load_dotenv():
+    # Skip importing python-dotenv when there is no .env to read (CI sets env vars)
+    here = os.path.dirname(os.path.abspath(__file__))
+    if os.path.exists(".env") or os.path.exists(os.path.join(here, ".env")):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+
+_load_dotenv()
 
 RUN_MODE = (os.getenv("RUN_MODE") or "simulate").lower()
 
 
 GOOGLE_SHEETS_CRED_PATH = os.getenv("GOOGLE_SHEETS_CRED_PATH")
 GOOGLE_SHEETS_DOC_NAME = os.getenv("GOOGLE_SHEETS_DOC_NAME")
+# Optional: open the spreadsheet by key (skips the Drive lookup by name)
+GOOGLE_SHEETS_DOC_KEY = os.getenv("GOOGLE_SHEETS_DOC_KEY")
+
+# Where ContentPlan, PostLog, Clients (and the bot's own tabs) live.
+# "sheets": the Google spreadsheet above.
+# "sqlite": the same worksheets in a local SQLite file (STORAGE_SQLITE_PATH),
+#           with status and due time indexed; for offline runs and load tests.
+#           `bot.py --sync push` mirrors it to the Google spreadsheet for
+#           human editing, `--sync pull` copies the spreadsheet back.
+# app.py saves through bot.py, so both use the same backend.
+STORAGE_BACKEND = (os.getenv("STORAGE_BACKEND") or "sheets").lower()
+STORAGE_SQLITE_PATH = os.getenv("STORAGE_SQLITE_PATH") or "bot_storage.sqlite"
+
+# Spreadsheet/worksheet handles are cached per process and re-opened after
+# this many seconds (the gspread client itself lives for the whole process).
+SHEETS_CACHE_TTL_SECONDS = float(os.getenv("SHEETS_CACHE_TTL_SECONDS") or 1800)
+
+# New content IDs come from an allocator instead of max(id)+1 over the sheet.
+# "sheet": every ID is one append to the IdCounter worksheet (Sheets serializes
+#          appends, so concurrent savers always get distinct rows/IDs).
+# "sqlite": a local counter in ID_ALLOCATOR_DB (tests / offline use).
+ID_ALLOCATOR = (os.getenv("ID_ALLOCATOR") or "sheet").lower()
+ID_COUNTER_SHEET = os.getenv("ID_COUNTER_SHEET") or "IdCounter"
+ID_ALLOCATOR_DB = os.getenv("ID_ALLOCATOR_DB") or "id_allocator.sqlite"
+
+# Every Sheets/Drive call goes through sheets_call(), which meters calls with a
+# token bucket per kind (Google's default quota is 60 reads and 60 writes per
+# minute per user) and retries 429/5xx errors with jittered exponential backoff.
+# Appends are only retried on 429: after a 5xx or a dropped connection the rows
+# may already be in the sheet.
+SHEETS_READS_PER_MINUTE = float(os.getenv("SHEETS_READS_PER_MINUTE") or 60)
+SHEETS_WRITES_PER_MINUTE = float(os.getenv("SHEETS_WRITES_PER_MINUTE") or 60)
+SHEETS_MAX_RETRIES = int(os.getenv("SHEETS_MAX_RETRIES") or 6)
+SHEETS_BACKOFF_BASE_SECONDS = float(os.getenv("SHEETS_BACKOFF_BASE_SECONDS") or 1)
+SHEETS_BACKOFF_MAX_SECONDS = float(os.getenv("SHEETS_BACKOFF_MAX_SECONDS") or 64)
+
+# Status changes are buffered and written in one batched call; a checkpoint
+# flush happens every STATUS_FLUSH_EVERY rows so a crash loses little.
+STATUS_FLUSH_EVERY = int(os.getenv("STATUS_FLUSH_EVERY") or 50)
+
+# Local state that should survive between runs (the workflow caches this dir).
+BOT_STATE_DIR = os.getenv("BOT_STATE_DIR") or ".bot_state"
+
+# PostLog rows are buffered and appended with append_rows(). The buffer is
+# flushed when it holds POSTLOG_FLUSH_ROWS rows or POSTLOG_FLUSH_SECONDS have
+# passed, at most POSTLOG_BATCH_MAX rows per call. Rows that cannot be written
+# at the end of a run are spooled to POSTLOG_SPOOL_PATH and retried next run.
+POSTLOG_FLUSH_ROWS = int(os.getenv("POSTLOG_FLUSH_ROWS") or 200)
+POSTLOG_FLUSH_SECONDS = float(os.getenv("POSTLOG_FLUSH_SECONDS") or 30)
+POSTLOG_BATCH_MAX = int(os.getenv("POSTLOG_BATCH_MAX") or 500)
+POSTLOG_SPOOL_PATH = os.getenv("POSTLOG_SPOOL_PATH") or os.path.join(BOT_STATE_DIR, "postlog_spool.csv")
+
+# Due rows are fetched in full with batch_get; rows up to PENDING_FETCH_MAX_GAP
+# apart are merged into one range, at most PENDING_FETCH_RANGES_PER_CALL ranges per call.
+PENDING_FETCH_MAX_GAP = int(os.getenv("PENDING_FETCH_MAX_GAP") or 2)
+PENDING_FETCH_RANGES_PER_CALL = int(os.getenv("PENDING_FETCH_RANGES_PER_CALL") or 100)
+
+# Persistent SQLite index of pending rows by due time. Each run only reads rows
+# appended since the last sync; a full reconcile of the id/status/date/time
+# columns runs every PENDING_INDEX_FULL_SYNC_SECONDS, or as soon as a fetched
+# row doesn't match its index entry. Set PENDING_INDEX=0 to always scan.
+PENDING_INDEX_ENABLED = (os.getenv("PENDING_INDEX") or "1").lower() in ["true", "yes", "1"]
+PENDING_INDEX_PATH = os.getenv("PENDING_INDEX_PATH") or os.path.join(BOT_STATE_DIR, "pending_index.sqlite")
+PENDING_INDEX_FULL_SYNC_SECONDS = float(os.getenv("PENDING_INDEX_FULL_SYNC_SECONDS") or 900)
+# The SQLite store indexes status and due time itself
+if STORAGE_BACKEND == "sqlite":
+    PENDING_INDEX_ENABLED = False
+
+# With the index enabled, each run first compares the spreadsheet's Drive
+# version with the one seen last run. If nothing changed, ContentPlan is not
+# read at all unless an indexed row has become due. Set SKIP_UNCHANGED_READS=0
+# to sync on every run.
+SKIP_UNCHANGED_READS = (os.getenv("SKIP_UNCHANGED_READS") or "1").lower() in ["true", "yes", "1"]
+
+# Active clients are cached on disk between runs. After the TTL the cache is
+# kept if the spreadsheet version is unchanged, otherwise the Clients sheet is
+# re-read. An unknown client_key always forces one re-read before 'bad_client'.
+# The file holds page access tokens, so it is kept out of BOT_STATE_DIR (which
+# the workflow uploads to the Actions cache); don't point it inside that dir.
+CLIENTS_CACHE_PATH = os.getenv("CLIENTS_CACHE_PATH") or "clients_cache.json"
+CLIENTS_CACHE_TTL_SECONDS = float(os.getenv("CLIENTS_CACHE_TTL_SECONDS") or 3600)
+
 
+# Posting runs on a thread pool: POST_WORKERS caps all in-flight posts,
+# POST_LIMIT_<PLATFORM> each platform and POST_LIMIT_PER_CLIENT each client_key.
+# Limits below 1 are raised to 1 (0 would leave tasks that can never start).
+POST_WORKERS = max(1, int(os.getenv("POST_WORKERS") or 8))
+POST_LIMIT_PER_CLIENT = max(1, int(os.getenv("POST_LIMIT_PER_CLIENT") or 2))
+PLATFORM_LIMITS = {
+    "FB": max(1, int(os.getenv("POST_LIMIT_FB") or 4)),
+    "IG": max(1, int(os.getenv("POST_LIMIT_IG") or 2)),
+    "LinkedIn": max(1, int(os.getenv("POST_LIMIT_LINKEDIN") or 2)),
+}
+
+# Every post target (content_id, platform, target) is recorded in a local
+# ledger before and after the call, so a rerun after a crash or a failed
+# status write skips targets that already went out instead of posting twice.
+# A target whose call started but never finished is "in doubt": it is not
+# re-posted automatically and is listed in the run summary. Entries older
+# than POST_LEDGER_RETENTION_DAYS are compacted away once a day. Simulate
+# runs use their own ledger file. Rows without an id are not ledgered: they
+# have nothing that tells one such row from another.
+POST_LEDGER_ENABLED = (os.getenv("POST_LEDGER") or "1").lower() in ["true", "yes", "1"]
+POST_LEDGER_PATH = os.getenv("POST_LEDGER_PATH") or os.path.join(
+    BOT_STATE_DIR, "post_ledger.sqlite" if RUN_MODE == "live" else f"post_ledger_{RUN_MODE}.sqlite"
+)
+POST_LEDGER_RETENTION_DAYS = float(os.getenv("POST_LEDGER_RETENTION_DAYS") or 90)
+
+# Before posting, a run claims its due rows: it re-reads their status cells
+# and drops rows that another run has leased or finished since the scan,
+# sets the rest to "processing:<owner>:<expires epoch>" in one batched
+# write, waits LEASE_SETTLE_SECONDS and re-reads the cells; only rows still
+# showing its own lease are processed. Sheets has no compare-and-set, so a
+# window remains: if a run's lease write lands more than
+# LEASE_SETTLE_SECONDS after its re-read (e.g. while it waits on the rate
+# limiter or a backoff), a faster run may have claimed and verified the same
+# rows in between and both post them. Keep LEASE_SETTLE_SECONDS above the
+# usual write latency. A lease left behind by a run that died is reclaimed
+# once it expires, so LEASE_SECONDS must exceed the longest run.
+# CLAIM_MAX_ROWS caps how many rows one run takes (0 = all due rows).
+CLAIM_LEASES = (os.getenv("CLAIM_LEASES") or "1").lower() in ["true", "yes", "1"]
+LEASE_SECONDS = int(os.getenv("LEASE_SECONDS") or 900)
+LEASE_SETTLE_SECONDS = float(os.getenv("LEASE_SETTLE_SECONDS") or 1)
+CLAIM_MAX_ROWS = int(os.getenv("CLAIM_MAX_ROWS") or 0)
+
+# Each row's per-target results are kept as JSON in its 'targets_status'
+# column (added to the header row if missing), e.g.
+#   {"FB": {"status": "posted", "attempts": 1, "url": "..."},
+#    "IG": {"status": "failed", "attempts": 1, "error": "...", "retry_at": "2024-05-01 10:20"}}
+# A row with failed targets left gets status 'retry' and is picked up again
+# once retry_at passes; only its failed targets are re-posted. Target n+1 is
+# tried RETRY_BACKOFF_MINUTES * 3^(n-1) minutes (capped) after attempt n, up
+# to RETRY_MAX_ATTEMPTS attempts, after which the row ends as 'partial'.
+TARGETS_STATUS_HEADER = "targets_status"
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS") or 4)
+RETRY_BACKOFF_MINUTES = float(os.getenv("RETRY_BACKOFF_MINUTES") or 5)
+RETRY_BACKOFF_MAX_MINUTES = float(os.getenv("RETRY_BACKOFF_MAX_MINUTES") or 240)
+
+# Rows are worked most overdue first, taking turns across client_key so one
+# client's backlog can't starve the others. A run stops starting new posts
+# after RUN_DEADLINE_SECONDS (posts in flight still finish); rows it didn't get
+# to are handed back to the next run with their finished targets recorded in
+# targets_status. Keep it below the cron interval and LEASE_SECONDS; 0 = no limit.
+RUN_DEADLINE_SECONDS = float(os.getenv("RUN_DEADLINE_SECONDS") or 45)
+
+# `bot.py --daemon` stays resident: it keeps every schedulable row in a heap
+# ordered by due time, sleeps until the earliest is due and then runs
+# process_all_pending_items(). A background thread re-syncs the heap from the
+# sheet every DAEMON_REFRESH_SECONDS (incrementally, via the pending index).
+DAEMON_REFRESH_SECONDS = float(os.getenv("DAEMON_REFRESH_SECONDS") or 60)
+
+# `bot.py --archive` moves finished rows (ARCHIVE_STATUSES) dated more than
+# ARCHIVE_AFTER_DAYS ago out of ContentPlan, so every read of the hot sheet
+# gets smaller. ARCHIVE_TARGET "sheet" appends them to the ARCHIVE_SHEET
+# worksheet; "local" appends them as JSON lines to the gzip file ARCHIVE_PATH.
+# Rows keep their ids, so PostLog entries still point at the right content.
+# Rows without a date are never archived (their age is unknown).
+ARCHIVE_AFTER_DAYS = float(os.getenv("ARCHIVE_AFTER_DAYS") or 30)
+ARCHIVE_STATUSES = [
+    s.strip().lower()
+    for s in (os.getenv("ARCHIVE_STATUSES") or "posted,partial,bad_client,no_platforms").split(",")
+    if s.strip()
+]
+ARCHIVE_TARGET = (os.getenv("ARCHIVE_TARGET") or "sheet").lower()
+ARCHIVE_SHEET = os.getenv("ARCHIVE_SHEET") or "ContentArchive"
+ARCHIVE_PATH = os.getenv("ARCHIVE_PATH") or "content_archive.jsonl.gz"
+
+# Platform API calls share one pooled HTTP session (keep-alive), so repeat
+# calls to the same host skip the TCP/TLS handshake. HTTP_POOL_MAXSIZE is the
+# number of kept-alive connections per host; every call has a connect and a
+# read timeout. HTTP2=1 uses httpx with HTTP/2 when it is installed
+# (pip install "httpx[http2]"), otherwise falls back to requests.
+GRAPH_API_BASE = (os.getenv("GRAPH_API_BASE") or "https://graph.facebook.com/v20.0").rstrip("/")
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS") or 10)
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE") or max(POST_WORKERS, 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT") or 5)
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT") or 30)
+HTTP2_ENABLED = (os.getenv("HTTP2") or "0").lower() in ["true", "yes", "1"]
+
+# Facebook posts (the page post plus one post per numeric Graph group ID in
+# the row's 'groups' cell) are packed into Graph batch requests of up to
+# FB_BATCH_MAX operations (Graph allows 50). Group names (what app.py writes,
+# e.g. "Group 1") are not Graph nodes: their shares stay simulated. Set
+# FB_BATCH=0 to post one request per target, with all group shares simulated.
+FB_BATCH_ENABLED = (os.getenv("FB_BATCH") or "1").lower() in ["true", "yes", "1"]
+FB_BATCH_MAX = max(1, min(50, int(os.getenv("FB_BATCH_MAX") or 50)))
+
+# Simulate mode: fake platform conditions, for capacity planning and for
+# exercising retries and concurrency without a network.
+# SIMULATE_LATENCY_SECONDS: fixed delay for every simulated call.
+# SIMULATE_PROFILE: JSON (or the path of a JSON file) with conditions per
+# platform ("FB", "IG", "LinkedIn"; "*" for the others), e.g.
+#   {"FB": {"latency": "lognormal:0.4:0.5", "error_rate": 0.02,
+#           "rate_limit_rate": 0.01, "timeout_rate": 0.005},
+#    "*": {"latency": "uniform:0.1:0.3"}}
+# latency is seconds ("0.3"), "uniform:LOW:HIGH", "normal:MEAN:SD",
+# "lognormal:MEDIAN:SIGMA" or "exp:MEAN". error_rate fails a call with HTTP
+# 500, rate_limit_rate with HTTP 429; timeout_rate waits timeout_seconds
+# (default HTTP_READ_TIMEOUT) and raises, like a read timeout.
+# SIMULATE_SEED: makes every outcome a function of (seed, content id,
+# target, attempt), so a run repeats exactly whatever the thread timing.
+SIMULATE_LATENCY_SECONDS = float(os.getenv("SIMULATE_LATENCY_SECONDS") or 0)
+SIMULATE_PROFILE = os.getenv("SIMULATE_PROFILE") or ""
+SIMULATE_SEED = os.getenv("SIMULATE_SEED") or None
+
+# How much a run prints. "verbose": every row and final caption (the old
+# output); "normal": one line per row and per post; "quiet": only warnings,
+# errors and the run summary. Also set with -q / -v.
+LOG_LEVELS = {"quiet": 0, "normal": 1, "verbose": 2}
+LOG_VERBOSITY = LOG_LEVELS.get((os.getenv("LOG_VERBOSITY") or "normal").lower(), 1)
+
+# Each scheduler run writes its timings and call counts as JSON to
+# RUN_METRICS_JSON_PATH and as a Prometheus textfile (for node_exporter's
+# textfile collector) to RUN_METRICS_PROM_PATH, replacing the previous run's.
+# Set RUN_METRICS=0 to skip both.
+RUN_METRICS_ENABLED = (os.getenv("RUN_METRICS") or "1").lower() in ["true", "yes", "1"]
+RUN_METRICS_JSON_PATH = os.getenv("RUN_METRICS_JSON_PATH") or os.path.join(BOT_STATE_DIR, "run_metrics.json")
+RUN_METRICS_PROM_PATH = os.getenv("RUN_METRICS_PROM_PATH") or os.path.join(BOT_STATE_DIR, "run_metrics.prom")
 
 
 # placeholders for future real integrations (currently unused / simulated)
@@ -33,32 +272,365 @@ LINKEDIN_ACCESS_TOKEN = os.getenv("LINKEDIN_ACCESS_TOKEN")
 INSTAGRAM_ACCESS_TOKEN = os.getenv("INSTAGRAM_ACCESS_TOKEN")
 
 
+# Process-wide gspread handles, shared by bot runs and the Streamlit app
+# (which imports this module once and re-runs its script on every click).
+_SHEETS_CACHE = {
+    "creds": None,
+    "client": None,
+    "spreadsheet": None,
+    "worksheets": {},
+    "headers": {},
+    "id_base": None,
+    # Highest ContentPlan id seen when id_base was read; checked by the next allocation
+    "id_floor": None,
+    "opened_at": 0.0,
+    # Drive version fetched by the fast no-op check, reused once by the index sync
+    "prefetched_version": None,
+}
+_SHEETS_CACHE_LOCK = threading.RLock()
+
+
+def get_google_credentials():
+    """
+    Returns the cached service-account credentials, refreshing the token when
+    it has expired. Needs google-auth only, not gspread.
+    """
+    with _SHEETS_CACHE_LOCK:
+        if _SHEETS_CACHE["creds"] is None:
+            from google.oauth2.service_account import Credentials
+
+            scopes = [
+                "https://www.googleapis.com/auth/spreadsheets",
+                "https://www.googleapis.com/auth/drive",
+            ]
+            _SHEETS_CACHE["creds"] = Credentials.from_service_account_file(
+                GOOGLE_SHEETS_CRED_PATH, scopes=scopes
+            )
+
+        creds = _SHEETS_CACHE["creds"]
+        if not creds.valid:
+            from google.auth.transport.requests import Request as GoogleAuthRequest
+
+            creds.refresh(GoogleAuthRequest())
+        return creds
+
+
 def get_gspread_client():
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    creds = Credentials.from_service_account_file(
-        GOOGLE_SHEETS_CRED_PATH, scopes=scopes
-    )
-    gc = gspread.authorize(creds)
-    return gc
+    """
+    Returns the cached gspread client, authorizing on first use and
+    refreshing the service-account token when it has expired.
+    """
+    with _SHEETS_CACHE_LOCK:
+        creds = get_google_credentials()
+        if _SHEETS_CACHE["client"] is None:
+            import gspread
+
+            _SHEETS_CACHE["client"] = gspread.authorize(creds)
+        return _SHEETS_CACHE["client"]
 
 
 # =========================
 # 2. SHEETS HELPERS
 # =========================
 
-def get_sheets():
+# Counters for the current run, printed by print_run_summary().
+RUN_STATS = {
+    "sheets_reads": 0,
+    "sheets_writes": 0,
+    "sheets_seconds": 0.0,
+    "status_rows": 0,
+    "status_calls": 0,
+    "status_seconds": 0.0,
+    "postlog_rows": 0,
+    "postlog_calls": 0,
+    "docx_entries": 0,
+    "docx_saves": 0,
+    "docx_seconds": 0.0,
+    # Clients sheet reads answered from the clients cache
+    "sheets_reads_skipped": 0,
+    # The fast path found nothing changed and nothing due; ContentPlan unread
+    "nothing_changed": False,
+    # The spreadsheet version was unchanged, so the index sync was skipped
+    "index_sync_skipped": False,
+    "sheets_retries": 0,
+    "sheets_throttle_seconds": 0.0,
+    "sheets_backoff_seconds": 0.0,
+    "http_requests": 0,
+    "http_errors": 0,
+    "ledger_skipped": 0,
+    "ledger_in_doubt": [],
+    "retry_attempts": 0,
+    "retry_succeeded": 0,
+    "retry_rows_scheduled": 0,
+    "retry_targets_exhausted": 0,
+    "lease_claimed": 0,
+    "lease_lost": 0,
+    "lease_reclaimed": 0,
+    "lease_released": 0,
+    "deadline_hit": False,
+    "deadline_rows_deferred": 0,
+    "simulated_errors": 0,
+    "simulated_rate_limits": 0,
+    "simulated_timeouts": 0,
+    "graph_posts": 0,
+    "posts_ok": Counter(),
+    "posts_failed": Counter(),
+}
+_RUN_STATS_LOCK = threading.Lock()
+
+# Sum of RUN_STATS over every finished run of this process (folded in by
+# reset_run_stats), so the metrics endpoint can serve monotonic counters
+RUN_STATS_TOTALS = {}
+
+# Wall time per stage of the current run (see run_span), in stage order
+RUN_SPANS = {}
+
+
+def bump_stat(key, amount=1):
+    with _RUN_STATS_LOCK:
+        RUN_STATS[key] += amount
+
+
+@contextlib.contextmanager
+def run_span(name):
+    """Add the time spent in the with-block to RUN_SPANS[name]."""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        elapsed = time.monotonic() - started
+        with _RUN_STATS_LOCK:
+            RUN_SPANS[name] = RUN_SPANS.get(name, 0.0) + elapsed
+
+
+def log_at(level, *args):
+    """print() if LOG_VERBOSITY is at least `level` ("normal" or "verbose")."""
+    if LOG_VERBOSITY >= LOG_LEVELS[level]:
+        print(*args)
+
+
+def _add_stats(totals, stats):
+    """Add one run's counters into `totals` (lists count their entries)."""
+    for key, value in stats.items():
+        if isinstance(value, Counter):
+            totals.setdefault(key, Counter()).update(value)
+        else:
+            totals[key] = totals.get(key, 0) + (len(value) if isinstance(value, list) else value)
+
+
+def reset_run_stats():
+    """Zero the counters at the start of a run (the daemon runs many)."""
+    with _RUN_STATS_LOCK:
+        _add_stats(RUN_STATS_TOTALS, RUN_STATS)
+        for key, value in RUN_STATS.items():
+            RUN_STATS[key] = [] if isinstance(value, list) else type(value)()
+        RUN_SPANS.clear()
+        HTTP_LATENCIES.clear()
+
+
+class TokenBucket:
+    """
+    Allows `rate_per_minute` calls per minute on average, with bursts of up
+    to `burst` calls. acquire() blocks until a token is free.
+    """
+
+    def __init__(self, rate_per_minute, burst=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = float(burst or max(1.0, rate_per_minute / 6))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take one token; returns the seconds spent waiting for it."""
+        waited = 0.0
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+SHEETS_BUCKETS = {
+    "read": TokenBucket(SHEETS_READS_PER_MINUTE),
+    "write": TokenBucket(SHEETS_WRITES_PER_MINUTE),
+}
+
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _is_retryable(error, idempotent=True) -> bool:
+    # Only check libraries that are already loaded: an error can't come from a
+    # module nobody imported, and the fast no-op path never imports gspread.
+    gspread = sys.modules.get("gspread")
+    requests = sys.modules.get("requests")
+    if (gspread is not None and isinstance(error, gspread.exceptions.APIError)) or (
+        requests is not None and isinstance(error, requests.HTTPError)
+    ):
+        response = getattr(error, "response", None)
+        status = getattr(response, "status_code", None)
+        if not idempotent:
+            # After a 5xx the call may still have been applied
+            return status == 429
+        return status in RETRYABLE_STATUS_CODES
+    if requests is not None:
+        if not idempotent:
+            # Only safe if the request never reached the server
+            return isinstance(error, requests.ConnectTimeout)
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+    return False
+
+
+def sheets_call(kind, fn, *args, idempotent=True, **kwargs):
+    """
+    Run one Sheets API call through the rate limiter, retrying quota (429)
+    and server errors with jittered exponential backoff.
+    kind: "read" or "write" (separate quotas)
+    idempotent=False (appends): only retry errors that mean the call was not
+    applied, so a lost response can't add the same rows twice.
+    Counts calls, retries and wait time in RUN_STATS.
+    """
+    for attempt in range(SHEETS_MAX_RETRIES + 1):
+        if STORAGE_BACKEND == "sheets":
+            bump_stat("sheets_throttle_seconds", SHEETS_BUCKETS[kind].acquire())
+
+        started = time.monotonic()
+        try:
+            return fn(*args, **kwargs)
+        except Exception as e:
+            if attempt == SHEETS_MAX_RETRIES or not _is_retryable(e, idempotent):
+                raise
+            # Full jitter: sleep a random time up to the exponential cap
+            cap = min(SHEETS_BACKOFF_MAX_SECONDS, SHEETS_BACKOFF_BASE_SECONDS * 2 ** attempt)
+            delay = random.uniform(0, cap)
+            print(f"[WARN] Sheets {kind} failed ({e}); retry {attempt + 1} in {delay:.1f}s.")
+            bump_stat("sheets_retries")
+            bump_stat("sheets_backoff_seconds", delay)
+            time.sleep(delay)
+        finally:
+            bump_stat(f"sheets_{kind}s")
+            bump_stat("sheets_seconds", time.monotonic() - started)
+
+
+def invalidate_sheets_cache(drop_client=False):
+    """
+    Forget cached spreadsheet/worksheet handles so the next access re-opens
+    them. drop_client=True also forces re-reading the credentials.
+    """
+    with _SHEETS_CACHE_LOCK:
+        _SHEETS_CACHE["spreadsheet"] = None
+        _SHEETS_CACHE["worksheets"] = {}
+        _SHEETS_CACHE["headers"] = {}
+        _SHEETS_CACHE["id_base"] = None
+        _SHEETS_CACHE["id_floor"] = None
+        _SHEETS_CACHE["opened_at"] = 0.0
+        if drop_client:
+            _SHEETS_CACHE["creds"] = None
+            _SHEETS_CACHE["client"] = None
+
+
+def open_google_spreadsheet():
+    """
+    Opens the Google spreadsheet by GOOGLE_SHEETS_DOC_KEY when set, else by name.
+    """
     gc = get_gspread_client()
-    sh = gc.open(GOOGLE_SHEETS_DOC_NAME)
-    content_sheet = sh.worksheet("ContentPlan")
-    log_sheet = sh.worksheet("PostLog")
-    clients_sheet = sh.worksheet("Clients")   # NEW
+    if GOOGLE_SHEETS_DOC_KEY:
+        return sheets_call("read", gc.open_by_key, GOOGLE_SHEETS_DOC_KEY)
+    return sheets_call("read", gc.open, GOOGLE_SHEETS_DOC_NAME)
+
+
+def get_spreadsheet():
+    """
+    Returns the cached Spreadsheet for STORAGE_BACKEND, re-opening it once
+    SHEETS_CACHE_TTL_SECONDS have passed.
+    """
+    with _SHEETS_CACHE_LOCK:
+        age = time.monotonic() - _SHEETS_CACHE["opened_at"]
+        if _SHEETS_CACHE["spreadsheet"] is not None and age < SHEETS_CACHE_TTL_SECONDS:
+            return _SHEETS_CACHE["spreadsheet"]
+
+        invalidate_sheets_cache()
+        if STORAGE_BACKEND == "sheets":
+            sh = open_google_spreadsheet()
+        elif STORAGE_BACKEND == "sqlite":
+            sh = SqliteSpreadsheet(STORAGE_SQLITE_PATH)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND '{STORAGE_BACKEND}' (use 'sheets' or 'sqlite')")
+        _SHEETS_CACHE["spreadsheet"] = sh
+        _SHEETS_CACHE["opened_at"] = time.monotonic()
+        return sh
+
+
+def get_worksheet(title):
+    """
+    Returns a cached Worksheet handle by title.
+    """
+    with _SHEETS_CACHE_LOCK:
+        sh = get_spreadsheet()
+        ws = _SHEETS_CACHE["worksheets"].get(title)
+        if ws is None:
+            # One metadata call caches every tab, instead of one per title
+            for handle in sheets_call("read", sh.worksheets):
+                _SHEETS_CACHE["worksheets"].setdefault(handle.title, handle)
+            ws = _SHEETS_CACHE["worksheets"].get(title)
+        if ws is None:
+            import gspread
+
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return ws
+
+
+def fetch_spreadsheet_version(sh) -> str:
+    """
+    The spreadsheet's Drive revision number (bumped on every edit), falling
+    back to modifiedTime. One small Drive API call.
+    """
+    if isinstance(sh, SqliteSpreadsheet):
+        return sheets_call("read", sh.fetch_version)
+    http = getattr(sh.client, "http_client", sh.client)
+    resp = sheets_call(
+        "read", http.request, "get",
+        f"https://www.googleapis.com/drive/v3/files/{sh.id}",
+        params={"fields": "version,modifiedTime", "supportsAllDrives": True},
+    )
+    meta = resp.json()
+    return str(meta.get("version") or meta.get("modifiedTime") or "")
+
+
+def current_spreadsheet_version() -> str:
+    """
+    fetch_spreadsheet_version() for the configured spreadsheet. When it is
+    opened by key and not open yet, the Drive call is made directly with the
+    service-account token, so gspread is neither imported nor used to open it.
+    """
+    if STORAGE_BACKEND == "sheets" and GOOGLE_SHEETS_DOC_KEY and _SHEETS_CACHE["spreadsheet"] is None:
+        creds = get_google_credentials()
+        resp = sheets_call(
+            "read", http_request, "GET",
+            f"https://www.googleapis.com/drive/v3/files/{GOOGLE_SHEETS_DOC_KEY}",
+            params={"fields": "version,modifiedTime", "supportsAllDrives": "true"},
+            headers={"Authorization": f"Bearer {creds.token}"},
+        )
+        resp.raise_for_status()
+        meta = resp.json()
+        return str(meta.get("version") or meta.get("modifiedTime") or "")
+    return fetch_spreadsheet_version(get_spreadsheet())
+
+
+def get_sheets():
+    content_sheet = get_worksheet("ContentPlan")
+    log_sheet = get_worksheet("PostLog")
+    clients_sheet = get_worksheet("Clients")   # NEW
     return content_sheet, log_sheet, clients_sheet
 
 def load_clients_map(clients_sheet):
-    rows = clients_sheet.get_all_records()
+    rows = sheets_call("read", clients_sheet.get_all_records)
     clients = {}
     for r in rows:
         key = (r.get("client_key") or "").strip()
@@ -76,47 +648,304 @@ def load_clients_map(clients_sheet):
     return clients
 
 
+def _read_clients_cache():
+    try:
+        with open(CLIENTS_CACHE_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_clients_cache(clients, version):
+    os.makedirs(os.path.dirname(CLIENTS_CACHE_PATH) or ".", exist_ok=True)
+    tmp_path = CLIENTS_CACHE_PATH + ".tmp"
+    # Page access tokens live in this file, so keep it private to the user
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump({"fetched_at": time.time(), "version": version, "clients": clients}, f)
+    os.replace(tmp_path, CLIENTS_CACHE_PATH)
+
+
+def invalidate_clients_cache():
+    """
+    Drop the on-disk clients cache; the next load re-reads the Clients sheet.
+    """
+    if os.path.exists(CLIENTS_CACHE_PATH):
+        os.remove(CLIENTS_CACHE_PATH)
+
+
+def _print_clients_diff(old, new):
+    added = sorted(set(new) - set(old))
+    removed = sorted(set(old) - set(new))
+    changed = sorted(k for k in set(old) & set(new) if old[k] != new[k])
+    if added or removed or changed:
+        print(f"[INFO] Clients changed: added {added}, removed {removed}, updated {changed}")
+
+
+def load_clients(force_refresh=False):
+    """
+    Returns {"clients": {client_key: {...}}, "refreshed": bool} for active
+    clients, from the on-disk cache when it is still valid.
+    "refreshed" is True when the Clients sheet was read during this call.
+    """
+    cache = _read_clients_cache()
+    version = None
+    if cache is not None and not force_refresh:
+        if time.time() - cache.get("fetched_at", 0) < CLIENTS_CACHE_TTL_SECONDS:
+            bump_stat("sheets_reads_skipped")
+            return {"clients": cache["clients"], "refreshed": False}
+
+        # TTL passed: if nothing in the spreadsheet changed, keep the cache
+        version = current_spreadsheet_version()
+        if version and version == cache.get("version"):
+            _write_clients_cache(cache["clients"], version)
+            bump_stat("sheets_reads_skipped")
+            return {"clients": cache["clients"], "refreshed": False}
+
+    if version is None:
+        version = current_spreadsheet_version()
+    clients = load_clients_map(get_worksheet("Clients"))
+    if cache is not None:
+        _print_clients_diff(cache["clients"], clients)
+    _write_clients_cache(clients, version)
+    return {"clients": clients, "refreshed": True}
+
+
+def lookup_client(clients_state, client_key):
+    """
+    Look up a client in the state from load_clients(). A miss against cached
+    data re-reads the Clients sheet once, so 'bad_client' is never decided
+    from a stale cache.
+    """
+    client = clients_state["clients"].get(client_key)
+    if client is None and not clients_state["refreshed"]:
+        print(f"[INFO] client_key '{client_key}' not in cached Clients; refreshing.")
+        clients_state.update(load_clients(force_refresh=True))
+        client = clients_state["clients"].get(client_key)
+    return client
+
+
+def get_cached_header_map(ws) -> dict:
+    """
+    Like get_header_map(), but cached alongside the worksheet handle.
+    """
+    with _SHEETS_CACHE_LOCK:
+        header_map = _SHEETS_CACHE["headers"].get(ws.title)
+        if header_map is None:
+            header_map = get_header_map(ws)
+            _SHEETS_CACHE["headers"][ws.title] = header_map
+        return header_map
+
+
+def read_max_content_id(content_sheet) -> int:
+    """
+    Highest numeric id in ContentPlan, reading only the id column.
+    Used once to seed an allocator; 0 if there are no ids yet.
+    """
+    id_col = get_column_index_by_header(
+        content_sheet, "id", get_cached_header_map(content_sheet)
+    )
+    values = sheets_call("read", content_sheet.col_values, id_col)[1:]
+    ids = [int(v) for v in values if str(v).strip().isdigit()]
+    return max(ids, default=0)
+
+
+def _get_id_counter_sheet(content_sheet):
+    """
+    Returns (IdCounter worksheet, base). Row 1 holds ["base", base] and every
+    later row is one allocation, so an appended row number N maps to ID N + base.
+    The sheet is created and seeded from ContentPlan on first use and the base
+    never changes after that. Each time the base is read, the highest
+    ContentPlan id is read too so the next allocation can skip past it.
+    Rows in IdCounter must never be deleted, or IDs would be handed out again.
+    """
+    import gspread
+
+    with _SHEETS_CACHE_LOCK:
+        sh = get_spreadsheet()
+        created = False
+        try:
+            counter_sheet = get_worksheet(ID_COUNTER_SHEET)
+        except gspread.exceptions.WorksheetNotFound:
+            # First allocation ever lands on row 2, so base = max id - 1
+            base = read_max_content_id(content_sheet) - 1
+            try:
+                counter_sheet = sheets_call(
+                    "write", sh.add_worksheet, title=ID_COUNTER_SHEET, rows=1, cols=2
+                )
+                sheets_call(
+                    "write", counter_sheet.batch_update,
+                    [{"range": "A1:B1", "values": [["base", base]]}],
+                )
+                print(f"[INFO] Created '{ID_COUNTER_SHEET}' sheet with base {base}.")
+                created = True
+            except gspread.exceptions.APIError:
+                # Another process created it first; use theirs
+                invalidate_sheets_cache()
+                counter_sheet = get_worksheet(ID_COUNTER_SHEET)
+            _SHEETS_CACHE["worksheets"][ID_COUNTER_SHEET] = counter_sheet
+
+        if _SHEETS_CACHE["id_base"] is None:
+            for attempt in range(5):
+                header = sheets_call("read", counter_sheet.row_values, 1)
+                if header:
+                    break
+                # Another process created the sheet but hasn't written its base yet
+                time.sleep(1 + attempt)
+            if len(header) < 2 or not str(header[1]).lstrip("-").isdigit():
+                raise ValueError(
+                    f"'{ID_COUNTER_SHEET}' row 1 must be ['base', <number>], got {header}"
+                )
+            _SHEETS_CACHE["id_base"] = int(header[1])
+            # A freshly created sheet was just seeded from ContentPlan
+            _SHEETS_CACHE["id_floor"] = None if created else read_max_content_id(content_sheet)
+        return counter_sheet, _SHEETS_CACHE["id_base"]
+
+
+def _append_id_counter_rows(counter_sheet, count=1, note="") -> int:
+    """
+    Appends `count` allocation rows to IdCounter in one call and returns the
+    row number of the last one (the rows of one append are contiguous).
+    """
+    stamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    resp = sheets_call(
+        "write", counter_sheet.append_rows, [[stamp, note]] * count if note else [[stamp]] * count,
+        insert_data_option="INSERT_ROWS", table_range="A1", idempotent=False,
+    )
+    updated_range = resp["updates"]["updatedRange"]
+    match = re.search(r"![A-Z]+(\d+)(?::[A-Z]+(\d+))?$", updated_range)
+    if not match:
+        raise ValueError(f"Unexpected append range from IdCounter: {updated_range}")
+    return int(match.group(2) or match.group(1))
+
+
+def _allocate_id_from_sheet(content_sheet) -> int:
+    with _SHEETS_CACHE_LOCK:
+        counter_sheet, base = _get_id_counter_sheet(content_sheet)
+        floor = _SHEETS_CACHE["id_floor"]
+        if floor is not None:
+            # First allocation since the base was read; hold the lock so no
+            # other thread hands out an ID below the floor meanwhile
+            new_id = _append_id_counter_rows(counter_sheet) + base
+            if new_id <= floor:
+                # ContentPlan has ids the counter never handed out (rows typed
+                # in by hand or saved by an older version). Reserve the gap
+                # with filler rows; row numbers are unique, so other runs
+                # can't be handed the same IDs.
+                new_id = _append_id_counter_rows(
+                    counter_sheet, floor + 1 - new_id, note="skipped"
+                ) + base
+                print(f"[WARN] ContentPlan ids reach {floor}; '{ID_COUNTER_SHEET}' skipped ahead to ID {new_id}.")
+            _SHEETS_CACHE["id_floor"] = None
+            return new_id
+    return _append_id_counter_rows(counter_sheet) + base
+
+
+def _allocate_id_from_sqlite(content_sheet) -> int:
+    conn = sqlite3.connect(ID_ALLOCATOR_DB, timeout=30, isolation_level=None)
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS id_counter "
+            "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        seeded = conn.execute(
+            "SELECT 1 FROM id_counter WHERE name = 'content_id'"
+        ).fetchone()
+        seed = 0 if seeded else read_max_content_id(content_sheet)
+
+        # BEGIN IMMEDIATE takes the write lock, so concurrent callers queue
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute(
+            "INSERT OR IGNORE INTO id_counter (name, value) VALUES ('content_id', ?)",
+            (seed,),
+        )
+        conn.execute("UPDATE id_counter SET value = value + 1 WHERE name = 'content_id'")
+        next_id = conn.execute(
+            "SELECT value FROM id_counter WHERE name = 'content_id'"
+        ).fetchone()[0]
+        conn.execute("COMMIT")
+        return next_id
+    finally:
+        conn.close()
+
+
+def ensure_id_allocator_seeded(content_sheet):
+    """
+    Make sure the ID allocator has its starting point before rows are
+    removed from ContentPlan; seeding later from a shorter sheet could hand
+    out ids that archived rows (and their PostLog entries) already use.
+    """
+    if ID_ALLOCATOR == "sheet":
+        _get_id_counter_sheet(content_sheet)
+        return
+    conn = sqlite3.connect(ID_ALLOCATOR_DB, timeout=30, isolation_level=None)
+    try:
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS id_counter "
+            "(name TEXT PRIMARY KEY, value INTEGER NOT NULL)"
+        )
+        if not conn.execute("SELECT 1 FROM id_counter WHERE name = 'content_id'").fetchone():
+            conn.execute(
+                "INSERT OR IGNORE INTO id_counter (name, value) VALUES ('content_id', ?)",
+                (read_max_content_id(content_sheet),),
+            )
+    finally:
+        conn.close()
+
+
+def allocate_content_id(content_sheet) -> int:
+    """
+    Returns a new unique content ID without reading the whole ContentPlan.
+    See ID_ALLOCATOR for the available backends.
+    """
+    if ID_ALLOCATOR == "sqlite":
+        return _allocate_id_from_sqlite(content_sheet)
+    if ID_ALLOCATOR == "sheet":
+        return _allocate_id_from_sheet(content_sheet)
+    raise ValueError(f"Unknown ID_ALLOCATOR '{ID_ALLOCATOR}' (use 'sheet' or 'sqlite')")
+
 
 def add_content_item(date, time, platforms, idea,
-                     caption="", image_url="", hashtags="", groups=""):
+                     caption="", image_url="", hashtags="", groups="",
+                     client_key=""):
     """
     Append a new content row to the ContentPlan sheet with status='pending'.
 
     date: string, ideally 'YYYY-MM-DD' (can be blank for 'any day')
     platforms: string like 'FB, IG, LinkedIn'
     idea: main idea / prompt for the post
-    caption, image_url, hashtags, groups: optional strings
-    """
-    content_sheet, _ = get_sheets()
-    records = content_sheet.get_all_records()
-
-    # Calculate next ID (max existing id + 1)
-    next_id = 1
-    if records:
-        existing_ids = [
-            int(r["id"])
-            for r in records
-            if "id" in r and str(r["id"]).strip().isdigit()
-        ]
-        if existing_ids:
-            next_id = max(existing_ids) + 1
-
-    # Our header layout: id, date, platforms, idea, caption,
-    # image_url, hashtags, groups, status
-    new_row = [
-        next_id,
-        date,
-        time,
-        platforms,
-        idea,
-        caption,
-        image_url,
-        hashtags,
-        groups,
-        "pending",
-    ]
+    caption, image_url, hashtags, groups, client_key: optional strings
+
+    Costs one ID allocation plus one append; the row is laid out using the
+    sheet's own (cached) header order.
+    """
+    content_sheet = get_worksheet("ContentPlan")
+    header_map = get_cached_header_map(content_sheet)
+    next_id = allocate_content_id(content_sheet)
 
-    content_sheet.append_row(new_row)
+    values = {
+        "id": next_id,
+        "date": date,
+        "time": time,
+        "platforms": platforms,
+        "client_key": client_key,
+        "idea": idea,
+        "caption": caption,
+        "image_url": image_url,
+        "hashtags": hashtags,
+        "groups": groups,
+        "status": "pending",
+    }
+    new_row = [""] * max(header_map.values())
+    for header, col in header_map.items():
+        if header in values:
+            new_row[col - 1] = values[header]
+
+    missing = [h for h in values if h not in header_map and values[h] != ""]
+    if missing:
+        print(f"[WARN] ContentPlan has no column(s) {missing}; those values were not saved.")
+
+    sheets_call("write", content_sheet.append_row, new_row, idempotent=False)
     return next_id
 
 def normalize_sheet_date(value: str) -> str:
@@ -166,396 +995,3439 @@ def normalize_sheet_time(value: str) -> str:
     return ""
 
 
-def find_all_pending_content(content_sheet):
+def get_bot_now():
     """
-    Find ALL rows where status == 'pending'
-    and scheduled date is today OR earlier (past).
-    If date == today and a time is provided, only post when time <= now.
-    Returns a list of row dicts with '__row_index__' added.
+    Current time in the bot's timezone (naive datetime).
     """
-    records = content_sheet.get_all_records()
-    pending_rows = []
-
     utc_now = datetime.datetime.utcnow()
-    now = utc_now + datetime.timedelta(
+    return utc_now + datetime.timedelta(
         hours=BOT_TIMEZONE_OFFSET_HOURS,
         minutes=BOT_TIMEZONE_OFFSET_MINUTES
     )
 
-    today = now.date()
-    current_time = now.time()
 
-    for idx, row in enumerate(records, start=2):
-        status = (row.get("status") or "").strip().lower()
-        if status != "pending":
-            continue
-
-        # Normalize date/time from the sheet
-        date_val = normalize_sheet_date(row.get("date"))   # returns "YYYY-MM-DD" or ""
-        time_val = normalize_sheet_time(row.get("time"))   # returns "HH:MM" or ""
+def bot_time_key(epoch) -> str:
+    """A Unix time as "YYYY-MM-DD HH:MM" in the bot's timezone."""
+    try:
+        moment = datetime.datetime.utcfromtimestamp(epoch) + datetime.timedelta(
+            hours=BOT_TIMEZONE_OFFSET_HOURS, minutes=BOT_TIMEZONE_OFFSET_MINUTES
+        )
+    except (OverflowError, OSError, ValueError):
+        return "9999-12-31 23:59"
+    return moment.strftime("%Y-%m-%d %H:%M")
 
-        # Optional debug: keep normalized values in row dict
-        row["date"] = date_val
-        row["time"] = time_val
 
-        # Decide if this row is due
-        if date_val:
-            post_date = datetime.date.fromisoformat(date_val)
+# Statuses the scheduler picks up: new rows, and rows with failed targets
+# waiting for a retry (those are further gated by row_retry_at()).
+PENDING_STATUSES = ("pending", "retry")
+LEASE_PREFIX = "processing:"
 
-            # Future date -> not due yet
-            if post_date > today:
-                continue
 
-            # Same date + time provided -> only due if time has passed
-            if post_date == today and time_val:
-                post_time = datetime.datetime.strptime(time_val, "%H:%M").time()
-                if post_time > current_time:
-                    continue
+def parse_lease(status):
+    """
+    "processing:<owner>:<expires epoch>" -> (owner, expires_at); None if the
+    status is not a lease.
+    """
+    status = (status or "").strip()
+    if not status.lower().startswith(LEASE_PREFIX):
+        return None
+    owner, _, expires = status[len(LEASE_PREFIX):].rpartition(":")
+    try:
+        return owner, int(expires)
+    except ValueError:
+        return owner, 0
 
-            # If post_date < today OR post_date == today (and time ok), it's due
-        else:
-            # Blank date means "post any day the bot runs"
-            pass
 
-        # If we reach here, row is due
-        row["__row_index__"] = idx
-        pending_rows.append(row)
+def is_schedulable(status) -> bool:
+    """A pending/retry row, or one whose lease has expired (its run died)."""
+    if (status or "").strip().lower() in PENDING_STATUSES:
+        return True
+    lease = parse_lease(status)
+    return lease is not None and lease[1] <= time.time()
 
-    return pending_rows
 
-def get_column_index_by_header(ws, header_name: str) -> int:
+def is_row_due(status, date_val, time_val, now) -> bool:
     """
-    Returns the 1-based column index for a header name (case-insensitive).
+    True if a row is 'pending' (or 'retry', or has an expired lease) and
+    scheduled for now or earlier.
+    date_val / time_val must already be normalized ("YYYY-MM-DD" / "HH:MM" or "").
     """
-    headers = ws.row_values(1)
-    headers_lower = [h.strip().lower() for h in headers]
-    target = header_name.strip().lower()
+    if not is_schedulable(status):
+        return False
 
-    if target not in headers_lower:
-        raise ValueError(f"Header '{header_name}' not found. Headers: {headers}")
+    # Blank date means "post any day the bot runs"
+    if not date_val:
+        return True
 
-    return headers_lower.index(target) + 1  # 1-based for gspread
+    post_date = datetime.date.fromisoformat(date_val)
 
+    # Future date -> not due yet
+    if post_date > now.date():
+        return False
 
-def update_content_status(content_sheet, row_index, new_status):
+    # Same date + time provided -> only due if time has passed
+    if post_date == now.date() and time_val:
+        post_time = datetime.datetime.strptime(time_val, "%H:%M").time()
+        if post_time > now.time():
+            return False
+
+    # If post_date < today OR post_date == today (and time ok), it's due
+    return True
+
+
+def prioritize_rows(rows):
     """
-    Update the status cell for a given row using the 'status' header.
+    Order due rows most overdue first, round-robin across client_key: each
+    client's rows stay in due order and clients take turns, starting with
+    the client whose oldest row is the most overdue.
     """
-    status_col = get_column_index_by_header(content_sheet, "status")
-    content_sheet.update_cell(row_index, status_col, new_status)
+    by_due = sorted(rows, key=lambda row: (
+        due_at_key(normalize_sheet_date(row.get("date")), normalize_sheet_time(row.get("time"))),
+        row["__row_index__"],
+    ))
+    lanes = {}
+    for row in by_due:
+        lanes.setdefault((row.get("client_key") or "").strip(), deque()).append(row)
 
+    ordered = []
+    lanes = list(lanes.values())
+    while lanes:
+        for lane in lanes:
+            ordered.append(lane.popleft())
+        lanes = [lane for lane in lanes if lane]
+    return ordered
 
 
+def parse_targets_status(value) -> dict:
+    """
+    The targets_status cell as {target: {"status", "attempts", ...}}; {} if
+    blank or not valid JSON.
+    """
+    if not (value or "").strip():
+        return {}
+    try:
+        targets = json.loads(value)
+    except ValueError:
+        print(f"[WARN] Ignoring unreadable {TARGETS_STATUS_HEADER} value: {value!r}")
+        return {}
+    return targets if isinstance(targets, dict) else {}
 
-def append_post_log(log_sheet, content_id, platform, caption_used, post_url):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_sheet.append_row([timestamp, content_id, platform, caption_used, post_url])
 
+def target_name(platform, group=None) -> str:
+    """Key of a post target in targets_status: 'FB', 'IG', 'FB-Group: <id>'."""
+    return f"{platform}-Group: {group}" if group else platform
 
-# =========================
-# 3. CAPTION GENERATION (NO OPENAI)
-# =========================
 
-def generate_caption_if_needed(platform, idea, caption_existing, hashtags_existing):
+def retry_delay_minutes(attempts) -> float:
+    return min(RETRY_BACKOFF_MAX_MINUTES, RETRY_BACKOFF_MINUTES * 3 ** max(0, attempts - 1))
+
+
+def row_retry_at(row) -> str:
     """
-    TEMP VERSION (no OpenAI):
-    - Uses caption/hashtags from the sheet if provided.
-    - If they are empty, builds a simple fallback caption + basic hashtags.
-    This lets us test the full pipeline without calling the OpenAI API.
+    For a 'retry' row, the earliest retry_at ("YYYY-MM-DD HH:MM", bot
+    timezone) of its retryable targets; "" if it can go now.
     """
-    caption = (caption_existing or "").strip()
-    hashtags = (hashtags_existing or "").strip()
+    if (row.get("status") or "").strip().lower() != "retry":
+        return ""
+    targets = parse_targets_status(row.get(TARGETS_STATUS_HEADER))
+    times = [
+        t.get("retry_at") or ""
+        for t in targets.values()
+        if t.get("status") == "failed" and t.get("attempts", 0) < RETRY_MAX_ATTEMPTS
+    ]
+    return min(times) if times else ""
 
-    # If no caption provided in sheet, create a simple one from the idea
-    if not caption:
-        caption = f"{idea} (auto-generated caption for {platform})"
 
-    # If no hashtags provided, add some generic ones
-    if not hashtags:
-        hashtags = "#globalbiznex #marketing #automation"
+def _column_letter(col: int) -> str:
+    letters = ""
+    while col > 0:
+        col, rem = divmod(col - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
 
-    full_caption = caption
-    if hashtags:
-        full_caption += "\n\n" + hashtags
 
-    return full_caption
+def rowcol_to_a1(row: int, col: int) -> str:
+    """(2, 3) -> "C2", same as gspread.utils.rowcol_to_a1."""
+    return f"{_column_letter(col)}{row}"
 
 
-# =========================
-# 4. SOCIAL POSTING (SIMULATED FB / LINKEDIN / IG)
-# =========================
+def _row_runs(row_indexes, max_gap=PENDING_FETCH_MAX_GAP):
+    """
+    Group sorted row numbers into (start, end) runs. Rows up to max_gap apart
+    share a run, trading a few extra rows for fewer ranges.
+    """
+    runs = []
+    for idx in sorted(row_indexes):
+        if runs and idx - runs[-1][1] <= max_gap + 1:
+            runs[-1][1] = idx
+        else:
+            runs.append([idx, idx])
+    return [tuple(r) for r in runs]
 
-""" def post_to_facebook(caption):
-    
-    Post text to a Facebook Page using the Graph API.
 
-    If FB creds not set, just print and return a fake URL.
-    
-    if not FB_PAGE_ACCESS_TOKEN or not FB_PAGE_ID:
-        print("[INFO] FB credentials not set. Simulating FB page post...")
-        print("----- FB PAGE POST START -----")
-        print(caption)
-        print("----- FB PAGE POST END -------")
-        fake_url = "https://facebook.com/fake_page_post"
-        return fake_url
+def fetch_rows(ws, headers, row_indexes):
+    """
+    Batch-fetch full rows by 1-based index and return them as dicts keyed by
+    header (like get_all_records), each with '__row_index__' added.
+    """
+    wanted = set(row_indexes)
+    last_col = _column_letter(len(headers))
+    ranges = [f"A{start}:{last_col}{end}" for start, end in _row_runs(wanted)]
 
-    # Real FB API call would go here
-    url = f"https://graph.facebook.com/{FB_PAGE_ID}/feed"
-    params = {
-        "message": caption,
-        "access_token": FB_PAGE_ACCESS_TOKEN,
-    }
+    rows_by_index = {}
+    for i in range(0, len(ranges), PENDING_FETCH_RANGES_PER_CALL):
+        chunk = ranges[i:i + PENDING_FETCH_RANGES_PER_CALL]
+        blocks = sheets_call("read", ws.batch_get, chunk)
+        for a1, block in zip(chunk, blocks):
+            start = int(re.match(r"A(\d+):", a1).group(1))
+            for offset, values in enumerate(block):
+                rows_by_index[start + offset] = values
 
-    resp = requests.post(url, data=params)
-    if resp.status_code != 200:
+    result = []
+    for idx in sorted(wanted):
+        values = list(rows_by_index.get(idx, []))
+        values += [""] * (len(headers) - len(values))
+        row = {h: v for h, v in zip(headers, values) if h}
+        row["__row_index__"] = idx
+        result.append(row)
+    return result
+
+
+def read_pending_candidates(content_sheet, header_map, start_row=2, due_by=None):
+    """
+    Projected read of the id/status/date/time columns from start_row down.
+    Returns (candidates, last_row): candidates is a list of
+    (row_index, content_id, date_val, time_val) for rows is_schedulable() accepts,
+    last_row the last row that had any of those columns filled.
+    The SQLite store answers from its status/due-time index instead, and can
+    also leave out rows due after due_by ("YYYY-MM-DD HH:MM").
+    """
+    if isinstance(content_sheet, SqliteWorksheet):
+        candidates, last_row = sheets_call(
+            "read", content_sheet.schedulable_rows, start_row, due_by
+        )
+        # The index only narrows by status word; leases still need their expiry checked
+        return [
+            (row_index, content_id, date_val, time_val)
+            for row_index, status, content_id, date_val, time_val in candidates
+            if is_schedulable(status)
+        ], last_row
+
+    status_col = get_column_index_by_header(content_sheet, "status", header_map)
+    projected = [header_map.get("id"), status_col, header_map.get("date"), header_map.get("time")]
+    ranges = [
+        f"{_column_letter(c)}{start_row}:{_column_letter(c)}"
+        for c in projected if c
+    ]
+    blocks = iter(sheets_call(
+        "read", content_sheet.batch_get, ranges, major_dimension="COLUMNS"
+    ))
+    columns = []
+    for col in projected:
+        block = next(blocks) if col else []
+        columns.append(block[0] if block else [])
+    id_values, status_values, date_values, time_values = columns
+
+    def cell(values, offset):
+        return values[offset] if offset < len(values) else ""
+
+    candidates = []
+    for offset, status in enumerate(status_values):
+        if not is_schedulable(status):
+            continue
+
+        # Normalize date/time from the sheet
+        date_val = normalize_sheet_date(cell(date_values, offset))   # "YYYY-MM-DD" or ""
+        time_val = normalize_sheet_time(cell(time_values, offset))   # "HH:MM" or ""
+        content_id = str(cell(id_values, offset)).strip()
+        candidates.append((start_row + offset, content_id, date_val, time_val))
+
+    last_row = start_row - 1 + max(len(c) for c in columns)
+    return candidates, last_row
+
+
+def find_all_pending_content(content_sheet):
+    """
+    Find ALL rows where status == 'pending' (or 'retry' with its backoff over)
+    and scheduled date is today OR earlier (past).
+    If date == today and a time is provided, only post when time <= now.
+    Returns a list of row dicts with '__row_index__' added.
+
+    Due rows come from the local pending index when it is enabled, otherwise
+    from a two-phase scan: first only the status/date/time columns are read to
+    decide which rows are due, then just those rows are fetched in full.
+    """
+    if PENDING_INDEX_ENABLED:
+        conn = open_pending_index()
+        try:
+            pending_rows = find_pending_from_index(conn, content_sheet)
+        finally:
+            conn.close()
+        if pending_rows is not None:
+            return pending_rows
+
+    headers = read_header_row(content_sheet)
+    header_map = header_map_from_row(headers)
+    now = get_bot_now()
+    candidates, _ = read_pending_candidates(
+        content_sheet, header_map, due_by=now.strftime("%Y-%m-%d %H:%M")
+    )
+    due = {
+        row_index: (date_val, time_val)
+        for row_index, _, date_val, time_val in candidates
+        if is_row_due("pending", date_val, time_val, now)
+    }
+    if not due:
+        return []
+
+    pending_rows = fetch_rows(content_sheet, headers, due)
+    for row in pending_rows:
+        # Optional debug: keep normalized values in row dict
+        row["date"], row["time"] = due[row["__row_index__"]]
+    # 'retry' rows wait for their backoff
+    now_key = now.strftime("%Y-%m-%d %H:%M")
+    return [row for row in pending_rows if row_retry_at(row) <= now_key]
+
+
+# ---- Local pending index ----
+
+def due_at_key(date_val, time_val) -> str:
+    """
+    Sortable due time "YYYY-MM-DD HH:MM" in the bot's timezone.
+    "" (blank date = any day) sorts first, so it is always due.
+    """
+    if not date_val:
+        return ""
+    return f"{date_val} {time_val or '00:00'}"
+
+
+def open_pending_index():
+    os.makedirs(os.path.dirname(PENDING_INDEX_PATH) or ".", exist_ok=True)
+    conn = sqlite3.connect(PENDING_INDEX_PATH, timeout=30)
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS pending (
+            row_index INTEGER PRIMARY KEY,
+            content_id TEXT NOT NULL,
+            due_at TEXT NOT NULL,
+            date TEXT NOT NULL,
+            time TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS pending_due_at ON pending (due_at);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """
+    )
+    return conn
+
+
+def _index_meta(conn, key, default=None):
+    row = conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else default
+
+
+def _set_index_meta(conn, key, value):
+    conn.execute(
+        "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, str(value))
+    )
+
+
+def sync_pending_index(conn, content_sheet, header_map, full=False):
+    """
+    Bring the index up to date. Normally only rows below the watermark (rows
+    appended since the last sync) are read; a full reconcile replaces the
+    whole index when forced, when the id/status/date/time columns moved, or
+    every PENDING_INDEX_FULL_SYNC_SECONDS. Returns "full" or "incremental".
+    """
+    signature = ",".join(str(header_map.get(h)) for h in ("id", "status", "date", "time"))
+    watermark = int(_index_meta(conn, "watermark", 1))
+    last_full = float(_index_meta(conn, "last_full_sync", 0))
+
+    full = (
+        full
+        or _index_meta(conn, "header_signature") != signature
+        or time.time() - last_full >= PENDING_INDEX_FULL_SYNC_SECONDS
+    )
+    start_row = 2 if full else watermark + 1
+    candidates, last_row = read_pending_candidates(content_sheet, header_map, start_row)
+
+    with conn:
+        if full:
+            conn.execute("DELETE FROM pending")
+            _set_index_meta(conn, "last_full_sync", time.time())
+            _set_index_meta(conn, "header_signature", signature)
+        conn.executemany(
+            "INSERT OR REPLACE INTO pending (row_index, content_id, due_at, date, time) "
+            "VALUES (?, ?, ?, ?, ?)",
+            [
+                (row_index, content_id, due_at_key(date_val, time_val), date_val, time_val)
+                for row_index, content_id, date_val, time_val in candidates
+            ],
+        )
+        _set_index_meta(conn, "watermark", last_row if full else max(watermark, last_row))
+    return "full" if full else "incremental"
+
+
+def refresh_pending_index(conn, content_sheet):
+    """
+    Bring the index up to date with the sheet. When SKIP_UNCHANGED_READS is
+    on and the spreadsheet version matches the last snapshot, the header and
+    sync reads are skipped; any change forces a full reconcile.
+    Returns (headers, header_map), or None if ContentPlan has no 'id' column.
+    """
+    version = None
+    headers = json.loads(_index_meta(conn, "headers", "[]"))
+    unchanged = False
+    if SKIP_UNCHANGED_READS:
+        version = _SHEETS_CACHE["prefetched_version"] or current_spreadsheet_version()
+        _SHEETS_CACHE["prefetched_version"] = None
+        since_full = time.time() - float(_index_meta(conn, "last_full_sync", 0))
+        unchanged = (
+            bool(headers)
+            and version == _index_meta(conn, "spreadsheet_version")
+            and since_full < PENDING_INDEX_FULL_SYNC_SECONDS
+        )
+
+    if unchanged:
+        remember_header_row(content_sheet, headers)
+        header_map = header_map_from_row(headers)
+        RUN_STATS["index_sync_skipped"] = True
+    else:
+        headers = read_header_row(content_sheet)
+        header_map = header_map_from_row(headers)
+        if "id" not in header_map:
+            return None
+        sync_pending_index(conn, content_sheet, header_map, full=version is not None)
+        with conn:
+            _set_index_meta(conn, "headers", json.dumps(headers))
+            if version is not None:
+                # The version read *before* syncing, so edits made meanwhile
+                # still look like a change next run
+                _set_index_meta(conn, "spreadsheet_version", version)
+    return headers, header_map
+
+
+def find_pending_from_index(conn, content_sheet):
+    """
+    Answer find_all_pending_content() from the index: sync, range-query by
+    due time, then fetch and re-check the due rows. A row whose id no longer
+    matches its index entry means rows were moved by hand, so the index is
+    rebuilt and the query retried once. Returns None if ContentPlan has no
+    'id' column.
+    """
+    synced = refresh_pending_index(conn, content_sheet)
+    if synced is None:
+        return None
+    headers, header_map = synced
+
+    id_key = headers[header_map["id"] - 1]
+    for attempt in range(2):
+        now = get_bot_now()
+        now_key = now.strftime("%Y-%m-%d %H:%M")
+        entries = {
+            row_index: content_id
+            for row_index, content_id in conn.execute(
+                "SELECT row_index, content_id FROM pending "
+                "WHERE due_at <= ? ORDER BY due_at, row_index",
+                (now_key,),
+            )
+        }
+        if not entries:
+            return []
+
+        fetched = fetch_rows(content_sheet, headers, entries)
+        pending_rows, moved, not_pending, rescheduled = [], [], [], []
+        for row in fetched:
+            row_index = row["__row_index__"]
+            if str(row.get(id_key, "")).strip() != entries[row_index]:
+                moved.append(row_index)
+                continue
+            date_val = normalize_sheet_date(row.get("date"))
+            time_val = normalize_sheet_time(row.get("time"))
+            status = (row.get("status") or "").strip().lower()
+            lease = parse_lease(status)
+            if lease and lease[1] > time.time():
+                # Claimed by a live run; look again when the lease runs out
+                rescheduled.append((bot_time_key(lease[1]), date_val, time_val, row_index))
+            elif not is_schedulable(status):
+                not_pending.append((row_index,))
+            elif not is_row_due(status, date_val, time_val, now):
+                rescheduled.append((due_at_key(date_val, time_val), date_val, time_val, row_index))
+            elif row_retry_at(row) > now_key:
+                # A retry row is due again when its backoff ends
+                rescheduled.append((row_retry_at(row), date_val, time_val, row_index))
+            else:
+                row["date"], row["time"] = date_val, time_val
+                pending_rows.append(row)
+
+        with conn:
+            conn.executemany("DELETE FROM pending WHERE row_index = ?", not_pending)
+            conn.executemany(
+                "UPDATE pending SET due_at = ?, date = ?, time = ? WHERE row_index = ?",
+                rescheduled,
+            )
+
+        if not moved:
+            return pending_rows
+        print(f"[INFO] {len(moved)} indexed row(s) moved in the sheet; rebuilding pending index.")
+        sync_pending_index(conn, content_sheet, header_map, full=True)
+
+    # Rows keep moving under us; only return rows that were verified
+    return pending_rows
+
+
+def nothing_due_fast() -> bool:
+    """
+    Answer the common "nothing due" run from the local index alone: no indexed
+    row is due, no PostLog spool is waiting and the spreadsheet version still
+    matches the last snapshot (the same test refresh_pending_index() uses to
+    skip its reads). Costs one Drive call; gspread is not imported and the
+    spreadsheet is not opened. False means "run normally".
+    """
+    if not (PENDING_INDEX_ENABLED and SKIP_UNCHANGED_READS and GOOGLE_SHEETS_DOC_KEY):
+        return False
+    if os.path.exists(POSTLOG_SPOOL_PATH) or not os.path.exists(PENDING_INDEX_PATH):
+        return False
+    conn = open_pending_index()
+    try:
+        since_full = time.time() - float(_index_meta(conn, "last_full_sync", 0))
+        if _index_meta(conn, "headers", "[]") == "[]" or since_full >= PENDING_INDEX_FULL_SYNC_SECONDS:
+            return False
+        now_key = get_bot_now().strftime("%Y-%m-%d %H:%M")
+        if conn.execute("SELECT 1 FROM pending WHERE due_at <= ? LIMIT 1", (now_key,)).fetchone():
+            return False
+        version = current_spreadsheet_version()
+        if version == _index_meta(conn, "spreadsheet_version"):
+            return True
+        # The sheet changed: the normal run that follows reuses this fetch
+        _SHEETS_CACHE["prefetched_version"] = version
+        return False
+    finally:
+        conn.close()
+
+
+def record_spreadsheet_version():
+    """
+    Snapshot the version after this run's own writes, so they don't look like
+    outside edits next run. An edit made by hand during the run is picked up
+    by the next periodic full reconcile.
+    """
+    if not (PENDING_INDEX_ENABLED and SKIP_UNCHANGED_READS):
+        return
+    try:
+        version = current_spreadsheet_version()
+    except Exception as e:
+        print(f"[WARN] Could not read spreadsheet version ({e}); next run will re-sync.")
+        return
+    conn = open_pending_index()
+    try:
+        with conn:
+            _set_index_meta(conn, "spreadsheet_version", version)
+    finally:
+        conn.close()
+
+
+def discard_from_pending_index(row_indexes):
+    """
+    Drop rows whose status this run changed, so the next run doesn't fetch them.
+    """
+    if not (PENDING_INDEX_ENABLED and row_indexes):
+        return
+    conn = open_pending_index()
+    try:
+        with conn:
+            conn.executemany(
+                "DELETE FROM pending WHERE row_index = ?", [(r,) for r in row_indexes]
+            )
+    finally:
+        conn.close()
+
+
+def forget_indexed_headers():
+    """
+    The header row changed: make the next run re-read it instead of using
+    the copy stored with the index.
+    """
+    if not PENDING_INDEX_ENABLED:
+        return
+    conn = open_pending_index()
+    try:
+        with conn:
+            _set_index_meta(conn, "headers", "[]")
+    finally:
+        conn.close()
+
+
+def reschedule_in_pending_index(entries):
+    """
+    Keep rows this run set to 'retry' in the index, due at their retry time.
+    entries: (row_index, content_id, due_at, date, time) tuples.
+    """
+    if not (PENDING_INDEX_ENABLED and entries):
+        return
+    conn = open_pending_index()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO pending (row_index, content_id, due_at, date, time) "
+                "VALUES (?, ?, ?, ?, ?)",
+                entries,
+            )
+    finally:
+        conn.close()
+
+
+def header_map_from_row(headers) -> dict:
+    """
+    {lowercased header: 1-based column index} for a header row.
+    """
+    return {
+        h.strip().lower(): idx
+        for idx, h in enumerate(headers, start=1)
+        if h.strip()
+    }
+
+
+def remember_header_row(ws, headers):
+    with _SHEETS_CACHE_LOCK:
+        _SHEETS_CACHE["headers"][ws.title] = header_map_from_row(headers)
+
+
+def read_header_row(ws) -> list:
+    """
+    Read row 1 (one API call) and refresh the cached header map for ws.
+    """
+    headers = [h.strip() for h in sheets_call("read", ws.row_values, 1)]
+    remember_header_row(ws, headers)
+    return headers
+
+
+def get_header_map(ws) -> dict:
+    """
+    Returns {lowercased header: 1-based column index} from a single read of row 1.
+    """
+    return header_map_from_row(read_header_row(ws))
+
+
+def get_column_index_by_header(ws, header_name: str, header_map=None) -> int:
+    """
+    Returns the 1-based column index for a header name (case-insensitive).
+    Pass a header_map from get_header_map() to avoid re-reading row 1.
+    """
+    if header_map is None:
+        header_map = get_header_map(ws)
+    target = header_name.strip().lower()
+
+    if target not in header_map:
+        raise ValueError(
+            f"Header '{header_name}' not found. Headers: {list(header_map)}"
+        )
+
+    return header_map[target]  # 1-based for gspread
+
+
+def ensure_column(ws, header_name) -> int:
+    """
+    1-based index of header_name, adding it after the last header (one write)
+    if the sheet doesn't have it yet.
+    """
+    header_map = get_cached_header_map(ws)
+    key = header_name.strip().lower()
+    if key not in header_map:
+        col = max(header_map.values(), default=0) + 1
+        sheets_call("write", ws.update_cell, 1, col, header_name)
+        print(f"[INFO] Added '{header_name}' column to {ws.title} (column {col}).")
+        with _SHEETS_CACHE_LOCK:
+            header_map[key] = col
+        forget_indexed_headers()
+    return header_map[key]
+
+
+def update_content_status(content_sheet, row_index, new_status):
+    """
+    Update the status cell for a given row using the 'status' header.
+    Costs two API calls; process_all_pending_items() batches instead.
+    """
+    status_col = get_column_index_by_header(content_sheet, "status")
+    sheets_call("write", content_sheet.update_cell, row_index, status_col, new_status)
+
+
+def flush_status_updates(content_sheet, status_col, status_updates, targets_col=None):
+    """
+    Write all queued {row_index: status} changes in one batched range update
+    and clear the queue. A value may also be (status, targets_status JSON),
+    written to targets_col in the same call. If the batch is rejected (e.g.
+    400) it is retried in halves, down to single rows, so one bad row can't
+    block the rest; if it still fails after sheets_call's own retries (quota,
+    5xx), the whole flush gives up instead of repeating them per piece.
+    Returns the (row_index, status) pairs that could not be written.
+    """
+    if not status_updates:
+        return []
+
+    pending = [sorted(status_updates.items())]
+    status_updates.clear()
+    failed = []
+    while pending:
+        items = pending.pop(0)
+        error = _write_status_chunk(content_sheet, status_col, targets_col, items)
+        if error is None:
+            continue
+        if _is_retryable(error):
+            remaining = items + [item for chunk in pending for item in chunk]
+            print(f"[ERROR] Status flush failed ({error}); {len(remaining)} row(s) not written.")
+            failed.extend(remaining)
+            break
+        if len(items) == 1:
+            print(f"[ERROR] Could not write status for row {items[0][0]}: {error}")
+            failed.extend(items)
+            continue
+        print(
+            f"[WARN] Status flush of {len(items)} row(s) failed ({error}). "
+            "Retrying in smaller chunks."
+        )
+        mid = len(items) // 2
+        pending[:0] = [items[:mid], items[mid:]]
+    return [
+        (row_index, value[0] if isinstance(value, tuple) else value)
+        for row_index, value in failed
+    ]
+
+
+def _write_status_chunk(content_sheet, status_col, targets_col, items):
+    """One batch_update for `items`; returns the error, or None on success."""
+    data = []
+    for row_index, value in items:
+        new_status, targets = value if isinstance(value, tuple) else (value, None)
+        data.append({"range": rowcol_to_a1(row_index, status_col), "values": [[new_status]]})
+        if targets is not None and targets_col:
+            data.append({"range": rowcol_to_a1(row_index, targets_col), "values": [[targets]]})
+
+    started = time.monotonic()
+    error = None
+    try:
+        sheets_call("write", content_sheet.batch_update, data)
+    except Exception as e:
+        error = e
+    bump_stat("status_calls")
+    bump_stat("status_seconds", time.monotonic() - started)
+
+    if error is None:
+        bump_stat("status_rows", len(items))
+    return error
+
+
+def new_lease_owner() -> str:
+    """Unique per run: host, pid and a random suffix."""
+    return f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+
+
+def read_id_status_cells(content_sheet, id_col, status_col, row_indexes) -> dict:
+    """
+    {row_index: (id, status)} for the given rows, reading only those two
+    columns, in one batch_get per chunk of ranges.
+    """
+    runs = _row_runs(row_indexes)
+    ranges = [
+        f"{letter}{start}:{letter}{end}"
+        for letter in (_column_letter(id_col), _column_letter(status_col))
+        for start, end in runs
+    ]
+    cells_by_col = {}
+    for i in range(0, len(ranges), PENDING_FETCH_RANGES_PER_CALL):
+        chunk = ranges[i:i + PENDING_FETCH_RANGES_PER_CALL]
+        for a1, block in zip(chunk, sheets_call("read", content_sheet.batch_get, chunk)):
+            letter, start = re.match(r"([A-Z]+)(\d+):", a1).groups()
+            for offset, cells in enumerate(block):
+                cells_by_col[(letter, int(start) + offset)] = str(cells[0]).strip() if cells else ""
+    id_letter, status_letter = _column_letter(id_col), _column_letter(status_col)
+    return {
+        r: (cells_by_col.get((id_letter, r), ""), cells_by_col.get((status_letter, r), ""))
+        for r in row_indexes
+    }
+
+
+def claim_rows(content_sheet, rows, owner):
+    """
+    Lease due rows for this run: re-read their id and status cells and drop
+    rows whose status changed since the scan (leased or finished by another
+    run) or whose id changed (rows moved, e.g. by --archive), write our lease
+    into the rest in one batch, wait LEASE_SETTLE_SECONDS for competing
+    writes to land, then re-read the cells and keep only rows that still
+    carry our lease and their id. Each kept row gets '__claimed_from__' (the
+    status to restore if it isn't finished).
+    """
+    if not (CLAIM_LEASES and rows):
+        return rows
+    if CLAIM_MAX_ROWS:
+        rows = rows[:CLAIM_MAX_ROWS]
+
+    header_map = get_cached_header_map(content_sheet)
+    status_col = get_column_index_by_header(content_sheet, "status", header_map)
+    id_col = get_column_index_by_header(content_sheet, "id", header_map)
+
+    def same_row(row, cells):
+        return cells[0] == str(row.get("id") or "").strip()
+
+    # The scan may be old by now (throttling, backoff): never overwrite a
+    # lease or final status that landed since, nor a row that moved
+    before = read_id_status_cells(
+        content_sheet, id_col, status_col, [row["__row_index__"] for row in rows]
+    )
+    candidates = []
+    moved = 0
+    for row in rows:
+        cells = before[row["__row_index__"]]
+        if not same_row(row, cells):
+            moved += 1
+        elif cells[1] == (row.get("status") or "").strip() and is_schedulable(cells[1]):
+            candidates.append(row)
+    if moved:
+        print(f"[WARN] {moved} due row(s) moved since the scan (rows deleted or archived?); skipping them.")
+    taken = len(rows) - len(candidates) - moved
+    rows = candidates
+    if not rows:
+        bump_stat("lease_lost", taken)
+        if taken:
+            print(f"[INFO] {taken} row(s) were claimed by another run; skipping them.")
+        return []
+
+    lease = f"{LEASE_PREFIX}{owner}:{int(time.time()) + LEASE_SECONDS}"
+    sheets_call("write", content_sheet.batch_update, [
+        {"range": rowcol_to_a1(row["__row_index__"], status_col), "values": [[lease]]}
+        for row in rows
+    ])
+    if LEASE_SETTLE_SECONDS:
+        time.sleep(LEASE_SETTLE_SECONDS)
+    current = read_id_status_cells(
+        content_sheet, id_col, status_col, [row["__row_index__"] for row in rows]
+    )
+
+    claimed = []
+    for row in rows:
+        cells = current[row["__row_index__"]]
+        if cells[1] != lease:
+            continue
+        if not same_row(row, cells):
+            # Rows moved just before our write, so the lease landed on a
+            # different row; it expires after LEASE_SECONDS
+            print(
+                f"[WARN] Row {row['__row_index__']} now holds content ID {cells[0]!r}, not "
+                f"{row.get('id')!r}; our lease landed on it. Check that row's status."
+            )
+            continue
+        status = (row.get("status") or "").strip()
+        if parse_lease(status):
+            bump_stat("lease_reclaimed")
+            status = "pending"
+        row["__claimed_from__"] = status or "pending"
+        claimed.append(row)
+
+    lost = taken + len(rows) - len(claimed)
+    bump_stat("lease_claimed", len(claimed))
+    bump_stat("lease_lost", lost)
+    if lost:
+        print(f"[INFO] {lost} row(s) were claimed by another run; skipping them.")
+    return claimed
+
+
+def new_post_log_buffer(log_sheet):
+    """
+    Create an in-memory PostLog buffer. Rows spooled by an earlier run that
+    could not reach the sheet are loaded first so they go out with this run;
+    the spool file is only trimmed as they are written (see flush_post_log).
+    """
+    rows = []
+    if os.path.exists(POSTLOG_SPOOL_PATH):
+        with open(POSTLOG_SPOOL_PATH, newline="", encoding="utf-8") as f:
+            rows = [r for r in csv.reader(f) if r]
+        print(f"[INFO] Loaded {len(rows)} spooled PostLog row(s) from '{POSTLOG_SPOOL_PATH}'.")
+    # "spooled": how many rows at the front of the buffer are still in the spool file
+    return {"sheet": log_sheet, "rows": rows, "spooled": len(rows), "last_flush": time.monotonic()}
+
+
+def _rewrite_postlog_spool(rows):
+    """Replace the spool file with `rows` (removing it when there are none)."""
+    if not rows:
+        if os.path.exists(POSTLOG_SPOOL_PATH):
+            os.remove(POSTLOG_SPOOL_PATH)
+        return
+    os.makedirs(os.path.dirname(POSTLOG_SPOOL_PATH) or ".", exist_ok=True)
+    tmp_path = f"{POSTLOG_SPOOL_PATH}.tmp"
+    with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+    os.replace(tmp_path, POSTLOG_SPOOL_PATH)
+
+
+def append_post_log(log_buffer, content_id, platform, caption_used, post_url):
+    """
+    Queue one PostLog row; flushes when the buffer is full or old enough.
+    A failed mid-run flush keeps the rows buffered for the next attempt.
+    """
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_buffer["rows"].append([timestamp, content_id, platform, caption_used, post_url])
+
+    due = (
+        len(log_buffer["rows"]) >= POSTLOG_FLUSH_ROWS
+        or time.monotonic() - log_buffer["last_flush"] >= POSTLOG_FLUSH_SECONDS
+    )
+    if due:
+        try:
+            flush_post_log(log_buffer)
+        except Exception as e:
+            print(f"[WARN] PostLog flush failed ({e}). Keeping {len(log_buffer['rows'])} row(s) buffered.")
+
+
+def flush_post_log(log_buffer):
+    """
+    Append all buffered rows with append_rows(), POSTLOG_BATCH_MAX rows per call.
+    Rows are only dropped from the buffer (and from the spool file, if they
+    came from it) once their batch is written.
+    """
+    rows = log_buffer["rows"]
+    while rows:
+        batch = rows[:POSTLOG_BATCH_MAX]
+        bump_stat("postlog_calls")
+        sheets_call("write", log_buffer["sheet"].append_rows, batch, idempotent=False)
+        bump_stat("postlog_rows", len(batch))
+        del rows[:len(batch)]
+        if log_buffer["spooled"]:
+            log_buffer["spooled"] = max(0, log_buffer["spooled"] - len(batch))
+            _rewrite_postlog_spool(rows[:log_buffer["spooled"]])
+    log_buffer["last_flush"] = time.monotonic()
+
+
+def close_post_log(log_buffer):
+    """
+    Final flush at the end of a run. Anything that still cannot be written
+    is spooled to POSTLOG_SPOOL_PATH so no log lines are lost.
+    """
+    try:
+        flush_post_log(log_buffer)
+    except Exception as e:
+        rows = log_buffer["rows"]
+        print(f"[ERROR] PostLog flush failed ({e}). Spooling {len(rows)} row(s) to '{POSTLOG_SPOOL_PATH}'.")
+        if log_buffer["spooled"]:
+            # The spool still holds the rows it gave us; write it out whole
+            _rewrite_postlog_spool(rows)
+        else:
+            os.makedirs(os.path.dirname(POSTLOG_SPOOL_PATH) or ".", exist_ok=True)
+            with open(POSTLOG_SPOOL_PATH, "a", newline="", encoding="utf-8") as f:
+                csv.writer(f).writerows(rows)
+        log_buffer["spooled"] = 0
+        rows.clear()
+
+
+# =========================
+# 3. CAPTION GENERATION (NO OPENAI)
+# =========================
+
+def generate_caption_if_needed(platform, idea, caption_existing, hashtags_existing):
+    """
+    TEMP VERSION (no OpenAI):
+    - Uses caption/hashtags from the sheet if provided.
+    - If they are empty, builds a simple fallback caption + basic hashtags.
+    This lets us test the full pipeline without calling the OpenAI API.
+    """
+    caption = (caption_existing or "").strip()
+    hashtags = (hashtags_existing or "").strip()
+
+    # If no caption provided in sheet, create a simple one from the idea
+    if not caption:
+        caption = f"{idea} (auto-generated caption for {platform})"
+
+    # If no hashtags provided, add some generic ones
+    if not hashtags:
+        hashtags = "#globalbiznex #marketing #automation"
+
+    full_caption = caption
+    if hashtags:
+        full_caption += "\n\n" + hashtags
+
+    return full_caption
+
+
+# =========================
+# 4. SOCIAL POSTING (SIMULATED FB / LINKEDIN / IG)
+# =========================
+
+""" def post_to_facebook(caption):
+    
+    Post text to a Facebook Page using the Graph API.
+
+    If FB creds not set, just print and return a fake URL.
+    
+    if not FB_PAGE_ACCESS_TOKEN or not FB_PAGE_ID:
+        print("[INFO] FB credentials not set. Simulating FB page post...")
+        print("----- FB PAGE POST START -----")
+        print(caption)
+        print("----- FB PAGE POST END -------")
+        fake_url = "https://facebook.com/fake_page_post"
+        return fake_url
+
+    # Real FB API call would go here
+    url = f"https://graph.facebook.com/{FB_PAGE_ID}/feed"
+    params = {
+        "message": caption,
+        "access_token": FB_PAGE_ACCESS_TOKEN,
+    }
+
+    resp = requests.post(url, data=params)
+    if resp.status_code != 200:
+        print("[ERROR] FB post failed:", resp.text)
+        return None
+
+    data = resp.json()
+    post_id = data.get("id")
+    if not post_id:
+        return None
+
+    post_url = f"https://www.facebook.com/{FB_PAGE_ID}/posts/{post_id.split('_')[-1]}"
+    return post_url """
+
+# ---- Shared HTTP session ----
+
+_HTTP_SESSION = {"session": None, "http2": False}
+_HTTP_SESSION_LOCK = threading.Lock()
+
+# Per-host request latencies (seconds) for this run, see print_run_summary()
+HTTP_LATENCIES = {}
+
+
+def _new_http_session():
+    """
+    Build the pooled session: httpx with HTTP/2 if asked for and available,
+    else requests with a sized urllib3 pool.
+    """
+    if HTTP2_ENABLED:
+        try:
+            import httpx
+            return httpx.Client(
+                http2=True,
+                timeout=httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=HTTP_POOL_CONNECTIONS * HTTP_POOL_MAXSIZE,
+                    max_keepalive_connections=HTTP_POOL_MAXSIZE,
+                ),
+            ), True
+        except ImportError:
+            print("[WARN] HTTP2=1 but httpx[http2] is not installed; using requests (HTTP/1.1).")
+
+    import requests
+
+    session = requests.Session()
+    # No automatic retries: a failed post is reported, not silently re-sent
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=HTTP_POOL_CONNECTIONS,
+        pool_maxsize=HTTP_POOL_MAXSIZE,
+        max_retries=0,
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session, False
+
+
+def get_http_session():
+    """
+    Process-wide HTTP session for platform APIs (thread-safe, created lazily).
+    """
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION["session"] is None:
+            _HTTP_SESSION["session"], _HTTP_SESSION["http2"] = _new_http_session()
+        return _HTTP_SESSION["session"]
+
+
+def close_http_session():
+    with _HTTP_SESSION_LOCK:
+        if _HTTP_SESSION["session"] is not None:
+            _HTTP_SESSION["session"].close()
+            _HTTP_SESSION["session"] = None
+
+
+def http_request(method, url, **kwargs):
+    """
+    Send one request on the shared session with connect/read timeouts and
+    record its latency under the URL's host. Returns the response (requests
+    or httpx; both have status_code, text and json()). Errors are raised.
+    """
+    session = get_http_session()
+    if not _HTTP_SESSION["http2"]:
+        kwargs.setdefault("timeout", (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT))
+
+    host = urllib.parse.urlsplit(url).netloc
+    started = time.monotonic()
+    try:
+        return session.request(method, url, **kwargs)
+    except Exception:
+        bump_stat("http_errors")
+        raise
+    finally:
+        elapsed = time.monotonic() - started
+        bump_stat("http_requests")
+        with _RUN_STATS_LOCK:
+            HTTP_LATENCIES.setdefault(host, []).append(elapsed)
+
+
+def http_post(url, **kwargs):
+    # Platform posts are the only POSTs the bot makes (all to the Graph API)
+    bump_stat("graph_posts")
+    return http_request("POST", url, **kwargs)
+
+
+def latency_percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+# ---- Simulated platform conditions (RUN_MODE=simulate) ----
+
+SIMULATE_PLATFORMS = {"FB", "IG", "LinkedIn", "*"}
+SIMULATE_RATE_KEYS = ["timeout_rate", "rate_limit_rate", "error_rate"]
+
+# Graph-style bodies, so simulated failures read like live ones
+SIMULATED_FAILURES = {
+    "rate_limit": (429, {"message": "(#4) Application request limit reached", "code": 4}),
+    "error": (500, {"message": "An unexpected error has occurred. Please retry your request later.", "code": 2}),
+}
+
+_SIMULATE = {"raw": None, "profiles": {}, "rng": random.Random(SIMULATE_SEED)}
+# Key of the post the current thread is making, for seeding (see _post_task)
+_SIMULATE_TASK = threading.local()
+
+
+def parse_latency_spec(spec):
+    """
+    "0.3" / "uniform:0.1:0.5" / "normal:0.3:0.1" / "lognormal:0.3:0.5" /
+    "exp:0.3" -> (kind, a, b). Raises ValueError.
+    """
+    parts = str(spec).split(":")
+    kind, args = (parts[0], parts[1:]) if len(parts) > 1 else ("fixed", parts)
+    needed = {"fixed": 1, "exp": 1, "uniform": 2, "normal": 2, "lognormal": 2}
+    if kind not in needed or len(args) != needed[kind]:
+        raise ValueError(f"Bad latency '{spec}' in SIMULATE_PROFILE")
+    values = [float(a) for a in args] + [0.0]
+    if values[0] < 0 or (kind in ("exp", "lognormal") and values[0] <= 0):
+        raise ValueError(f"Bad latency '{spec}' in SIMULATE_PROFILE")
+    return kind, values[0], values[1]
+
+
+def parse_simulate_profile(raw):
+    """
+    SIMULATE_PROFILE (JSON text or a path to a JSON file) ->
+    {platform: {"latency": spec or None, "<x>_rate": float, "timeout_seconds": float}}.
+    Raises ValueError on anything it doesn't understand.
+    """
+    if not raw.strip():
+        return {}
+    if raw.lstrip().startswith("{"):
+        data = json.loads(raw)
+    else:
+        with open(raw, encoding="utf-8") as f:
+            data = json.load(f)
+
+    profiles = {}
+    for platform, conf in data.items():
+        if platform not in SIMULATE_PLATFORMS:
+            raise ValueError(
+                f"Unknown platform '{platform}' in SIMULATE_PROFILE "
+                f"(use {', '.join(sorted(SIMULATE_PLATFORMS))})"
+            )
+        unknown = set(conf) - set(SIMULATE_RATE_KEYS) - {"latency", "timeout_seconds"}
+        if unknown:
+            raise ValueError(f"Unknown SIMULATE_PROFILE key(s) for {platform}: {', '.join(sorted(unknown))}")
+        profile = {
+            "latency": parse_latency_spec(conf["latency"]) if "latency" in conf else None,
+            "timeout_seconds": float(conf.get("timeout_seconds", HTTP_READ_TIMEOUT)),
+        }
+        for key in SIMULATE_RATE_KEYS:
+            profile[key] = float(conf.get(key, 0))
+            if not 0 <= profile[key] <= 1:
+                raise ValueError(f"SIMULATE_PROFILE {platform}.{key} must be between 0 and 1")
+        if sum(profile[key] for key in SIMULATE_RATE_KEYS) > 1:
+            raise ValueError(f"SIMULATE_PROFILE {platform}: failure rates add up to more than 1")
+        profiles[platform] = profile
+    return profiles
+
+
+def simulate_profiles():
+    """Parsed SIMULATE_PROFILE (re-parsed if the setting was changed)."""
+    if _SIMULATE["raw"] != SIMULATE_PROFILE:
+        _SIMULATE["profiles"] = parse_simulate_profile(SIMULATE_PROFILE)
+        _SIMULATE["raw"] = SIMULATE_PROFILE
+    return _SIMULATE["profiles"]
+
+
+def simulate_call_key(task, group=None):
+    """'content_id|platform|target|attempt' of one post, for seeding its outcome."""
+    previous = (task.get("state") or {}).get("targets", {}).get(target_name(task["platform"], group))
+    return "|".join(ledger_key(task, group) + (str((previous or {}).get("attempts", 0) + 1),))
+
+
+def draw_simulated_call(platform, key=None):
+    """
+    (latency seconds, outcome) for one simulated call; outcome is None
+    (success), "timeout", "rate_limit" or "error". With SIMULATE_SEED and a
+    key the draw depends only on those; otherwise on the shared generator.
+    """
+    profile = simulate_profiles()
+    profile = profile.get(platform) or profile.get("*") or {}
+    if SIMULATE_SEED is not None and key is not None:
+        rng = random.Random(f"{SIMULATE_SEED}|{platform}|{key}")
+    else:
+        rng = _SIMULATE["rng"]
+
+    roll = rng.random()
+    outcome = None
+    for rate_key in SIMULATE_RATE_KEYS:
+        rate = profile.get(rate_key, 0)
+        if roll < rate:
+            outcome = rate_key[:-len("_rate")]
+            break
+        roll -= rate
+
+    kind, a, b = profile.get("latency") or ("fixed", SIMULATE_LATENCY_SECONDS, 0)
+    if kind == "uniform":
+        latency = rng.uniform(a, b)
+    elif kind == "normal":
+        latency = max(0.0, rng.gauss(a, b))
+    elif kind == "lognormal":
+        latency = rng.lognormvariate(math.log(a), b)
+    elif kind == "exp":
+        latency = rng.expovariate(1 / a)
+    else:
+        latency = a
+    if outcome == "timeout":
+        latency = profile["timeout_seconds"]
+    return latency, outcome
+
+
+def simulated_failure(outcome):
+    """Error string for a simulated "rate_limit"/"error" outcome (counted)."""
+    bump_stat(f"simulated_{outcome}s")
+    code, error = SIMULATED_FAILURES[outcome]
+    return _graph_error(code, json.dumps({"error": error}))
+
+
+def simulate_platform_call(platform, key=None):
+    """
+    Play one simulated API call: sleep its latency and record it like a live
+    request (under host "simulate/<platform>"). Returns None on success or an
+    error string; a simulated timeout raises TimeoutError.
+    """
+    latency, outcome = draw_simulated_call(platform, key)
+    if latency:
+        time.sleep(latency)
+    bump_stat("http_requests")
+    if platform in ("FB", "IG"):
+        bump_stat("graph_posts")
+    with _RUN_STATS_LOCK:
+        HTTP_LATENCIES.setdefault(f"simulate/{platform}", []).append(latency)
+    if outcome == "timeout":
+        bump_stat("http_errors")
+        bump_stat("simulated_timeouts")
+        raise TimeoutError(f"simulated {platform} read timeout after {latency:g}s")
+    return simulated_failure(outcome) if outcome else None
+
+
+def post_to_facebook(caption, image_url, client):
+    if RUN_MODE != "live":
+        log_at("normal", "[SIMULATE] FB page post")
+        error = simulate_platform_call("FB", getattr(_SIMULATE_TASK, "key", None))
+        if error:
+            print("[ERROR] FB post failed:", error)
+            return None
+        return "https://facebook.com/fake_page_post"
+
+    page_id = client["fb_page_id"]
+    token = client["fb_page_access_token"]
+
+    # If image_url exists, use /photos
+    if image_url:
+        url = f"{GRAPH_API_BASE}/{page_id}/photos"
+        data = {"url": image_url, "caption": caption, "access_token": token}
+        resp = http_post(url, data=data)
+    else:
+        url = f"{GRAPH_API_BASE}/{page_id}/feed"
+        data = {"message": caption, "access_token": token}
+        resp = http_post(url, data=data)
+
+    if resp.status_code != 200:
         print("[ERROR] FB post failed:", resp.text)
         return None
 
-    data = resp.json()
-    post_id = data.get("id")
-    if not post_id:
-        return None
+    return "FB_POST_OK"  # you can build real URL later
+
+
+    # live posting code (Graph API) below...
+
+
+def row_groups(row):
+    """'Group A, Group B' -> ['Group A', 'Group B']"""
+    return [g.strip() for g in (row.get("groups") or "").split(",") if g.strip()]
+
+
+def is_graph_group_id(group) -> bool:
+    """Graph group IDs are numeric; anything else is a display name."""
+    return group.isdigit()
+
+
+def facebook_batch_op(task, group=None):
+    """
+    One Graph batch operation for a planned FB task: the page post, or a post
+    to `group`. Each operation carries its own page token, so one batch can
+    mix pages of different clients.
+    """
+    client = task["client"]
+    if group:
+        relative_url = f"{urllib.parse.quote(group)}/feed"
+        body = {"message": task["caption"]}
+    elif task["image_url"]:
+        relative_url = f"{client['fb_page_id']}/photos"
+        body = {"url": task["image_url"], "caption": task["caption"]}
+    else:
+        relative_url = f"{client['fb_page_id']}/feed"
+        body = {"message": task["caption"]}
+    body["access_token"] = client["fb_page_access_token"]
+    return {
+        "task": task,
+        "group": group,
+        "ledger_key": ledger_key(task, group),
+        "method": "POST",
+        "relative_url": relative_url,
+        "body": urllib.parse.urlencode(body),
+    }
+
+
+def _graph_error(code, body):
+    try:
+        error = json.loads(body or "{}").get("error") or {}
+    except ValueError:
+        error = {}
+    return f"HTTP {code}: {error.get('message') or body or 'no response'}"
+
+
+def post_facebook_batch(ops):
+    """
+    Send up to FB_BATCH_MAX operations in one Graph `batch` call.
+    Returns one (post_url, error) per op, in order; post_url is None when
+    that operation failed (the others are unaffected).
+    """
+    if RUN_MODE != "live":
+        log_at("normal", f"[SIMULATE] FB batch of {len(ops)} post(s)")
+        keys = [simulate_call_key(op["task"], op["group"]) for op in ops]
+        # The batch call itself can be slow, throttled or fail as a whole...
+        error = simulate_platform_call("FB", "batch|" + keys[0])
+        if error:
+            print(f"[ERROR] FB batch failed: {error}")
+            return [(None, error)] * len(ops)
+        # ...and each operation in it can fail on its own
+        results = []
+        for op, key in zip(ops, keys):
+            _, outcome = draw_simulated_call("FB", key)
+            if outcome == "timeout":
+                bump_stat("simulated_timeouts")
+                results.append((None, "no response (timed out in batch)"))
+            elif outcome:
+                results.append((None, simulated_failure(outcome)))
+            elif op["group"]:
+                results.append((f"https://facebook.com/groups/{op['group'].replace(' ', '_')}/fake_post", None))
+            else:
+                results.append(("https://facebook.com/fake_page_post", None))
+        return results
+
+    batch = [
+        {"method": op["method"], "relative_url": op["relative_url"], "body": op["body"]}
+        for op in ops
+    ]
+    # The top-level token only authenticates the call; each op uses its own
+    token = ops[0]["task"]["client"]["fb_page_access_token"]
+    resp = http_post(
+        GRAPH_API_BASE + "/",
+        data={"access_token": token, "batch": json.dumps(batch), "include_headers": "false"},
+    )
+    if resp.status_code != 200:
+        error = _graph_error(resp.status_code, resp.text)
+        print(f"[ERROR] FB batch failed: {error}")
+        return [(None, error)] * len(ops)
+
+    results = []
+    responses = resp.json()
+    for i, op in enumerate(ops):
+        item = responses[i] if i < len(responses) else None
+        if item is None:
+            # Graph returns null for operations it didn't complete in time
+            results.append((None, "no response (timed out in batch)"))
+            continue
+        if item.get("code") != 200:
+            results.append((None, _graph_error(item.get("code"), item.get("body"))))
+            continue
+        post_id = json.loads(item.get("body") or "{}").get("id")
+        if not post_id:
+            results.append((None, "no post id in response"))
+            continue
+        results.append((f"https://www.facebook.com/{post_id}", None))
+    return results
+
+
+
+""" def post_to_linkedin(caption):
+    Simulated LinkedIn post.
+    Later, this can be replaced with a real LinkedIn API call.
+
+    if not LINKEDIN_ACCESS_TOKEN:
+        print("[INFO] LinkedIn credentials not set. Simulating LinkedIn post...")
+        print("----- LINKEDIN POST START -----")
+        print(caption)
+        print("----- LINKEDIN POST END -------")
+        fake_url = "https://linkedin.com/posts/fake_linkedin_post"
+        return fake_url
+
+    # Real LinkedIn API integration would go here.
+    # For now, we just simulate even if token is set.
+    fake_url = "https://linkedin.com/posts/fake_linkedin_post_real"
+    return fake_url """
+
+def post_to_linkedin(caption):
+    if RUN_MODE != "live":
+        log_at("normal", "[SIMULATE] LinkedIn post")
+        error = simulate_platform_call("LinkedIn", getattr(_SIMULATE_TASK, "key", None))
+        if error:
+            print("[ERROR] LinkedIn post failed:", error)
+            return None
+        return "https://linkedin.com/posts/fake_linkedin_post"
+
+
+
+""" def post_to_instagram(caption):
+    Simulated Instagram post.
+    Later, this can be replaced with a real Instagram Graph API call.
+
+    if not INSTAGRAM_ACCESS_TOKEN:
+        print("[INFO] Instagram credentials not set. Simulating IG post...")
+        print("----- INSTAGRAM POST START -----")
+        print(caption)
+        print("----- INSTAGRAM POST END -------")
+        fake_url = "https://instagram.com/p/fake_instagram_post"
+        return fake_url
+
+    # Real Instagram API integration would go here.
+    fake_url = "https://instagram.com/p/fake_instagram_post_real"
+    return fake_url """
+
+def post_to_instagram(caption, image_url="", client=None):
+    if RUN_MODE != "live":
+        log_at("normal", "[SIMULATE] IG post")
+        error = simulate_platform_call("IG", getattr(_SIMULATE_TASK, "key", None))
+        if error:
+            print("[ERROR] IG post failed:", error)
+            return None
+        return "https://instagram.com/p/fake_instagram_post"
+
+
+# ---- Post ledger (idempotency) ----
+
+_POST_LEDGER = {"conn": None}
+_POST_LEDGER_LOCK = threading.Lock()
+
+LEDGER_COMPACT_INTERVAL_SECONDS = 24 * 3600
+
+
+def _open_post_ledger():
+    os.makedirs(os.path.dirname(POST_LEDGER_PATH) or ".", exist_ok=True)
+    # Shared by the posting threads; every use holds _POST_LEDGER_LOCK
+    conn = sqlite3.connect(POST_LEDGER_PATH, timeout=30, check_same_thread=False)
+    conn.executescript(
+        """
+        PRAGMA journal_mode = WAL;
+        PRAGMA synchronous = NORMAL;
+        CREATE TABLE IF NOT EXISTS posts (
+            content_id TEXT NOT NULL,
+            platform TEXT NOT NULL,
+            target TEXT NOT NULL,
+            state TEXT NOT NULL,
+            post_url TEXT,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (content_id, platform, target)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS posts_updated_at ON posts (updated_at);
+        CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """
+    )
+    compact_post_ledger(conn)
+    return conn
+
+
+def compact_post_ledger(conn, force=False):
+    """
+    Delete entries older than POST_LEDGER_RETENTION_DAYS (at most once a day
+    unless force). By then their rows are long past 'pending'.
+    """
+    now = time.time()
+    last = float(_index_meta(conn, "last_compact_at", 0))
+    if not force and now - last < LEDGER_COMPACT_INTERVAL_SECONDS:
+        return 0
+    with conn:
+        deleted = conn.execute(
+            "DELETE FROM posts WHERE updated_at < ?",
+            (now - POST_LEDGER_RETENTION_DAYS * 86400,),
+        ).rowcount
+        _set_index_meta(conn, "last_compact_at", now)
+    if deleted:
+        print(f"[INFO] Post ledger: compacted {deleted} old entr(ies).")
+    return deleted
+
+
+def _ledger_conn():
+    if _POST_LEDGER["conn"] is None:
+        _POST_LEDGER["conn"] = _open_post_ledger()
+    return _POST_LEDGER["conn"]
+
+
+def close_post_ledger():
+    with _POST_LEDGER_LOCK:
+        if _POST_LEDGER["conn"] is not None:
+            _POST_LEDGER["conn"].close()
+            _POST_LEDGER["conn"] = None
+
+
+def ledger_key(task, group=None):
+    """(content_id, platform, target): target is the group, or 'main'."""
+    return (str(task["content_id"] or "").strip(), task["platform"], group or "main")
+
+
+def _ledgered(key) -> bool:
+    # A blank id would make every hand-entered row without one the same post
+    return POST_LEDGER_ENABLED and bool(key[0])
+
+
+def ledger_lookup(key):
+    """(state, post_url) recorded for key, or None if never attempted."""
+    if not _ledgered(key):
+        return None
+    with _POST_LEDGER_LOCK:
+        return _ledger_conn().execute(
+            "SELECT state, post_url FROM posts "
+            "WHERE content_id = ? AND platform = ? AND target = ?",
+            key,
+        ).fetchone()
+
+
+def ledger_begin(keys):
+    """Mark targets as 'started' (committed) right before their post call."""
+    keys = [key for key in keys if _ledgered(key)]
+    if not keys:
+        return
+    now = time.time()
+    with _POST_LEDGER_LOCK:
+        conn = _ledger_conn()
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO posts (content_id, platform, target, state, attempts, updated_at)
+                VALUES (?, ?, ?, 'started', 1, ?)
+                ON CONFLICT (content_id, platform, target) DO UPDATE SET
+                    state = 'started', attempts = attempts + 1, updated_at = excluded.updated_at
+                """,
+                [key + (now,) for key in keys],
+            )
+
+
+def ledger_finish(key, post_url):
+    """Record the outcome: 'posted' with its URL, or 'failed' (safe to retry)."""
+    if not _ledgered(key):
+        return
+    with _POST_LEDGER_LOCK:
+        conn = _ledger_conn()
+        with conn:
+            conn.execute(
+                "UPDATE posts SET state = ?, post_url = ?, updated_at = ? "
+                "WHERE content_id = ? AND platform = ? AND target = ?",
+                ("posted" if post_url else "failed", post_url, time.time()) + key,
+            )
+
+
+# ---- Concurrent posting engine ----
+
+PLATFORM_ALIASES = {
+    "fb": "FB",
+    "facebook": "FB",
+    "ig": "IG",
+    "instagram": "IG",
+    "li": "LinkedIn",
+    "linkedin": "LinkedIn",
+}
+
+
+def canonical_platform(platform):
+    """
+    "facebook" -> "FB", "li" -> "LinkedIn", ...; None if not supported.
+    """
+    return PLATFORM_ALIASES.get(platform.strip().lower())
+
+
+def post_to_platform(platform, caption, image_url, client):
+    """
+    Dispatch one post to the adapter for a canonical platform name.
+    """
+    if platform == "FB":
+        return post_to_facebook(caption, image_url=image_url, client=client)
+    if platform == "IG":
+        return post_to_instagram(caption, image_url=image_url, client=client)
+    if platform == "LinkedIn":
+        return post_to_linkedin(caption)
+    raise ValueError(f"Unsupported platform '{platform}'")
+
+
+def _post_task(task):
+    if "ops" in task:
+        ops = task["ops"]
+        ledger_begin([op["ledger_key"] for op in ops])
+        try:
+            results = post_facebook_batch(ops)
+        except Exception as e:
+            print(f"[ERROR] FB batch of {len(ops)} post(s) raised: {e}")
+            results = [(None, str(e))] * len(ops)
+        for op, (post_url, _) in zip(ops, results):
+            ledger_finish(op["ledger_key"], post_url)
+        return results
+
+    ledger_begin([task["ledger_key"]])
+    if RUN_MODE != "live":
+        _SIMULATE_TASK.key = simulate_call_key(task)
+    try:
+        post_url = post_to_platform(
+            task["platform"], task["caption"], task["image_url"], task["client"]
+        )
+    except Exception as e:
+        print(f"[ERROR] {task['platform']} post for content ID {task['content_id']} raised: {e}")
+        post_url = None
+    finally:
+        _SIMULATE_TASK.key = None
+    ledger_finish(task["ledger_key"], post_url)
+    return post_url
+
+
+def run_post_tasks(tasks, deadline=None):
+    """
+    Run post tasks (dicts with platform, client_key, client, caption,
+    image_url, content_id) on a thread pool. Yields (task, post_url) as each
+    post completes; post_url is None on failure. FB batch tasks (with "ops")
+    yield a list of (post_url, error), one per op.
+
+    Tasks are dispatched in list order, but only while their platform and
+    client_key are under their limits, so no worker sits blocked holding a
+    slot. Tasks with client_key None (batches mixing clients) only count
+    against the platform. Once time.monotonic() passes `deadline` no new task
+    is started; tasks never started yield nothing.
+    """
+    def past_deadline():
+        if deadline is None or time.monotonic() < deadline:
+            return False
+        RUN_STATS["deadline_hit"] = True
+        return True
+
+    if POST_WORKERS <= 1:
+        for task in tasks:
+            if past_deadline():
+                return
+            yield task, _post_task(task)
+        return
+
+    queue = list(tasks)
+    running = {}
+    by_platform = Counter()
+    by_client = Counter()
+
+    pool = ThreadPoolExecutor(max_workers=POST_WORKERS, thread_name_prefix="post")
+    try:
+        while queue or running:
+            if queue and past_deadline():
+                queue = []
+                if not running:
+                    break
+            waiting = []
+            for task in queue:
+                if (
+                    len(running) < POST_WORKERS
+                    and by_platform[task["platform"]] < PLATFORM_LIMITS.get(task["platform"], 1)
+                    and (
+                        task["client_key"] is None
+                        or by_client[task["client_key"]] < POST_LIMIT_PER_CLIENT
+                    )
+                ):
+                    running[pool.submit(_post_task, task)] = task
+                    by_platform[task["platform"]] += 1
+                    by_client[task["client_key"]] += 1
+                else:
+                    waiting.append(task)
+            queue = waiting
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                task = running.pop(future)
+                by_platform[task["platform"]] -= 1
+                by_client[task["client_key"]] -= 1
+                yield task, future.result()
+    finally:
+        # If the caller stops early, don't start posts nobody will record
+        pool.shutdown(wait=True, cancel_futures=True)
+
+
+
+# =========================
+# 5. WORD DOC LOGGING
+# =========================
+
+# Word log entries are buffered for the whole run and written with a single
+# open + save at the end: python-docx re-parses and re-serializes the whole
+# file on every save, so saving per entry grew quadratically with the log.
+# The log rotates to one file per month (post_log_2026-10.docx) and continues
+# in post_log_2026-10_2.docx, ... once a part reaches DOCX_LOG_MAX_MB, which
+# also caps the cost of each run's save. If the file can't be written (e.g.
+# it is open in Word) the entries are spooled to DOCX_LOG_SPOOL_PATH and
+# written by the next run. Set DOCX_LOG=0 to turn the Word log off.
+DOCX_LOG_ENABLED = (os.getenv("DOCX_LOG") or "1").lower() in ["true", "yes", "1"]
+DOCX_LOG_PATH = os.getenv("DOCX_LOG_PATH") or "post_log.docx"
+DOCX_LOG_ROTATE_MONTHLY = (os.getenv("DOCX_LOG_ROTATE_MONTHLY") or "1").lower() in ["true", "yes", "1"]
+DOCX_LOG_MAX_MB = float(os.getenv("DOCX_LOG_MAX_MB") or 5)  # 0 = no size limit
+DOCX_LOG_SPOOL_PATH = os.getenv("DOCX_LOG_SPOOL_PATH") or "docx_log_spool.jsonl"
+
+
+def word_log_path(month):
+    """
+    The file entries for `month` ("YYYY-MM") go to: the first part of that
+    month's log that is still under DOCX_LOG_MAX_MB.
+    """
+    root, ext = os.path.splitext(DOCX_LOG_PATH)
+    if DOCX_LOG_ROTATE_MONTHLY:
+        root = f"{root}_{month}"
+    part = 1
+    while True:
+        path = f"{root}{ext}" if part == 1 else f"{root}_{part}{ext}"
+        if (
+            not DOCX_LOG_MAX_MB
+            or not os.path.exists(path)
+            or os.path.getsize(path) < DOCX_LOG_MAX_MB * 1024 * 1024
+        ):
+            return path
+        part += 1
+
+
+def new_word_log_buffer():
+    """
+    Create an in-memory Word log for one run. Entries spooled by an earlier
+    run that could not save the file are loaded first; the spool file stays
+    until close_word_log() has saved them.
+    """
+    entries = []
+    if os.path.exists(DOCX_LOG_SPOOL_PATH):
+        with open(DOCX_LOG_SPOOL_PATH, encoding="utf-8") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        print(f"[INFO] Loaded {len(entries)} spooled Word log entr(ies) from '{DOCX_LOG_SPOOL_PATH}'.")
+    return {"entries": entries, "spooled": bool(entries)}
+
+
+def append_word_log(word_log, content_id, platform, caption, post_url):
+    """Queue one Word log entry; it is written by close_word_log()."""
+    if not DOCX_LOG_ENABLED:
+        return
+    word_log["entries"].append({
+        "time": datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "content_id": str(content_id),
+        "platform": platform,
+        "caption": caption,
+        "post_url": post_url,
+    })
+
+
+def write_word_log_entries(path, entries):
+    """Open (or create) one .docx, add every entry and save it once."""
+    from docx import Document
+    from docx.oxml import OxmlElement
+    from docx.text.paragraph import Paragraph
+
+    try:
+        if os.path.exists(path):
+            doc = Document(path)
+        else:
+            doc = Document()
+            doc.add_heading("Social Media Post Log", level=1)
+    except OSError:
+        # Usually PermissionError: the file is open in Word; try again next run
+        raise
+    except Exception as e:
+        # File exists but can't be read as a .docx (not a zip, broken XML,
+        # ...); keep it aside and start over
+        broken = f"{path}.broken-{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        print(f"[WARN] '{path}' is not a valid Word file ({e!r}). Moved it to '{broken}'.")
+        os.replace(path, broken)
+        doc = Document()
+        doc.add_heading("Social Media Post Log", level=1)
+
+    # doc.add_paragraph() scans the whole body for the trailing section
+    # properties on every call; find them once and insert in front of them.
+    body = doc.element.body
+    anchor = body.sectPr
+    for entry in entries:
+        lines = [
+            f"Time: {entry['time']}",
+            f"Content ID: {entry['content_id']}",
+            f"Platform: {entry['platform']}",
+            "Caption:",
+            entry["caption"],
+            f"Post URL: {entry['post_url']}",
+            "-" * 40,
+        ]
+        for line in lines:
+            p = OxmlElement("w:p")
+            if anchor is not None:
+                anchor.addprevious(p)
+            else:
+                body.append(p)
+            Paragraph(p, doc).add_run(line)
+
+    # Save next to the target and swap it in, so a crash never truncates the log
+    tmp_path = path + ".tmp"
+    doc.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def close_word_log(word_log):
+    """
+    Write the run's entries: one save per target file (normally just one).
+    Entries whose file can't be written are spooled for the next run.
+    """
+    entries = word_log["entries"]
+    by_path = {}
+    for entry in entries:
+        by_path.setdefault(word_log_path(entry["time"][:7]), []).append(entry)
+
+    unsaved = []
+    for path, batch in by_path.items():
+        started = time.monotonic()
+        try:
+            write_word_log_entries(path, batch)
+        except Exception as e:
+            # Usually PermissionError: the file is open in Word
+            print(f"[WARN] Could not write Word log '{path}' ({e!r}).")
+            unsaved.extend(batch)
+            continue
+        bump_stat("docx_saves")
+        bump_stat("docx_entries", len(batch))
+        bump_stat("docx_seconds", time.monotonic() - started)
+
+    if unsaved:
+        print(f"[WARN] Spooling {len(unsaved)} Word log entr(ies) to '{DOCX_LOG_SPOOL_PATH}' for the next run.")
+    if word_log["spooled"]:
+        # The spool still holds the entries it gave us: replace it with what
+        # is left unsaved (nothing, normally)
+        if unsaved:
+            tmp_path = DOCX_LOG_SPOOL_PATH + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                for entry in unsaved:
+                    f.write(json.dumps(entry) + "\n")
+            os.replace(tmp_path, DOCX_LOG_SPOOL_PATH)
+        elif os.path.exists(DOCX_LOG_SPOOL_PATH):
+            os.remove(DOCX_LOG_SPOOL_PATH)
+        word_log["spooled"] = False
+    elif unsaved:
+        with open(DOCX_LOG_SPOOL_PATH, "a", encoding="utf-8") as f:
+            for entry in unsaved:
+                f.write(json.dumps(entry) + "\n")
+    entries.clear()
+
+
+# =========================
+# 6. MAIN BOT LOGIC (MULTIPLE ROWS)
+# =========================
+
+def log_group_shares(log_buffer, word_log, groups, content_id, full_caption):
+    """
+    Simulated shares of an FB post to `groups`, logged like posts.
+    """
+    if not groups:
+        log_at("verbose", "[INFO] No groups specified for this row; skipping group shares.")
+        return
+
+    for group_name in groups:
+        fake_group_url = (
+            f"https://facebook.com/groups/"
+            f"{group_name.replace(' ', '_')}/fake_post"
+        )
+        log_at("normal", f"[INFO] Simulating share to group '{group_name}': {fake_group_url}")
+
+        append_post_log(
+            log_buffer,
+            content_id,
+            f"FB-Group: {group_name}",
+            full_caption,
+            fake_group_url,
+        )
+        append_word_log(
+            word_log,
+            content_id,
+            f"FB-Group: {group_name}",
+            full_caption,
+            fake_group_url,
+        )
+
+
+def print_run_summary(run_started, failed_status_writes=()):
+    """
+    Print Sheets call counts and wall time for this run. Status writes are
+    compared with the unbatched cost (one header read + one update_cell per row).
+    """
+    elapsed = time.monotonic() - run_started
+    status_rows = RUN_STATS["status_rows"] + len(failed_status_writes)
+    calls = RUN_STATS["sheets_reads"] + RUN_STATS["sheets_writes"]
+
+    print("\n========== RUN SUMMARY ==========")
+    print(
+        f"Sheets API calls: {calls} "
+        f"({RUN_STATS['sheets_reads']} read, {RUN_STATS['sheets_writes']} write), "
+        f"{RUN_STATS['sheets_seconds']:.2f}s in Sheets"
+    )
+    if status_rows:
+        unbatched_calls = 2 * status_rows
+        per_call = RUN_STATS["sheets_seconds"] / calls if calls else 0.0
+        print(
+            f"Status writes: {status_rows} row(s) in {RUN_STATS['status_calls']} call(s), "
+            f"{RUN_STATS['status_seconds']:.2f}s "
+            f"(unbatched: {unbatched_calls} calls, ~{unbatched_calls * per_call:.2f}s)"
+        )
+    if RUN_STATS["postlog_rows"]:
+        print(
+            f"PostLog: {RUN_STATS['postlog_rows']} row(s) in "
+            f"{RUN_STATS['postlog_calls']} append call(s)"
+        )
+    if RUN_STATS["docx_entries"]:
+        print(
+            f"Word log: {RUN_STATS['docx_entries']} entr(ies) in "
+            f"{RUN_STATS['docx_saves']} save(s), {RUN_STATS['docx_seconds']:.2f}s"
+        )
+    if failed_status_writes:
+        print(f"[ERROR] {len(failed_status_writes)} status write(s) failed:")
+        for row_index, new_status in failed_status_writes:
+            print(f"  row {row_index} -> '{new_status}'")
+    if RUN_STATS["sheets_retries"] or RUN_STATS["sheets_throttle_seconds"]:
+        print(
+            f"Quota: {RUN_STATS['sheets_retries']} retr(ies), "
+            f"{RUN_STATS['sheets_backoff_seconds']:.1f}s backoff, "
+            f"{RUN_STATS['sheets_throttle_seconds']:.1f}s throttled by rate limiter"
+        )
+    for host, samples in sorted(HTTP_LATENCIES.items()):
+        print(
+            f"HTTP {host}: {len(samples)} request(s), "
+            f"p50 {latency_percentile(samples, 50) * 1000:.0f}ms, "
+            f"p95 {latency_percentile(samples, 95) * 1000:.0f}ms, "
+            f"max {max(samples) * 1000:.0f}ms"
+        )
+    if RUN_STATS["http_errors"]:
+        print(f"[WARN] HTTP errors (timeouts/connection): {RUN_STATS['http_errors']}")
+    simulated = RUN_STATS["simulated_errors"] + RUN_STATS["simulated_rate_limits"] + RUN_STATS["simulated_timeouts"]
+    if simulated:
+        print(
+            f"Simulated failures: {RUN_STATS['simulated_errors']} error(s), "
+            f"{RUN_STATS['simulated_rate_limits']} rate limit(s), "
+            f"{RUN_STATS['simulated_timeouts']} timeout(s)"
+            + (f" (seed {SIMULATE_SEED})" if SIMULATE_SEED is not None else "")
+        )
+    if RUN_STATS["retry_attempts"] or RUN_STATS["retry_rows_scheduled"]:
+        print(
+            f"Retries: {RUN_STATS['retry_attempts']} target(s) re-attempted "
+            f"({RUN_STATS['retry_succeeded']} succeeded), "
+            f"{RUN_STATS['retry_rows_scheduled']} row(s) scheduled for retry"
+        )
+    if RUN_STATS["retry_targets_exhausted"]:
+        print(
+            f"[WARN] {RUN_STATS['retry_targets_exhausted']} target(s) failed "
+            f"{RETRY_MAX_ATTEMPTS} time(s) and will not be retried"
+        )
+    if RUN_STATS["lease_claimed"] or RUN_STATS["lease_lost"]:
+        print(
+            f"Leases: {RUN_STATS['lease_claimed']} row(s) claimed "
+            f"({RUN_STATS['lease_reclaimed']} expired lease(s) reclaimed), "
+            f"{RUN_STATS['lease_lost']} taken by another run, "
+            f"{RUN_STATS['lease_released']} released unfinished"
+        )
+    if RUN_STATS["deadline_hit"]:
+        print(
+            f"[WARN] Run deadline ({RUN_DEADLINE_SECONDS:g}s) reached; "
+            f"{RUN_STATS['deadline_rows_deferred']} row(s) left for the next run"
+        )
+    if RUN_STATS["ledger_skipped"]:
+        print(f"Ledger: {RUN_STATS['ledger_skipped']} target(s) skipped, already posted")
+    if RUN_STATS["ledger_in_doubt"]:
+        print(
+            f"[WARN] {len(RUN_STATS['ledger_in_doubt'])} target(s) in doubt "
+            f"(check manually, then delete from {POST_LEDGER_PATH}):"
+        )
+        for content_id, platform, target in RUN_STATS["ledger_in_doubt"]:
+            print(f"  content ID {content_id} -> {platform}/{target}")
+    if RUN_STATS["nothing_changed"]:
+        print("Spreadsheet unchanged and nothing due: ContentPlan not read")
+    elif RUN_STATS["index_sync_skipped"]:
+        print("Spreadsheet unchanged: pending index sync skipped")
+    if RUN_STATS["sheets_reads_skipped"]:
+        print(f"Clients sheet reads skipped (cache): {RUN_STATS['sheets_reads_skipped']}")
+    if RUN_SPANS:
+        print("Stages: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in RUN_SPANS.items()))
+    print(f"Wall time: {elapsed:.2f}s")
+    print("=================================")
+
+
+def run_api_calls():
+    """This run's external calls by type."""
+    return {
+        "sheets_read": RUN_STATS["sheets_reads"],
+        "sheets_write": RUN_STATS["sheets_writes"],
+        "graph_post": RUN_STATS["graph_posts"],
+        "http_request": RUN_STATS["http_requests"],
+        "docx_save": RUN_STATS["docx_saves"],
+    }
+
+
+def _prometheus_label(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def format_prometheus(metrics):
+    """
+    Prometheus text format for [(name, type, help, samples)], where samples
+    is a list of (labels dict, value).
+    """
+    lines = []
+    for name, kind, help_text, samples in metrics:
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in samples:
+            value = float(value)
+            value_text = str(int(value)) if value.is_integer() else repr(value)
+            label_text = ",".join(f'{k}="{_prometheus_label(v)}"' for k, v in labels.items())
+            lines.append(f"{name}{{{label_text}}} {value_text}" if label_text else f"{name} {value_text}")
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path, text):
+    # Readers (the textfile collector, a dashboard) never see half a file
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def write_run_metrics(run_started, rows, failed_status_writes=()):
+    """
+    Write this run's stage timings, call counts and RUN_STATS to
+    RUN_METRICS_JSON_PATH and RUN_METRICS_PROM_PATH. Never raises.
+    """
+    if not RUN_METRICS_ENABLED:
+        return
+    elapsed = time.monotonic() - run_started
+    finished = time.time()
+    calls = run_api_calls()
+    seconds = {
+        "sheets": RUN_STATS["sheets_seconds"],
+        "sheets_throttle": RUN_STATS["sheets_throttle_seconds"],
+        "sheets_backoff": RUN_STATS["sheets_backoff_seconds"],
+        "http": sum(sum(samples) for samples in HTTP_LATENCIES.values()),
+        "docx": RUN_STATS["docx_seconds"],
+    }
+    counters = {
+        key: value for key, value in RUN_STATS.items()
+        if isinstance(value, (int, float)) and not key.endswith("_seconds")
+    }
+    counters["ledger_in_doubt"] = len(RUN_STATS["ledger_in_doubt"])
+    counters["failed_status_writes"] = len(failed_status_writes)
+
+    report = {
+        "finished_at": datetime.datetime.fromtimestamp(finished, datetime.timezone.utc).isoformat(),
+        "run_mode": RUN_MODE,
+        "storage": STORAGE_BACKEND,
+        "rows": rows,
+        "seconds": round(elapsed, 4),
+        "stages": {name: round(value, 4) for name, value in RUN_SPANS.items()},
+        "calls": calls,
+        "call_seconds": {name: round(value, 4) for name, value in seconds.items()},
+        "http": {
+            host: {
+                "requests": len(samples),
+                "p50_ms": round(latency_percentile(samples, 50) * 1000, 1),
+                "p95_ms": round(latency_percentile(samples, 95) * 1000, 1),
+                "max_ms": round(max(samples) * 1000, 1),
+            }
+            for host, samples in sorted(HTTP_LATENCIES.items())
+        },
+        "posts": {"ok": dict(RUN_STATS["posts_ok"]), "failed": dict(RUN_STATS["posts_failed"])},
+        "counters": counters,
+    }
+    prometheus = format_prometheus([
+        ("bot_last_run_timestamp_seconds", "gauge", "Unix time the last scheduler run finished.",
+         [({}, finished)]),
+        ("bot_last_run_duration_seconds", "gauge", "Wall time of the last scheduler run.",
+         [({}, elapsed)]),
+        ("bot_last_run_rows", "gauge", "Rows the last run worked on.", [({}, rows)]),
+        ("bot_last_run_stage_seconds", "gauge", "Time spent in each stage of the last run.",
+         [({"stage": name}, value) for name, value in RUN_SPANS.items()]),
+        ("bot_last_run_calls", "gauge", "External calls made by the last run, by type.",
+         [({"type": name}, value) for name, value in calls.items()]),
+        ("bot_last_run_call_seconds", "gauge", "Time spent in (or waiting for) external calls in the last run.",
+         [({"type": name}, value) for name, value in seconds.items()]),
+        ("bot_last_run_counter", "gauge", "Run counters of the last run (see RUN_STATS in bot.py).",
+         [({"name": name}, value) for name, value in counters.items()]),
+    ])
+    try:
+        _write_atomic(RUN_METRICS_JSON_PATH, json.dumps(report, indent=2))
+        _write_atomic(RUN_METRICS_PROM_PATH, prometheus)
+    except OSError as e:
+        print(f"[WARN] Could not write run metrics ({e}).")
+
+
+def process_all_pending_items():
+    """
+    One scheduler run: claim the due rows, post them, record the results.
+    Returns the number of rows this run worked on.
+    """
+    LIVE_METRICS["run_started_at"] = time.time()
+    succeeded = False
+    try:
+        worked = _process_pending_items()
+        succeeded = True
+        return worked
+    finally:
+        finish_live_run(succeeded)
 
-    post_url = f"https://www.facebook.com/{FB_PAGE_ID}/posts/{post_id.split('_')[-1]}"
-    return post_url """
 
-def post_to_facebook(caption, image_url, client):
+def _process_pending_items():
+    run_started = time.monotonic()
+    reset_run_stats()
     if RUN_MODE != "live":
-        print("[SIMULATE] FB page post")
-        return "https://facebook.com/fake_page_post"
+        # A bad SIMULATE_PROFILE should stop the run, not fail every post
+        simulate_profiles()
+    with run_span("fast_path"):
+        nothing_due = nothing_due_fast()
+    if nothing_due:
+        LIVE_METRICS["due_rows"] = 0
+        print("No pending content for today. Nothing to do.")
+        RUN_STATS["nothing_changed"] = True
+        print_run_summary(run_started)
+        write_run_metrics(run_started, 0)
+        return 0
+    content_sheet = get_worksheet("ContentPlan")
 
-    page_id = client["fb_page_id"]
-    token = client["fb_page_access_token"]
+    deadline = run_started + RUN_DEADLINE_SECONDS if RUN_DEADLINE_SECONDS else None
+    with run_span("find_pending"):
+        pending_rows = prioritize_rows(find_all_pending_content(content_sheet))
+    # Lease the due rows so an overlapping run can't pick them up too
+    with run_span("claim"):
+        owner = new_lease_owner()
+        pending_rows = claim_rows(content_sheet, pending_rows, owner)
+    LIVE_METRICS["due_rows"] = len(pending_rows)
+    if not pending_rows:
+        print("No pending content for today. Nothing to do.")
+        if os.path.exists(POSTLOG_SPOOL_PATH):
+            with run_span("post_log"):
+                close_post_log(new_post_log_buffer(get_worksheet("PostLog")))
+        print_run_summary(run_started)
+        write_run_metrics(run_started, 0)
+        return 0
 
-    # If image_url exists, use /photos
-    if image_url:
-        url = f"https://graph.facebook.com/v20.0/{page_id}/photos"
-        data = {"url": image_url, "caption": caption, "access_token": token}
-        resp = requests.post(url, data=data)
-    else:
-        url = f"https://graph.facebook.com/v20.0/{page_id}/feed"
-        data = {"message": caption, "access_token": token}
-        resp = requests.post(url, data=data)
+    # Resolve the status column once (the scan just read the headers); status
+    # changes are queued here and written in batches instead of one read + one
+    # write per row.
+    status_col = get_column_index_by_header(
+        content_sheet, "status", get_cached_header_map(content_sheet)
+    )
+    # Set up inside the try below, so a failure there still releases the leases
+    log_buffer = word_log = clients_state = None
+    targets_col = None
+    status_updates = {}
+    retry_schedule = {}
+    failed_status_writes = []
+    # Leased rows without a final status yet: {row_index: status to restore}
+    claimed = {
+        row["__row_index__"]: row["__claimed_from__"]
+        for row in pending_rows if "__claimed_from__" in row
+    }
+    released = set()
 
-    if resp.status_code != 200:
-        print("[ERROR] FB post failed:", resp.text)
-        return None
+    def set_status(row_index, value):
+        claimed.pop(row_index, None)
+        status_updates[row_index] = value
+        LIVE_METRICS["due_rows"] = max(0, LIVE_METRICS["due_rows"] - 1)
 
-    return "FB_POST_OK"  # you can build real URL later
+    def flush_statuses():
+        queued = list(status_updates)
+        failed = flush_status_updates(content_sheet, status_col, status_updates, targets_col)
+        failed_status_writes.extend(failed)
+        failed_rows = {row_index for row_index, _ in failed}
+        written = [r for r in queued if r not in failed_rows]
+        # Rows that are no longer pending can leave the local index; rows
+        # waiting for a retry stay in it, due at their retry time
+        discard_from_pending_index([
+            r for r in written if r not in retry_schedule and r not in released
+        ])
+        reschedule_in_pending_index([retry_schedule.pop(r) for r in written if r in retry_schedule])
 
+    def finish_row(state):
+        targets = state["targets"]
+        retryable = [
+            t for t in targets.values()
+            if t["status"] == "failed" and t["attempts"] < RETRY_MAX_ATTEMPTS
+        ]
+        if retryable and targets_col:
+            new_status = "retry"
+            for t in retryable:
+                retry_at = get_bot_now() + datetime.timedelta(minutes=retry_delay_minutes(t["attempts"]))
+                t["retry_at"] = retry_at.strftime("%Y-%m-%d %H:%M")
+            row = state["row"]
+            retry_schedule[state["row_index"]] = (
+                state["row_index"], str(state["content_id"]), min(t["retry_at"] for t in retryable),
+                normalize_sheet_date(row.get("date")), normalize_sheet_time(row.get("time")),
+            )
+            bump_stat("retry_rows_scheduled")
+        elif state["all_success"] and all(t["status"] == "posted" for t in targets.values()):
+            new_status = "posted"
+        else:
+            new_status = "partial"
+            bump_stat("retry_targets_exhausted", sum(
+                1 for t in targets.values()
+                if t["status"] == "failed" and t["attempts"] >= RETRY_MAX_ATTEMPTS
+            ))
 
-    # live posting code (Graph API) below...
+        if targets_col:
+            set_status(state["row_index"], (new_status, json.dumps(targets)))
+        else:
+            set_status(state["row_index"], new_status)
+        log_at("normal", f"Queued content ID {state['content_id']} for status '{new_status}'.")
 
+        # Checkpoint so a crash late in a long run loses few status writes
+        if len(status_updates) >= STATUS_FLUSH_EVERY:
+            flush_statuses()
 
+    def should_post(state, name, key):
+        """
+        Decide whether this run posts a target. Targets already posted
+        (per targets_status or the ledger) count as done; targets out of
+        attempts or in doubt are not posted again.
+        """
+        target = state["targets"].get(name)
+        if target is not None:
+            if target["status"] == "posted":
+                return False
+            if target["status"] != "failed" or target["attempts"] >= RETRY_MAX_ATTEMPTS:
+                state["all_success"] = False
+                return False
 
-""" def post_to_linkedin(caption):
-    Simulated LinkedIn post.
-    Later, this can be replaced with a real LinkedIn API call.
+        entry = ledger_lookup(key)
+        if entry is None or entry[0] == "failed":
+            if target is not None:
+                log_at("normal", f"[RETRY] {name} for content ID {key[0]} (attempt {target['attempts'] + 1})")
+                bump_stat("retry_attempts")
+            return True
+        if entry[0] == "posted":
+            print(f"[SKIP] {key[1]}/{key[2]} for content ID {key[0]} already posted: {entry[1]}")
+            bump_stat("ledger_skipped")
+            state["targets"][name] = {
+                "status": "posted", "attempts": (target or {}).get("attempts", 0) + 1, "url": entry[1],
+            }
+        else:
+            print(f"[WARN] {key[1]}/{key[2]} for content ID {key[0]} was started by an "
+                  f"earlier run with no recorded outcome; not re-posting.")
+            RUN_STATS["ledger_in_doubt"].append(key)
+            state["targets"][name] = {"status": "in_doubt", "attempts": (target or {}).get("attempts", 0) + 1}
+            state["all_success"] = False
+        return False
 
-    if not LINKEDIN_ACCESS_TOKEN:
-        print("[INFO] LinkedIn credentials not set. Simulating LinkedIn post...")
-        print("----- LINKEDIN POST START -----")
-        print(caption)
-        print("----- LINKEDIN POST END -------")
-        fake_url = "https://linkedin.com/posts/fake_linkedin_post"
-        return fake_url
+    def record_result(task, post_url, group=None, error=None):
+        state = task["state"]
+        platform = f"FB-Group: {group}" if group else task["label"]
+        content_id = state["content_id"]
+        full_caption = task["caption"]
 
-    # Real LinkedIn API integration would go here.
-    # For now, we just simulate even if token is set.
-    fake_url = "https://linkedin.com/posts/fake_linkedin_post_real"
-    return fake_url """
+        name = target_name(task["platform"], group)
+        previous = state["targets"].get(name)
+        attempts = (previous or {}).get("attempts", 0) + 1
 
-def post_to_linkedin(caption):
-    if RUN_MODE != "live":
-        print("[SIMULATE] LinkedIn post")
-        return "https://linkedin.com/posts/fake_linkedin_post"
+        count_post(task["platform"], bool(post_url))
+        if post_url:
+            log_at("normal", f"[OK] Posted to {platform} (content ID {content_id}): {post_url}")
+            state["targets"][name] = {"status": "posted", "attempts": attempts, "url": post_url}
+            if previous is not None:
+                bump_stat("retry_succeeded")
+            # Log main post in Sheets and Word
+            append_post_log(log_buffer, content_id, platform, full_caption, post_url)
+            append_word_log(word_log, content_id, platform, full_caption, post_url)
 
+            # Groups not posted for real (all of them when unbatched, names
+            # when batched) get simulated shares
+            if task["platform"] == "FB" and not group:
+                groups = row_groups(state["row"])
+                if task.get("batched"):
+                    groups = [g for g in groups if not is_graph_group_id(g)]
+                    if groups:
+                        log_group_shares(log_buffer, word_log, groups, content_id, full_caption)
+                else:
+                    log_group_shares(log_buffer, word_log, groups, content_id, full_caption)
+        else:
+            print(f"[ERROR] Failed to get post URL for {platform} (content ID {content_id})"
+                  + (f": {error}" if error else ""))
+            state["targets"][name] = {"status": "failed", "attempts": attempts, "error": error or "no post URL"}
+            if error:
+                append_post_log(log_buffer, content_id, platform, full_caption, f"FAILED: {error}")
 
+        state["remaining"] -= 1
+        if state["remaining"] == 0:
+            finish_row(state)
 
-""" def post_to_instagram(caption):
-    Simulated Instagram post.
-    Later, this can be replaced with a real Instagram Graph API call.
+    try:
+        with run_span("prepare"):
+            log_buffer = new_post_log_buffer(get_worksheet("PostLog"))
+            word_log = new_word_log_buffer()
+            clients_state = load_clients()
+            try:
+                targets_col = ensure_column(content_sheet, TARGETS_STATUS_HEADER)
+            except Exception as e:
+                print(f"[WARN] No '{TARGETS_STATUS_HEADER}' column ({e}); failed targets won't be retried.")
 
-    if not INSTAGRAM_ACCESS_TOKEN:
-        print("[INFO] Instagram credentials not set. Simulating IG post...")
-        print("----- INSTAGRAM POST START -----")
-        print(caption)
-        print("----- INSTAGRAM POST END -------")
-        fake_url = "https://instagram.com/p/fake_instagram_post"
-        return fake_url
+        print(f"Found {len(pending_rows)} pending item(s).")
 
-    # Real Instagram API integration would go here.
-    fake_url = "https://instagram.com/p/fake_instagram_post_real"
-    return fake_url """
+        # Plan every row's posts first (in priority order), then run them concurrently
+        tasks = []
+        fb_ops = []
+        states = []
+        with run_span("plan"):
+            for rank, row in enumerate(pending_rows):
+                if LOG_VERBOSITY >= LOG_LEVELS["verbose"]:
+                    print("\n====================================")
+                    print("Processing row:", row)
+                    print("====================================")
+                else:
+                    log_at("normal", f"Row {row['__row_index__']}: content ID {row.get('id')} "
+                                     f"({row.get('platforms', '')})")
 
-def post_to_instagram(caption):
-    if RUN_MODE != "live":
-        print("[SIMULATE] IG post")
-        return "https://instagram.com/p/fake_instagram_post"
+                row_index = row["__row_index__"]
+                content_id = row.get("id")
+                idea = row.get("idea", "")
+                caption_existing = row.get("caption", "")
+                hashtags_existing = row.get("hashtags", "")
+                platforms_raw = row.get("platforms", "")
+
+                client_key = (row.get("client_key") or "").strip()
+                client = lookup_client(clients_state, client_key)
+
+                if not client:
+                    print(f"[ERROR] Unknown or inactive client_key '{client_key}'.")
+                    set_status(row_index, "bad_client")
+                    continue
+
+
+                # split platforms like "FB, IG, LinkedIn"
+                platforms = [p.strip() for p in platforms_raw.split(",") if p.strip()]
+
+                if not platforms:
+                    print("No platforms specified; marking as 'no_platforms'.")
+                    set_status(row_index, "no_platforms")
+                    continue
+
+                state = {
+                    "row": row,
+                    "row_index": row_index,
+                    "content_id": content_id,
+                    "all_success": True,
+                    "remaining": 0,
+                    "targets": parse_targets_status(row.get(TARGETS_STATUS_HEADER)),
+                }
+                states.append(state)
+
+                for platform in platforms:
+                    canonical = canonical_platform(platform)
+                    if canonical is None:
+                        print(f"[WARN] Platform '{platform}' not implemented yet. Skipping.")
+                        state["targets"][platform] = {"status": "unsupported", "attempts": 0}
+                        state["all_success"] = False
+                        continue
+
+                    full_caption = generate_caption_if_needed(
+                        platform, idea, caption_existing, hashtags_existing
+                    )
+
+                    log_at("verbose", f"\n--- Final caption for {platform} ---")
+                    log_at("verbose", full_caption)
+                    log_at("verbose", "------------------------------------")
+
+                    task = {
+                        "rank": rank,
+                        "state": state,
+                        "platform": canonical,
+                        "label": platform,
+                        "client_key": client_key,
+                        "client": client,
+                        "caption": full_caption,
+                        "image_url": row.get("image_url", ""),
+                        "content_id": content_id,
+                    }
+                    if canonical == "FB" and FB_BATCH_ENABLED:
+                        # Page post and group posts go out in shared batch calls
+                        task["batched"] = True
+                        ops = [facebook_batch_op(task)]
+                        ops += [
+                            facebook_batch_op(task, group)
+                            for group in row_groups(row) if is_graph_group_id(group)
+                        ]
+                        ops = [
+                            op for op in ops
+                            if should_post(state, target_name("FB", op["group"]), op["ledger_key"])
+                        ]
+                        state["remaining"] += len(ops)
+                        fb_ops.extend(ops)
+                    else:
+                        task["ledger_key"] = ledger_key(task)
+                        if not should_post(state, target_name(canonical), task["ledger_key"]):
+                            continue
+                        state["remaining"] += 1
+                        tasks.append(task)
+
+                if state["remaining"] == 0:
+                    finish_row(state)
+
+        for start in range(0, len(fb_ops), FB_BATCH_MAX):
+            ops = fb_ops[start:start + FB_BATCH_MAX]
+            tasks.append({
+                "rank": ops[0]["task"]["rank"],
+                "platform": "FB",
+                "client_key": None,
+                "ops": ops,
+            })
+        # A batch goes out when its first (highest priority) row's turn comes
+        tasks.sort(key=lambda task: task["rank"])
+
+        log_at("normal", f"\nPosting {len(tasks)} item(s) with up to {POST_WORKERS} worker(s)...")
+        with run_span("post"):
+            for task, result in run_post_tasks(tasks, deadline):
+                if "ops" in task:
+                    for op, (post_url, error) in zip(task["ops"], result):
+                        record_result(op["task"], post_url, op["group"], error)
+                else:
+                    record_result(task, result)
 
+        # Out of time: hand unfinished rows to the next run, keeping the
+        # targets that did go out so they aren't posted again
+        for state in states:
+            if state["remaining"] > 0:
+                original = state["row"].get("__claimed_from__") or state["row"].get("status") or "pending"
+                set_status(
+                    state["row_index"],
+                    (original, json.dumps(state["targets"])) if targets_col else original,
+                )
+                released.add(state["row_index"])
+                bump_stat("deadline_rows_deferred")
+
+    finally:
+        # Hand back leased rows this run didn't finish (e.g. after an error)
+        for row_index, original in claimed.items():
+            status_updates[row_index] = original
+            released.add(row_index)
+        bump_stat("lease_released", len(claimed))
+        # Rows handed back are still due
+        LIVE_METRICS["due_rows"] = len(released)
+        # Statuses first: they release the leases. The closes below are best
+        # effort and spool what they can't write, so none may skip another.
+        try:
+            with run_span("status_writes"):
+                flush_statuses()
+                record_spreadsheet_version()
+        finally:
+            if log_buffer is not None:
+                with run_span("post_log"):
+                    try:
+                        close_post_log(log_buffer)
+                    except Exception as e:
+                        print(f"[ERROR] Could not close the PostLog buffer ({e!r}).")
+            if word_log is not None:
+                with run_span("word_log"):
+                    try:
+                        close_word_log(word_log)
+                    except Exception as e:
+                        print(f"[ERROR] Could not close the Word log ({e!r}).")
+            try:
+                close_post_ledger()
+            except Exception as e:
+                print(f"[ERROR] Could not close the post ledger ({e!r}).")
+        print_run_summary(run_started, failed_status_writes)
+        write_run_metrics(run_started, len(pending_rows), failed_status_writes)
+    return len(pending_rows)
 
 
 # =========================
-# 5. WORD DOC LOGGING
+# 7. SCHEDULER DAEMON
 # =========================
 
-DOCX_LOG_PATH = "post_log.docx"
+def due_key_to_epoch(due_at) -> float:
+    """
+    "YYYY-MM-DD HH:MM" in the bot's timezone -> Unix time; "" (any day) -> 0.
+    """
+    if not due_at:
+        return 0.0
+    local = datetime.datetime.strptime(due_at, "%Y-%m-%d %H:%M")
+    utc = local - datetime.timedelta(
+        hours=BOT_TIMEZONE_OFFSET_HOURS, minutes=BOT_TIMEZONE_OFFSET_MINUTES
+    )
+    return utc.replace(tzinfo=datetime.timezone.utc).timestamp()
 
 
-def log_to_word_doc(content_id, platform, caption, post_url):
-    try:
-        if os.path.exists(DOCX_LOG_PATH):
-            # Try to open existing docx
-            doc = Document(DOCX_LOG_PATH)
-        else:
-            # Create new docx
-            doc = Document()
-            doc.add_heading("Social Media Post Log", level=1)
-    except PackageNotFoundError:
-        # File exists but is not a valid .docx (corrupted or wrong type)
-        print("[WARN] post_log.docx is not a valid Word file. Recreating it.")
-        doc = Document()
-        doc.add_heading("Social Media Post Log", level=1)
+def load_due_heap(content_sheet) -> list:
+    """
+    Every schedulable row as a heap of (due epoch, row_index): from the
+    pending index after an incremental sync, or from a projected scan of the
+    id/status/date/time columns when the index is off.
+    """
+    if PENDING_INDEX_ENABLED:
+        conn = open_pending_index()
+        try:
+            if refresh_pending_index(conn, content_sheet) is not None:
+                heap = [
+                    (due_key_to_epoch(due_at), row_index)
+                    for due_at, row_index in conn.execute("SELECT due_at, row_index FROM pending")
+                ]
+                heapq.heapify(heap)
+                return heap
+        finally:
+            conn.close()
 
-    # Add entry
-    doc.add_paragraph(
-        f"Time: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-    )
-    doc.add_paragraph(f"Content ID: {content_id}")
-    doc.add_paragraph(f"Platform: {platform}")
-    doc.add_paragraph("Caption:")
-    doc.add_paragraph(caption)
-    doc.add_paragraph(f"Post URL: {post_url}")
-    doc.add_paragraph("-" * 40)
-
-    # Try to save main log file
-    try:
-        doc.save(DOCX_LOG_PATH)
-    except PermissionError:
-        # File is probably open in Word, so save to a backup file instead
-        backup_name = f"post_log_backup_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.docx"
-        print(f"[WARN] Could not write to '{DOCX_LOG_PATH}' (file in use).")
-        print(f"[WARN] Saving this log entry to '{backup_name}' instead.")
-        doc.save(backup_name)
+    header_map = header_map_from_row(read_header_row(content_sheet))
+    candidates, _ = read_pending_candidates(content_sheet, header_map)
+    heap = [
+        (due_key_to_epoch(due_at_key(date_val, time_val)), row_index)
+        for row_index, _, date_val, time_val in candidates
+    ]
+    heapq.heapify(heap)
+    return heap
+
+
+def run_daemon():
+    """
+    Stay resident and post items as they come due. SIGTERM/SIGINT let the
+    current run finish (statuses flushed, leases released), then exit.
+    """
+    stop = threading.Event()
+    wake = threading.Event()
+    heap_lock = threading.Lock()
+    due = {"heap": []}
+    # Rows a run found nothing to do for yet (backoff, another run's lease):
+    # {row_index: don't look before}, so they can't make the loop spin
+    deferred = {}
+
+    def handle_signal(signum, frame):
+        print(f"[INFO] Received signal {signum}; stopping after the current run.")
+        stop.set()
+        wake.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    def refresh():
+        try:
+            heap = load_due_heap(get_worksheet("ContentPlan"))
+        except Exception as e:
+            print(f"[WARN] Daemon refresh failed ({e}); keeping the previous schedule.")
+            return
+        with heap_lock:
+            now = time.time()
+            for row_index, not_before in list(deferred.items()):
+                if not_before <= now:
+                    del deferred[row_index]
+            if deferred:
+                heap = [(max(at, deferred.get(row_index, 0)), row_index) for at, row_index in heap]
+                heapq.heapify(heap)
+            due["heap"] = heap
+            if LIVE_METRICS["run_started_at"] is None:
+                LIVE_METRICS["due_rows"] = sum(1 for at, _ in heap if at <= now)
+        wake.set()
+
+    def refresher():
+        while not stop.wait(DAEMON_REFRESH_SECONDS):
+            refresh()
+
+    print(f"[INFO] Daemon started (refresh every {DAEMON_REFRESH_SECONDS:g}s).")
+    refresh()
+    threading.Thread(target=refresher, name="daemon-refresh", daemon=True).start()
 
+    while not stop.is_set():
+        # Clear before looking, so a refresh landing meanwhile still wakes us
+        wake.clear()
+        with heap_lock:
+            next_due = due["heap"][0][0] if due["heap"] else None
+        now = time.time()
+        if next_due is None or next_due > now:
+            timeout = DAEMON_REFRESH_SECONDS if next_due is None else next_due - now
+            wake.wait(min(timeout, DAEMON_REFRESH_SECONDS))
+            continue
+
+        # Everything due now is handled (or deferred) by this run; anything
+        # still schedulable comes back with the next refresh
+        popped = []
+        with heap_lock:
+            while due["heap"] and due["heap"][0][0] <= now:
+                popped.append(heapq.heappop(due["heap"])[1])
+        try:
+            worked = process_all_pending_items()
+        except Exception as e:
+            print(f"[ERROR] Run failed: {e}")
+            worked = 0
+        if not worked:
+            with heap_lock:
+                for row_index in popped:
+                    deferred[row_index] = now + DAEMON_REFRESH_SECONDS
+        refresh()
+
+    close_http_session()
+    print("[INFO] Daemon stopped.")
 
 
 # =========================
-# 6. MAIN BOT LOGIC (MULTIPLE ROWS)
+# 8. ARCHIVING
 # =========================
 
-def process_all_pending_items():
-    content_sheet, log_sheet, clients_sheet = get_sheets()
-    clients_map = load_clients_map(clients_sheet)
+def select_archivable_rows(values, header_map, today=None):
+    """
+    Row indexes (1-based) in a get_all_values() grid whose status is in
+    ARCHIVE_STATUSES and whose date is more than ARCHIVE_AFTER_DAYS ago.
+    """
+    today = today or get_bot_now().date()
+    cutoff = (today - datetime.timedelta(days=ARCHIVE_AFTER_DAYS)).isoformat()
+    status_i = header_map["status"] - 1
+    date_i = header_map["date"] - 1
+    selected = []
+    for row_index, row in enumerate(values[1:], start=2):
+        status = row[status_i].strip().lower() if status_i < len(row) else ""
+        date_val = normalize_sheet_date(row[date_i]) if date_i < len(row) else ""
+        if status in ARCHIVE_STATUSES and date_val and date_val < cutoff:
+            selected.append(row_index)
+    return selected
 
 
-    pending_rows = find_all_pending_content(content_sheet)
-    if not pending_rows:
-        print("No pending content for today. Nothing to do.")
-        return
+def _archive_to_sheet(headers, records):
+    """
+    Append records (dicts by ContentPlan header) to ARCHIVE_SHEET, creating
+    it or extending its header row as needed. Ids already in the archive
+    (from an earlier run that stopped before deleting) are not added twice.
+    Returns the number of rows appended.
+    """
+    import gspread
+
+    try:
+        archive = get_worksheet(ARCHIVE_SHEET)
+    except gspread.exceptions.WorksheetNotFound:
+        archive = sheets_call(
+            "write", get_spreadsheet().add_worksheet,
+            title=ARCHIVE_SHEET, rows=1, cols=len(headers) + 1,
+        )
+        _SHEETS_CACHE["worksheets"][ARCHIVE_SHEET] = archive
+        print(f"[INFO] Created '{ARCHIVE_SHEET}' sheet.")
 
-    print(f"Found {len(pending_rows)} pending item(s).")
+    archive_headers = read_header_row(archive)
+    wanted = [h for h in headers if h] + ["archived_at"]
+    missing = [h for h in wanted if h.lower() not in {a.lower() for a in archive_headers}]
+    if missing:
+        archive_headers = archive_headers + missing
+        sheets_call(
+            "write", archive.batch_update,
+            [{"range": f"A1:{_column_letter(len(archive_headers))}1", "values": [archive_headers]}],
+        )
+    archive_map = header_map_from_row(archive_headers)
 
-    for row in pending_rows:
-        print("\n====================================")
-        print("Processing row:", row)
-        print("====================================")
-
-        row_index = row["__row_index__"]
-        content_id = row.get("id")
-        idea = row.get("idea", "")
-        caption_existing = row.get("caption", "")
-        hashtags_existing = row.get("hashtags", "")
-        platforms_raw = row.get("platforms", "")
-
-        client_key = (row.get("client_key") or "").strip()
-        client = clients_map.get(client_key)
-
-        if not client:
-            print(f"[ERROR] Unknown or inactive client_key '{client_key}'.")
-            update_content_status(content_sheet, row_index, "bad_client")
+    archived_ids = set()
+    if "id" in archive_map:
+        archived_ids = {
+            str(v).strip() for v in sheets_call("read", archive.col_values, archive_map["id"])[1:]
+        }
+    rows = []
+    for record in records:
+        if str(record.get("id", "")).strip() in archived_ids:
             continue
+        row = [""] * len(archive_headers)
+        for header, value in record.items():
+            col = archive_map.get(header.lower())
+            if col:
+                row[col - 1] = value
+        rows.append(row)
 
+    for start in range(0, len(rows), POSTLOG_BATCH_MAX):
+        sheets_call(
+            "write", archive.append_rows, rows[start:start + POSTLOG_BATCH_MAX],
+            value_input_option="RAW", insert_data_option="INSERT_ROWS", table_range="A1",
+            idempotent=False,
+        )
+    return len(rows)
 
-        # split platforms like "FB, IG, LinkedIn"
-        platforms = [p.strip() for p in platforms_raw.split(",") if p.strip()]
 
-        if not platforms:
-            print("No platforms specified; marking as 'no_platforms'.")
-            update_content_status(content_sheet, row_index, "no_platforms")
-            continue
+def _archive_to_file(records):
+    """
+    Append records as JSON lines to the gzip file ARCHIVE_PATH (each run adds
+    a gzip member; gzip.open reads them back as one stream). Ids already in
+    the file are skipped. Returns the number of records written.
+    """
+    archived_ids = set()
+    if os.path.exists(ARCHIVE_PATH):
+        with gzip.open(ARCHIVE_PATH, "rt", encoding="utf-8") as f:
+            archived_ids = {str(json.loads(line).get("id", "")).strip() for line in f if line.strip()}
+    new = [r for r in records if str(r.get("id", "")).strip() not in archived_ids]
+    if new:
+        with gzip.open(ARCHIVE_PATH, "at", encoding="utf-8") as f:
+            for record in new:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return len(new)
+
+
+def delete_sheet_rows(ws, row_indexes, chunk=500):
+    """
+    Delete rows with spreadsheet batchUpdate deleteDimension requests, one
+    per contiguous run, bottom-up so earlier deletes don't shift later ones.
+    """
+    runs = _row_runs(sorted(row_indexes), max_gap=0)
+    deletes = [
+        {
+            "deleteDimension": {
+                "range": {
+                    "sheetId": ws.id,
+                    "dimension": "ROWS",
+                    "startIndex": start - 1,
+                    "endIndex": end,
+                }
+            }
+        }
+        for start, end in reversed(runs)
+    ]
+    sh = get_spreadsheet()
+    for i in range(0, len(deletes), chunk):
+        sheets_call("write", sh.batch_update, {"requests": deletes[i:i + chunk]})
+
+
+def archive_finished_rows():
+    """
+    Move finished, old rows out of ContentPlan (see ARCHIVE_STATUSES).
+    Order: one full read; refuse while another run holds a lease; seed the
+    ID allocator; re-check the ids in place; write the archive; delete the
+    rows; rebuild the pending index. Returns the number of rows removed.
+    Best run between scheduler runs: rows below deleted ones move up. A run
+    that scanned before the delete skips the moved rows when claiming them.
+    """
+    started = time.monotonic()
+    reset_run_stats()
+    content_sheet = get_worksheet("ContentPlan")
+    values = sheets_call("read", content_sheet.get_all_values)
+    if not values:
+        print("[INFO] ContentPlan is empty; nothing to archive.")
+        return 0
+    headers = [h.strip() for h in values[0]]
+    remember_header_row(content_sheet, headers)
+    header_map = header_map_from_row(headers)
+    for required in ("id", "status", "date"):
+        if required not in header_map:
+            print(f"[ERROR] ContentPlan has no '{required}' column; not archiving.")
+            return 0
+
+    status_i = header_map["status"] - 1
+    leased = []
+    for row_index, row in enumerate(values[1:], start=2):
+        lease = parse_lease(row[status_i]) if status_i < len(row) else None
+        if lease and lease[1] > time.time():
+            leased.append(row_index)
+    if leased:
+        print(f"[WARN] {len(leased)} row(s) are leased by a running scheduler; try again later.")
+        return 0
+
+    selected = select_archivable_rows(values, header_map)
+    if not selected:
+        print(f"[INFO] No finished rows older than {ARCHIVE_AFTER_DAYS:g} day(s); nothing to archive.")
+        return 0
+
+    ensure_id_allocator_seeded(content_sheet)
+
+    # Make sure nobody moved rows since the read (deletes go by row number)
+    id_i = header_map["id"] - 1
+    expected = {r: (values[r - 1][id_i] if id_i < len(values[r - 1]) else "") for r in selected}
+    current_ids = sheets_call("read", content_sheet.col_values, header_map["id"])
+    moved = [
+        r for r, content_id in expected.items()
+        if r > len(current_ids) or str(current_ids[r - 1]).strip() != str(content_id).strip()
+    ]
+    if moved:
+        print(f"[WARN] {len(moved)} row(s) moved while archiving; nothing was changed. Try again.")
+        return 0
+
+    archived_at = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    records = []
+    for r in selected:
+        row = values[r - 1]
+        record = {h: (row[i] if i < len(row) else "") for i, h in enumerate(headers) if h}
+        record["archived_at"] = archived_at
+        records.append(record)
+
+    if ARCHIVE_TARGET == "sheet":
+        written = _archive_to_sheet(headers, records)
+        where = f"'{ARCHIVE_SHEET}'"
+    elif ARCHIVE_TARGET == "local":
+        written = _archive_to_file(records)
+        where = f"'{ARCHIVE_PATH}'"
+    else:
+        raise ValueError(f"Unknown ARCHIVE_TARGET '{ARCHIVE_TARGET}' (use 'sheet' or 'local')")
+    if written < len(records):
+        print(f"[INFO] {len(records) - written} row(s) were already in the archive.")
+
+    delete_sheet_rows(content_sheet, selected)
+    print(f"[INFO] Archived {len(selected)} row(s) to {where}; ContentPlan went from "
+          f"{len(values) - 1} to {len(values) - 1 - len(selected)} row(s).")
+
+    # Every row index below the first deleted row changed
+    if PENDING_INDEX_ENABLED:
+        conn = open_pending_index()
+        try:
+            sync_pending_index(conn, content_sheet, header_map, full=True)
+        finally:
+            conn.close()
+        record_spreadsheet_version()
+    print_run_summary(started)
+    return len(selected)
+
+
+# =========================
+# 9. LOCAL STORAGE (SQLITE)
+# =========================
+
+# Tabs a new local store starts with, so an offline run works out of the box
+# (`--sync pull` replaces them with the real spreadsheet's contents).
+STORAGE_DEFAULT_SHEETS = {
+    "ContentPlan": [
+        "id", "date", "time", "platforms", "client_key", "idea", "caption",
+        "image_url", "hashtags", "groups", "status",
+    ],
+    "PostLog": ["timestamp", "content_id", "platform", "caption_used", "post_url"],
+    "Clients": ["client_key", "active", "fb_page_id", "fb_page_access_token", "ig_business_id"],
+}
+
+
+def a1_to_grid_range(a1):
+    """
+    "A2:C10" -> (2, 1, 10, 3); "C5" -> (5, 3, 5, 3). Open ends such as "J2:J"
+    or "A2:C" reach the last row (None); a missing column is column 1 or the
+    last column (None).
+    """
+    a1 = a1.split("!")[-1].replace("$", "")
+    start, _, end = a1.partition(":")
+    end = end or start
+
+    def parse(ref):
+        m = re.match(r"([A-Za-z]*)(\d*)$", ref)
+        col = 0
+        for ch in m.group(1).upper():
+            col = col * 26 + ord(ch) - 64
+        return (int(m.group(2)) if m.group(2) else None), (col or None)
+
+    r1, c1 = parse(start)
+    r2, c2 = parse(end)
+    return r1 or 1, c1 or 1, r2, c2
+
+
+class SqliteSpreadsheet:
+    """
+    The gspread Spreadsheet calls the bot makes, backed by one SQLite file.
+    Every write transaction bumps a version number, which stands in for the
+    Drive revision fetch_spreadsheet_version() reads.
+    """
+
+    def __init__(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.id = f"sqlite:{os.path.abspath(path)}"
+        self.title = os.path.basename(path)
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS sheets (
+                sheet_id INTEGER PRIMARY KEY,
+                title TEXT NOT NULL UNIQUE
+            );
+            -- status/due_at are copied out of the cells on every write (from
+            -- the sheet's status/date/time columns) so they can be indexed
+            CREATE TABLE IF NOT EXISTS cells (
+                sheet_id INTEGER NOT NULL,
+                row_index INTEGER NOT NULL,
+                cells TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT '',
+                due_at TEXT NOT NULL DEFAULT '',
+                PRIMARY KEY (sheet_id, row_index)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS cells_status_due ON cells (sheet_id, status, due_at);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            """
+        )
+        if not self.query("SELECT 1 FROM sheets LIMIT 1"):
+            with self.write() as conn:
+                # Re-checked inside the write lock: only one process seeds
+                if not conn.execute("SELECT 1 FROM sheets LIMIT 1").fetchone():
+                    for title, headers in STORAGE_DEFAULT_SHEETS.items():
+                        sheet_id = conn.execute("INSERT INTO sheets (title) VALUES (?)", (title,)).lastrowid
+                        conn.execute(
+                            "INSERT INTO cells (sheet_id, row_index, cells) VALUES (?, 1, ?)",
+                            (sheet_id, json.dumps(headers)),
+                        )
+
+    @contextlib.contextmanager
+    def write(self):
+        """One write transaction (BEGIN IMMEDIATE, so writers queue) + version bump."""
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+                self.conn.execute(
+                    "INSERT INTO meta (key, value) VALUES ('version', 1) "
+                    "ON CONFLICT (key) DO UPDATE SET value = value + 1"
+                )
+                self.conn.execute("COMMIT")
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+
+    def query(self, sql, params=()):
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def fetch_version(self) -> str:
+        row = self.query("SELECT value FROM meta WHERE key = 'version'")
+        return str(row[0][0]) if row else "0"
+
+    def worksheets(self):
+        return [
+            SqliteWorksheet(self, sheet_id, title)
+            for sheet_id, title in self.query("SELECT sheet_id, title FROM sheets ORDER BY sheet_id")
+        ]
+
+    def worksheet(self, title):
+        row = self.query("SELECT sheet_id FROM sheets WHERE title = ?", (title,))
+        if not row:
+            import gspread
+
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return SqliteWorksheet(self, row[0][0], title)
 
-        all_success = True
+    def add_worksheet(self, title, rows=1, cols=1, **kwargs):
+        # An existing tab is returned as-is (another process created it first)
+        with self.write() as conn:
+            conn.execute("INSERT OR IGNORE INTO sheets (title) VALUES (?)", (title,))
+        return self.worksheet(title)
 
-        for platform in platforms:
-            full_caption = generate_caption_if_needed(
-                platform, idea, caption_existing, hashtags_existing
+    def batch_update(self, body):
+        """Spreadsheet batchUpdate; only deleteDimension on ROWS is supported."""
+        by_id = {ws.id: ws for ws in self.worksheets()}
+        for request in body["requests"]:
+            rng = request["deleteDimension"]["range"]
+            by_id[rng["sheetId"]].delete_rows(rng["startIndex"] + 1, rng["endIndex"])
+        return {"replies": [{} for _ in body["requests"]]}
+
+
+class SqliteWorksheet:
+    """
+    The gspread Worksheet calls the bot makes, on rows of a SqliteSpreadsheet.
+    Values come back as strings with trailing empty cells and rows trimmed,
+    like the Sheets API returns them.
+    """
+
+    def __init__(self, spreadsheet, sheet_id, title):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+
+    # --- storage ---
+
+    def _rows(self, r1=1, r2=None):
+        """{row_index: cells} for rows r1..r2 (r2=None: to the end)."""
+        return {
+            row_index: json.loads(cells)
+            for row_index, cells in self.spreadsheet.query(
+                "SELECT row_index, cells FROM cells WHERE sheet_id = ? "
+                "AND row_index BETWEEN ? AND ? ORDER BY row_index",
+                (self.id, r1, r2 if r2 is not None else 2 ** 62),
             )
+        }
 
-            print(f"\n--- Final caption for {platform} ---")
-            print(full_caption)
-            print("------------------------------------")
+    def _last_row(self, conn=None):
+        sql = "SELECT MAX(row_index) FROM cells WHERE sheet_id = ?"
+        if conn is not None:
+            return conn.execute(sql, (self.id,)).fetchone()[0] or 0
+        return self.spreadsheet.query(sql, (self.id,))[0][0] or 0
 
-            post_url = None
-            platform_lower = platform.lower()
+    def _put_rows(self, conn, rows):
+        """Write {row_index: cells}, refreshing the indexed status/due_at."""
+        header = rows.get(1)
+        if header is None:
+            stored = conn.execute(
+                "SELECT cells FROM cells WHERE sheet_id = ? AND row_index = 1", (self.id,)
+            ).fetchone()
+            header = json.loads(stored[0]) if stored else []
+        header_map = header_map_from_row([str(h) for h in header])
 
-            if platform_lower in ["fb", "facebook"]:
-                post_url = post_to_facebook(full_caption, image_url=row.get("image_url",""), client=client)
+        def cell(values, name):
+            col = header_map.get(name)
+            return values[col - 1] if col and col - 1 < len(values) else ""
 
-            elif platform_lower in ["ig", "instagram"]:
-                post_url = post_to_instagram(full_caption, image_url=row.get("image_url",""), client=client)
+        def derived(row_index, values):
+            if row_index == 1:
+                return "", ""
+            status = cell(values, "status").strip().lower()
+            if status.startswith(LEASE_PREFIX):
+                status = LEASE_PREFIX
+            due_at = due_at_key(normalize_sheet_date(cell(values, "date")), normalize_sheet_time(cell(values, "time")))
+            return status, due_at
 
-            elif platform_lower in ["li", "linkedin"]:
-                post_url = post_to_linkedin(full_caption)
-            else:
-                print(f"[WARN] Platform '{platform}' not implemented yet. Skipping.")
-                all_success = False
-                continue
+        conn.executemany(
+            "INSERT OR REPLACE INTO cells (sheet_id, row_index, cells, status, due_at) VALUES (?, ?, ?, ?, ?)",
+            [
+                (self.id, row_index, json.dumps(values), *derived(row_index, values))
+                for row_index, values in rows.items()
+            ],
+        )
+        if 1 in rows:
+            # Columns may have moved: re-derive every row from the new header
+            others = {
+                row_index: json.loads(cells)
+                for row_index, cells in conn.execute(
+                    "SELECT row_index, cells FROM cells WHERE sheet_id = ? AND row_index > 1", (self.id,)
+                )
+                if row_index not in rows
+            }
+            if others:
+                conn.executemany(
+                    "UPDATE cells SET status = ?, due_at = ? WHERE sheet_id = ? AND row_index = ?",
+                    [(*derived(r, v), self.id, r) for r, v in others.items()],
+                )
 
-            if post_url:
-                print(f"[OK] Posted to {platform}: {post_url}")
-                # Log main post in Sheets and Word
-                append_post_log(log_sheet, content_id, platform, full_caption, post_url)
-                log_to_word_doc(content_id, platform, full_caption, post_url)
-
-                # If this is Facebook, also handle group shares (simulated)
-                if platform_lower in ["fb", "facebook"]:
-                    groups_raw = (row.get("groups") or "").strip()
-                    if groups_raw:
-                        groups = [g.strip() for g in groups_raw.split(",") if g.strip()]
-                        for group_name in groups:
-                            fake_group_url = (
-                                f"https://facebook.com/groups/"
-                                f"{group_name.replace(' ', '_')}/fake_post"
-                            )
-                            print(
-                                f"[INFO] Simulating share to group '{group_name}': "
-                                f"{fake_group_url}"
-                            )
-
-                            append_post_log(
-                                log_sheet,
-                                content_id,
-                                f"FB-Group: {group_name}",
-                                full_caption,
-                                fake_group_url,
-                            )
-                            log_to_word_doc(
-                                content_id,
-                                f"FB-Group: {group_name}",
-                                full_caption,
-                                fake_group_url,
-                            )
-                    else:
-                        print("[INFO] No groups specified for this row; skipping group shares.")
-            else:
-                print(f"[ERROR] Failed to get post URL for {platform}")
-                all_success = False
+    def _set_cells(self, updates):
+        """updates: list of (row, col, value)."""
+        with self.spreadsheet.write() as conn:
+            wanted = sorted({row for row, _, _ in updates})
+            rows = {}
+            for row_index in wanted:
+                stored = conn.execute(
+                    "SELECT cells FROM cells WHERE sheet_id = ? AND row_index = ?", (self.id, row_index)
+                ).fetchone()
+                rows[row_index] = json.loads(stored[0]) if stored else []
+            for row_index, col, value in updates:
+                values = rows[row_index]
+                if len(values) < col:
+                    values.extend([""] * (col - len(values)))
+                values[col - 1] = "" if value is None else str(value)
+            for values in rows.values():
+                while values and values[-1] == "":
+                    values.pop()
+            self._put_rows(conn, rows)
+
+    def _block(self, a1):
+        r1, c1, r2, c2 = a1_to_grid_range(a1)
+        stored = self._rows(r1, r2)
+        last = max(stored, default=r1 - 1)
+        block = []
+        for row_index in range(r1, last + 1):
+            values = stored.get(row_index, [])
+            row = values[c1 - 1:c2] if c2 else values[c1 - 1:]
+            while row and row[-1] == "":
+                row.pop()
+            block.append(row)
+        while block and not block[-1]:
+            block.pop()
+        return block
+
+    # --- reads ---
+
+    def _all(self):
+        stored = self._rows()
+        return [stored.get(r, []) for r in range(1, max(stored, default=0) + 1)]
+
+    def get_all_values(self, **kwargs):
+        return self._all()
 
-        new_status = "posted" if all_success else "partial"
-        update_content_status(content_sheet, row_index, new_status)
-        print(f"Updated content ID {content_id} to status '{new_status}'.")
+    def get_all_records(self, **kwargs):
+        values = self._all()
+        header = values[0] if values else []
+        return [
+            dict(zip(header, row + [""] * (len(header) - len(row))))
+            for row in values[1:]
+        ]
+
+    def row_values(self, row, **kwargs):
+        return self._rows(row, row).get(row, [])
+
+    def col_values(self, col, **kwargs):
+        values = [row[col - 1] if col - 1 < len(row) else "" for row in self._all()]
+        while values and values[-1] == "":
+            values.pop()
+        return values
+
+    def batch_get(self, ranges, major_dimension=None, **kwargs):
+        out = []
+        for a1 in ranges:
+            block = self._block(a1)
+            if major_dimension == "COLUMNS":
+                width = max((len(r) for r in block), default=0)
+                block = [[r[c] if c < len(r) else "" for r in block] for c in range(width)]
+                for column in block:
+                    while column and column[-1] == "":
+                        column.pop()
+            out.append(block)
+        return out
+
+    def schedulable_rows(self, start_row=2, due_by=None):
+        """
+        Rows whose status is pending/retry/a lease (and, with due_by, whose
+        due time is not later), straight from the status/due-time index.
+        Returns ([(row_index, status, id, date, time)], last_row).
+        """
+        statuses = list(PENDING_STATUSES) + [LEASE_PREFIX]
+        sql = (
+            "SELECT row_index, cells FROM cells WHERE sheet_id = ? "
+            f"AND status IN ({', '.join('?' * len(statuses))}) AND row_index >= ?"
+        )
+        params = [self.id, *statuses, start_row]
+        if due_by is not None:
+            sql += " AND due_at <= ?"
+            params.append(due_by)
+        header_map = header_map_from_row([str(h) for h in self.row_values(1)])
+
+        def cell(values, name):
+            col = header_map.get(name)
+            return values[col - 1] if col and col - 1 < len(values) else ""
+
+        candidates = []
+        for row_index, cells in self.spreadsheet.query(sql + " ORDER BY row_index", params):
+            values = json.loads(cells)
+            candidates.append((
+                row_index,
+                cell(values, "status"),
+                str(cell(values, "id")).strip(),
+                normalize_sheet_date(cell(values, "date")),
+                normalize_sheet_time(cell(values, "time")),
+            ))
+        return candidates, max(self._last_row(), start_row - 1)
+
+    # --- writes ---
+
+    def update_cell(self, row, col, value):
+        self._set_cells([(row, col, value)])
+
+    def batch_update(self, data, **kwargs):
+        updates = []
+        for item in data:
+            r1, c1, _, _ = a1_to_grid_range(item["range"])
+            for i, values in enumerate(item["values"]):
+                for j, value in enumerate(values):
+                    updates.append((r1 + i, c1 + j, value))
+        self._set_cells(updates)
+        return {"totalUpdatedCells": len(updates)}
+
+    def append_row(self, values, **kwargs):
+        return self.append_rows([values], **kwargs)
+
+    def append_rows(self, values, **kwargs):
+        """Appends after the last row; concurrent appenders get distinct rows."""
+        with self.spreadsheet.write() as conn:
+            start = self._last_row(conn) + 1
+            rows = {
+                start + i: ["" if v is None else str(v) for v in row]
+                for i, row in enumerate(values)
+            }
+            self._put_rows(conn, rows)
+        end = start + len(values) - 1
+        width = max((len(r) for r in values), default=1)
+        return {
+            "updates": {
+                "updatedRange": f"{self.title}!A{start}:{_column_letter(max(width, 1))}{end}",
+                "updatedRows": len(values),
+            }
+        }
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        count = end_index - start_index + 1
+        with self.spreadsheet.write() as conn:
+            conn.execute(
+                "DELETE FROM cells WHERE sheet_id = ? AND row_index BETWEEN ? AND ?",
+                (self.id, start_index, end_index),
+            )
+            # Two steps, so the shifted keys never collide mid-update
+            conn.execute(
+                "UPDATE cells SET row_index = -(row_index - ?) WHERE sheet_id = ? AND row_index > ?",
+                (count, self.id, end_index),
+            )
+            conn.execute(
+                "UPDATE cells SET row_index = -row_index WHERE sheet_id = ? AND row_index < 0",
+                (self.id,),
+            )
+
+    def replace_all(self, values):
+        """Replace the whole tab with a grid of values in one transaction."""
+        with self.spreadsheet.write() as conn:
+            conn.execute("DELETE FROM cells WHERE sheet_id = ?", (self.id,))
+            rows = {}
+            for row_index, row in enumerate(values, start=1):
+                row = ["" if v is None else str(v) for v in row]
+                while row and row[-1] == "":
+                    row.pop()
+                if row:
+                    rows[row_index] = row
+            self._put_rows(conn, rows)
+
+
+def _replace_google_values(ws, values, chunk_rows=5000):
+    """
+    Overwrite a Google worksheet with a grid of values: grow the grid if
+    needed, write in chunks, then clear whatever lies outside the new grid.
+    """
+    n_rows = len(values)
+    width = max((len(r) for r in values), default=0)
+    grid = [list(r) + [""] * (width - len(r)) for r in values]
+    if ws.row_count < n_rows or ws.col_count < width:
+        sheets_call("write", ws.resize, rows=max(ws.row_count, n_rows), cols=max(ws.col_count, width))
+    for start in range(0, n_rows, chunk_rows):
+        sheets_call(
+            "write", ws.batch_update,
+            [{"range": f"A{start + 1}", "values": grid[start:start + chunk_rows]}],
+            value_input_option="RAW",
+        )
+    stale = []
+    if ws.row_count > n_rows:
+        stale.append(f"A{n_rows + 1}:{_column_letter(max(ws.col_count, 1))}{ws.row_count}")
+    if ws.col_count > width and n_rows:
+        stale.append(f"{_column_letter(width + 1)}1:{_column_letter(ws.col_count)}{n_rows}")
+    if stale:
+        sheets_call("write", ws.batch_clear, stale)
+
+
+def sync_storage(direction):
+    """
+    Mirror the local SQLite store and the Google spreadsheet, tab by tab.
+    "push": the spreadsheet becomes a copy of the local store (for people to
+    read and edit); "pull": the local store becomes a copy of the spreadsheet
+    (first import, or taking people's edits back). Run it between bot runs;
+    the side being written is overwritten.
+    """
+    started = time.monotonic()
+    reset_run_stats()
+    local = SqliteSpreadsheet(STORAGE_SQLITE_PATH)
+    remote = open_google_spreadsheet()
+    source, target = (local, remote) if direction == "push" else (remote, local)
+
+    target_tabs = {ws.title: ws for ws in sheets_call("read", target.worksheets)}
+    for ws in sheets_call("read", source.worksheets):
+        values = sheets_call("read", ws.get_all_values)
+        dest = target_tabs.get(ws.title)
+        if dest is None:
+            width = max((len(r) for r in values), default=1)
+            dest = sheets_call(
+                "write", target.add_worksheet, title=ws.title,
+                rows=max(len(values), 1), cols=max(width, 1),
+            )
+        if isinstance(dest, SqliteWorksheet):
+            sheets_call("write", dest.replace_all, values)
+        else:
+            _replace_google_values(dest, values)
+        print(f"[INFO] {direction}: '{ws.title}' ({len(values)} row(s)).")
+
+    # The other side changed wholesale: drop caches keyed by its old contents
+    invalidate_sheets_cache()
+    invalidate_clients_cache()
+    print_run_summary(started)
+
+
+# =========================
+# 10. METRICS ENDPOINT
+# =========================
+
+# METRICS_PORT > 0 serves Prometheus metrics at
+# http://METRICS_HOST:METRICS_PORT/metrics from a background thread for as
+# long as the process runs (most useful with --daemon; also --metrics-port):
+#   curl -s localhost:9464/metrics
+# Counters cover the whole process. A scrape adds up RUN_STATS_TOTALS and the
+# current run's RUN_STATS, so posting only pays for one Counter bump per post.
+METRICS_PORT = int(os.getenv("METRICS_PORT") or 0)
+METRICS_HOST = os.getenv("METRICS_HOST") or "127.0.0.1"
+POSTS_RATE_WINDOW_SECONDS = 60
+
+LIVE_METRICS = {
+    "due_rows": 0,  # claimed rows of the current run not finished yet / due rows seen by the daemon
+    "run_started_at": None,  # Unix time, while a run is in progress
+    "last_success_at": None,
+    "runs_ok": 0,
+    "runs_failed": 0,
+}
+# [second, Counter(platform)] of successful posts, one entry per second of
+# the last POSTS_RATE_WINDOW_SECONDS (bounded, however fast the bot posts)
+_RECENT_POSTS = deque()
+
+
+def _trim_recent_posts(now):
+    while _RECENT_POSTS and _RECENT_POSTS[0][0] <= now - POSTS_RATE_WINDOW_SECONDS:
+        _RECENT_POSTS.popleft()
+
+
+def count_post(platform, ok):
+    """Count one finished post target (FB groups count as FB)."""
+    second = int(time.monotonic())
+    with _RUN_STATS_LOCK:
+        RUN_STATS["posts_ok" if ok else "posts_failed"][platform] += 1
+        if ok:
+            if not _RECENT_POSTS or _RECENT_POSTS[-1][0] != second:
+                _RECENT_POSTS.append([second, Counter()])
+                _trim_recent_posts(second)
+            _RECENT_POSTS[-1][1][platform] += 1
+
+
+def finish_live_run(succeeded):
+    LIVE_METRICS["run_started_at"] = None
+    if succeeded:
+        LIVE_METRICS["runs_ok"] += 1
+        LIVE_METRICS["last_success_at"] = time.time()
+    else:
+        LIVE_METRICS["runs_failed"] += 1
+
+
+def live_metrics_text():
+    """The /metrics page: process-wide counters plus the current gauges."""
+    with _RUN_STATS_LOCK:
+        stats = {}
+        _add_stats(stats, RUN_STATS_TOTALS)
+        _add_stats(stats, RUN_STATS)
+        _trim_recent_posts(int(time.monotonic()))
+        recent = Counter()
+        for _, counts in _RECENT_POSTS:
+            recent.update(counts)
+
+    posts_ok, posts_failed = stats.get("posts_ok", Counter()), stats.get("posts_failed", Counter())
+    platforms = sorted(set(posts_ok) | set(posts_failed) | {"FB", "IG", "LinkedIn"})
+    run_started = LIVE_METRICS["run_started_at"]
+    return format_prometheus([
+        ("bot_due_rows", "gauge", "Due rows not posted yet (current run, or as last seen by the daemon).",
+         [({}, LIVE_METRICS["due_rows"])]),
+        ("bot_run_in_progress", "gauge", "1 while a scheduler run is in progress.",
+         [({}, run_started is not None)]),
+        ("bot_run_started_timestamp_seconds", "gauge", "Unix time the current run started (0 when idle).",
+         [({}, run_started or 0)]),
+        ("bot_last_success_timestamp_seconds", "gauge", "Unix time the last successful run finished (0 if none yet).",
+         [({}, LIVE_METRICS["last_success_at"] or 0)]),
+        ("bot_runs_total", "counter", "Scheduler runs finished, by result.",
+         [({"result": "ok"}, LIVE_METRICS["runs_ok"]), ({"result": "failed"}, LIVE_METRICS["runs_failed"])]),
+        ("bot_posts_total", "counter", "Post targets finished, by platform and result.",
+         [({"platform": p, "result": "ok"}, posts_ok[p]) for p in platforms]
+         + [({"platform": p, "result": "failed"}, posts_failed[p]) for p in platforms]),
+        ("bot_posts_per_second", "gauge",
+         f"Successful posts per second over the last {POSTS_RATE_WINDOW_SECONDS}s, by platform.",
+         [({"platform": p}, recent[p] / POSTS_RATE_WINDOW_SECONDS) for p in platforms]),
+        ("bot_graph_posts_total", "counter", "Graph API POST calls (an FB batch is one call).",
+         [({}, stats.get("graph_posts", 0))]),
+        ("bot_http_errors_total", "counter", "Platform HTTP calls that raised (timeouts, connection errors).",
+         [({}, stats.get("http_errors", 0))]),
+        ("bot_simulated_failures_total", "counter", "Failures injected by SIMULATE_PROFILE, by kind.",
+         [({"kind": kind}, stats.get(f"simulated_{kind}s", 0)) for kind in ("error", "rate_limit", "timeout")]),
+        ("bot_retries_total", "counter",
+         "Retries: post targets re-attempted after a failure, and Sheets calls retried after 429/5xx.",
+         [({"kind": "post"}, stats.get("retry_attempts", 0)), ({"kind": "sheets"}, stats.get("sheets_retries", 0))]),
+        ("bot_retry_exhausted_total", "counter", "Post targets that ran out of retry attempts.",
+         [({}, stats.get("retry_targets_exhausted", 0))]),
+        ("bot_sheets_calls_total", "counter", "Sheets API calls, by kind.",
+         [({"kind": "read"}, stats.get("sheets_reads", 0)), ({"kind": "write"}, stats.get("sheets_writes", 0))]),
+        ("bot_sheets_quota_wait_seconds_total", "counter",
+         "Time spent waiting on Sheets quota: rate limiter (throttle) and 429 backoff.",
+         [({"cause": "throttle"}, stats.get("sheets_throttle_seconds", 0)),
+          ({"cause": "backoff"}, stats.get("sheets_backoff_seconds", 0))]),
+    ])
+
+
+def start_metrics_server(port, host=None):
+    """
+    Serve live_metrics_text() on /metrics from a daemon thread. Returns the
+    server (server.server_address has the bound port; port 0 picks a free
+    one), or None if the port can't be bound: metrics never stop the bot.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = live_metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass  # one line per scrape would bury the run output
+
+    host = host or METRICS_HOST
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        print(f"[WARN] Metrics endpoint not started on {host}:{port} ({e}).")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    print(f"[INFO] Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
 
 
 if __name__ == "__main__":
-    process_all_pending_items()
+    parser = argparse.ArgumentParser(description="Biznex Bot scheduler run")
+    parser.add_argument(
+        "--refresh-clients", action="store_true",
+        help="ignore the cached Clients map and re-read the sheet",
+    )
+    parser.add_argument(
+        "--daemon", action="store_true",
+        help="stay running and post each item when it comes due (stop with SIGTERM)",
+    )
+    parser.add_argument(
+        "--sync", choices=["push", "pull"],
+        help="copy the local SQLite store to the Google spreadsheet (push) or back (pull) and exit",
+    )
+    parser.add_argument(
+        "--archive", action="store_true",
+        help="move finished rows older than ARCHIVE_AFTER_DAYS out of ContentPlan and exit",
+    )
+    parser.add_argument(
+        "--metrics-port", type=int, default=METRICS_PORT,
+        help="serve Prometheus metrics on this port while running (default METRICS_PORT, 0 = off)",
+    )
+    parser.add_argument(
+        "-q", "--quiet", action="store_true",
+        help="print only warnings, errors and the run summary (LOG_VERBOSITY=quiet)",
+    )
+    parser.add_argument(
+        "-v", "--verbose", action="store_true",
+        help="print every row and final caption (LOG_VERBOSITY=verbose)",
+    )
+    args = parser.parse_args()
+
+    if args.quiet:
+        LOG_VERBOSITY = LOG_LEVELS["quiet"]
+    elif args.verbose:
+        LOG_VERBOSITY = LOG_LEVELS["verbose"]
+    if args.metrics_port:
+        start_metrics_server(args.metrics_port)
+    if args.refresh_clients:
+        invalidate_clients_cache()
+    if args.sync:
+        sync_storage(args.sync)
+    elif args.archive:
+        archive_finished_rows()
+    elif args.daemon:
+        run_daemon()
+    else:
+        process_all_pending_items()